@@ -0,0 +1,91 @@
+"""
+Micro-benchmark: ADF (Atlassian Document Format) to text on large tickets.
+
+    PYTHONPATH=src python benchmarks/bench_adf.py [--baseline]
+
+Documents mimic what tax tickets carry: rate tables, nested SKU lists, linked
+specs and long comment threads. --baseline also times the old recursive
+flatten from JiraConnector (which also pulls attrs such as ids and urls into the
+text and raises RecursionError on the "deep" case). Output size is shown for
+both, since characters saved are prompt tokens saved.
+"""
+import json, sys, time
+from vttfg.connectors.adf import adf_to_text
+
+
+def old_flatten(body):
+    def flatten_content(content):
+        out = []
+        if isinstance(content, list):
+            for it in content:
+                out.extend(flatten_content(it))
+        elif isinstance(content, dict):
+            if content.get("text"):
+                out.append(content.get("text"))
+            else:
+                for v in content.values():
+                    out.extend(flatten_content(v))
+        elif isinstance(content, str):
+            out.append(content)
+        return out
+    return " ".join(flatten_content(body.get("content")))
+
+
+def _t(s, **kw):
+    return {"type": "text", "text": s, **kw}
+
+
+def _p(*content):
+    return {"type": "paragraph", "content": list(content)}
+
+
+def document(n):
+    link = {"type": "link", "attrs": {"href": "https://docs.google.com/document/d/1AbCdEf/edit"}}
+    rows = [{"type": "tableRow", "content": [{"type": "tableCell", "attrs": {"colspan": 1}, "content": [_p(_t(v))]}
+                                             for v in (f"SKU{i:05d}", "KS", "6.5%", "2025-07-01")]} for i in range(n)]
+    items = [{"type": "listItem", "content": [_p(_t(f"Item {i} "), _t("spec", marks=[link])),
+                                             {"type": "bulletList", "content": [{"type": "listItem", "content": [_p(_t("MPF, effective July 1"))]}]}]}
+             for i in range(n)]
+    body = [{"type": "heading", "attrs": {"level": 2}, "content": [_t("Scope")]}]
+    body += [_p(_t("Convert Kansas to MPF for the SKUs below. "), {"type": "mention", "attrs": {"id": "5b10ac8d82e05b22cc7d4ef5", "text": "@Tax Ops"}})] * (n // 10 or 1)
+    body += [{"type": "table", "attrs": {"isNumberColumnEnabled": False, "layout": "default"}, "content": rows},
+             {"type": "bulletList", "content": items}]
+    return {"type": "doc", "version": 1, "content": body}
+
+
+def deep(depth):
+    doc = cur = {"type": "doc", "version": 1, "content": []}
+    for _ in range(depth):
+        nxt = {"type": "blockquote", "content": []}
+        cur["content"].append(nxt)
+        cur = nxt
+    cur["content"].append(_p(_t("bottom")))
+    return doc
+
+
+def bench(fn, doc, repeat=5):
+    best, out = float("inf"), ""
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(doc)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000, len(out)
+
+
+if __name__ == "__main__":
+    baseline = "--baseline" in sys.argv
+    docs = [(f"{n} rows", document(n)) for n in (100, 1000, 5000)] + [("deep 5000", deep(5000))]
+    for name, doc in docs:
+        try:
+            size = f"{len(json.dumps(doc)) // 1024:>6} KB"
+        except RecursionError:  # json can't encode the deep case either
+            size = f"{'?':>6} KB"
+        ms, chars = bench(adf_to_text, doc)
+        line = f"{size}  {name:<10} new {ms:8.2f} ms {chars:>8} chars"
+        if baseline:
+            try:
+                ms, chars = bench(old_flatten, doc)
+                line += f"   old {ms:8.2f} ms {chars:>8} chars"
+            except RecursionError:
+                line += "   old RecursionError"
+        print(line)
@@ -0,0 +1,63 @@
+"""
+Micro-benchmark: JSON extraction from large, messy LLM outputs.
+
+    PYTHONPATH=src python benchmarks/bench_json_parser.py [--baseline]
+
+--baseline also times the old regex-based parser (`_BRACE_RE` under finditer),
+which is quadratic on prose with many unmatched braces; keep sizes small for it.
+"""
+import json, re, sys, time
+from vttfg.utils.json_parser import safe_parse_json_from_text
+
+_JSON_BLOCK_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.S | re.I)
+_BRACE_RE = re.compile(r"(\{(?:.|\n)*\})", re.S)
+
+
+def old_parse(s):
+    try:
+        return json.loads(s)
+    except Exception:
+        pass
+    m = _JSON_BLOCK_RE.search(s)
+    if m:
+        try:
+            return json.loads(m.group(1))
+        except Exception:
+            pass
+    for m in _BRACE_RE.finditer(s):
+        try:
+            return json.loads(m.group(1))
+        except Exception:
+            continue
+    return None
+
+
+def payload(kb):
+    obj = {"item_codes": [f"SKU{i}" for i in range(kb * 20)], "notes": "braces {in} strings \"quoted\" " * kb}
+    body = json.dumps(obj)
+    prose = "The model rambles {about} things and { leaves braces open. " * (kb * 4)
+    return {
+        "fenced": prose + "\n```json\n" + body + "\n```\n" + prose,
+        "bare": prose + body + prose,
+        "truncated": prose + body[: len(body) * 3 // 4],
+        "no_json": prose * 2,
+    }
+
+
+def bench(fn, text, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+if __name__ == "__main__":
+    baseline = "--baseline" in sys.argv
+    for kb in (100, 300, 800):
+        for name, text in payload(kb).items():
+            line = f"{len(text) // 1024:>5} KB  {name:<10} new {bench(safe_parse_json_from_text, text):8.2f} ms"
+            if baseline and kb <= 100:
+                line += f"   old {bench(old_parse, text, repeat=1):10.2f} ms"
+            print(line)
@@ -0,0 +1,88 @@
+"""
+Offline end-to-end benchmark: the full orchestrator against the replay LLM backend.
+
+    PYTHONPATH=src python benchmarks/bench_pipeline.py --tickets 200 --workers 16 --latency-ms 800 --jitter-ms 300
+
+Uses CONFIG.llm_fixtures_path when it holds recorded fixtures (LLM_BACKEND=record
+on real runs); otherwise seeds a synthetic fixture per prompt. Jira is replaced
+by generated tickets and the BCI template by a small generated CSV, so nothing
+leaves the machine. Output lands in a temp dir.
+"""
+import argparse, json, os, random, sys, tempfile, time
+
+from vttfg.config import CONFIG
+
+EXTRACTION = {"use_case": "UC3", "confidence": 0.93, "item_codes": ["COFFEE", "BWATER"], "product_classes": ["FOOD"],
+              "states": ["KS", "MO"], "postal_codes": [], "date_specs": [{"type": "effective", "date": "2025-07-01"}],
+              "flex_fields": {}, "taxability_matrix": [], "category_mapping": [], "raw_extracted_text": "Convert Kansas to MPF"}
+
+
+def seed_fixtures(store):
+    from vttfg.prompts_loader import load_classify_prompt, load_prompt_for
+    from vttfg.connectors.llm_client import _CLASSIFY_INSTRUCTIONS
+    classify = json.dumps({"classification": "UC3", "confidence": 0.93, "reasoning": "MPF conversion with an effective date. " * 8})
+    for prompt, content, max_tokens in (
+            (load_classify_prompt(), classify, 200),
+            (_CLASSIFY_INSTRUCTIONS, classify, 200),
+            (load_prompt_for("uc3"), json.dumps(EXTRACTION), 800),
+            (load_prompt_for("classify_extract"), json.dumps({"classification": "UC3", "confidence": 0.93, "extraction": EXTRACTION}), 1000)):
+        messages = [{"role": "user", "content": (prompt or "") + "\n\nTicket:\n" + "seed"}]
+        store.add(CONFIG.portkey_model, messages, max_tokens, content, {"prompt_tokens": 1500, "completion_tokens": 300, "total_tokens": 1800})
+
+
+class FakeJira:
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+
+    def fetch_issue(self, jira_id):
+        from vttfg.models import JiraContext
+        import datetime
+        n = self.rng.randint(2, 40)
+        comments = [f"Comment {i}: please confirm MPF effective date for KS and MO, SKUs COFFEE BWATER" for i in range(n)]
+        return JiraContext(jira_id=jira_id, title=f"{jira_id} Kansas MPF conversion", description="Convert Kansas to MPF effective July 1, 2025. " * 5,
+                           comments=comments, linked_docs=[], created_at=datetime.datetime(2025, 1, 1), updated=f"{jira_id}-v1")
+
+
+def main():
+    p = argparse.ArgumentParser()
+    p.add_argument("--tickets", type=int, default=100)
+    p.add_argument("--workers", type=int, default=8)
+    p.add_argument("--latency-ms", type=float, default=500)
+    p.add_argument("--jitter-ms", type=float, default=150)
+    args = p.parse_args()
+
+    out = tempfile.mkdtemp(prefix="vttfg_bench_")
+    template = os.path.join(out, "template.csv")
+    with open(template, "w") as fh:
+        fh.write("Product Code,Product Name,Division Code,Department Code\nCOFFEE,Coffee,1,10\nBWATER,Bottled water,1,11\n")
+    CONFIG.llm_backend, CONFIG.llm_cache_enabled, CONFIG.local_classifier_enabled = "replay", False, False
+    CONFIG.llm_replay_latency_ms, CONFIG.llm_replay_jitter_ms = args.latency_ms, args.jitter_ms
+    CONFIG.output_dir, CONFIG.metrics_path, CONFIG.bci_template_path = out, os.path.join(out, "metrics.jsonl"), template
+    CONFIG.llm_max_concurrency = max(CONFIG.llm_max_concurrency, args.workers)
+
+    from vttfg.connectors.llm_backends import FixtureStore
+    from vttfg.orchestrator import Orchestrator
+    from vttfg.metrics import summarize_file
+    store = FixtureStore()
+    if not len(store):
+        store = FixtureStore(os.path.join(out, "fixtures.jsonl"))
+        CONFIG.llm_fixtures_path = store.path
+        seed_fixtures(store)
+    orc = Orchestrator()
+    orc.jira, orc.snow = FakeJira(), None
+
+    t0 = time.perf_counter()
+    res = orc.run_for_jiras([f"BENCH-{i}" for i in range(args.tickets)], max_workers=args.workers)
+    elapsed = time.perf_counter() - t0
+    s = res["summary"]
+    print(f"{s['succeeded']}/{s['total']} tickets in {elapsed:.2f}s ({s['total'] / elapsed:.1f} tickets/s), fixtures={len(store)}")
+    for r in res["results"]:
+        if r["status"] != "ok":
+            print("  failed:", r["jira_id"], r["error"], file=sys.stderr)
+            break
+    for name, st in summarize_file(CONFIG.metrics_path).items():
+        print(f"  {name:32s} n={st['count']:5d} p50={st['p50_ms']:8.1f}ms p95={st['p95_ms']:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
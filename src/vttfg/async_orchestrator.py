@@ -0,0 +1,139 @@
+import asyncio, logging, time
+from vttfg.config import CONFIG
+from vttfg.orchestrator import Orchestrator
+from vttfg.prompts_loader import load_classify_prompt, load_prompt_for
+from vttfg.metrics import start_run, span
+
+logger = logging.getLogger("vttfg.orchestrator")
+
+class AsyncOrchestrator(Orchestrator):
+    """
+    asyncio-native variant of Orchestrator.
+
+    Same inputs, outputs and audit files as run_for_jira, but independent I/O runs
+    concurrently under one event loop: once the Jira issue is in, all linked docs
+    are fetched at once. The local classifier sees the same text blob as in
+    run_for_jira. In combined mode (CONFIG.llm_combined_mode) one LLM call on the
+    blob classifies and extracts, with run_for_jira's confidence threshold;
+    otherwise, with no local model trained, LLM classification (which only needs
+    the title) runs alongside the doc fetches, so a ticket costs roughly
+    fetch_issue + max(classify, slowest doc) + extract + finish.
+    """
+    def __init__(self):
+        super().__init__()
+        self._alimits = None
+        self._alimits_loop = None
+
+    def _async_limits(self):
+        # created per event loop: asyncio semaphores cannot be shared across loops
+        loop = asyncio.get_running_loop()
+        if self._alimits is None or self._alimits_loop is not loop:
+            self._alimits_loop = loop
+            self._alimits = {
+                "jira": asyncio.Semaphore(max(1, CONFIG.jira_max_concurrency)),
+                "gdocs": asyncio.Semaphore(max(1, CONFIG.gdocs_max_concurrency)),
+                "llm": asyncio.Semaphore(max(1, CONFIG.llm_max_concurrency)),
+            }
+        return self._alimits
+
+    async def _afetch_linked_doc(self, url):
+        try:
+            async with self._async_limits()["gdocs"]:
+                return await self.gdocs.fetch_doc_text_async(url)
+        except Exception as e:
+            logger.warning("Failed fetching linked doc %s: %s", url, e)
+            return e
+
+    def _has_local_model(self):
+        if not CONFIG.local_classifier_enabled:
+            return False
+        from vttfg.local_classifier import get_local_classifier
+        return get_local_classifier() is not None
+
+    async def _aclassify(self, jc):
+        """(classification, source) of the title; source is "fallback" when the LLM answered without JSON."""
+        async with self._async_limits()["llm"]:
+            with span("stage.classify"):
+                result = await self.llm.aclassify(jc.title, prompt=load_classify_prompt())
+        return result[0], getattr(result, "source", "llm")
+
+    async def _aclassify_and_extract(self, text_blob):
+        async with self._async_limits()["llm"]:
+            with span("stage.classify_extract"):
+                return await self.llm.aclassify_and_extract(text_blob, prompt=load_prompt_for("classify_extract"))
+
+    async def arun_for_jira(self, jira_id, overrides=None):
+        overrides = overrides or {}
+        with start_run(jira_id=jira_id) as run:
+            debug = {"notes": []}
+            jc = overrides.get("jira_context")
+            if not jc:
+                async with self._async_limits()["jira"]:
+                    with span("stage.jira"):
+                        jc = await self.jira.fetch_issue_async(jira_id)
+            classification = overrides.get("classification")
+            extraction = overrides.get("manual_extraction") or overrides.get("ui_extraction")
+            source = "override" if classification else None
+            combined = not classification and not extraction and CONFIG.llm_combined_mode and hasattr(self.llm, "aclassify_and_extract")
+            tasks = []
+            try:
+                # the title-only classify overlaps the doc fetches; combined mode needs the blob instead
+                classify_task = None
+                if not classification and not combined and not self._has_local_model():
+                    classify_task = asyncio.create_task(self._aclassify(jc))
+                    tasks.append(classify_task)
+                attachments_task = asyncio.create_task(asyncio.to_thread(self.attachment_tables, jira_id, jc))
+                tasks.append(attachments_task)
+                text_blob = overrides.get("text_blob")
+                if not text_blob:
+                    linked_docs = getattr(jc, "linked_docs", []) or []
+                    with span("stage.linked_docs", docs=len(linked_docs)) as sp:
+                        texts = await asyncio.gather(*(self._afetch_linked_doc(url) for url in linked_docs))
+                        text_blob = self._build_text_blob(jc, list(zip(linked_docs, texts)))
+                        sp.set(chars=len(text_blob))
+                report = self._context_report(text_blob)
+                if report:
+                    debug["context"] = report
+                # local model on the same blob as the sync path; LLM only if unsure
+                if not classification and classify_task is None:
+                    local = self.local_classify(text_blob)
+                    if local:
+                        (classification, _), source = local, "local"
+                # same combined call and confidence threshold as run_for_jira
+                if not classification and combined:
+                    result = await self._aclassify_and_extract(text_blob)
+                    (classification, extraction), source = self._combined_outcome(result, debug), "llm_combined"
+                if classify_task is not None:
+                    classification, source = await classify_task
+                elif not classification:
+                    classification, source = await self._aclassify(jc)
+                if not extraction:
+                    async with self._async_limits()["llm"]:
+                        with span("stage.extract"):
+                            extraction = await self.llm.aextract(text_blob, classification, prompt=load_prompt_for("uc3"))
+                self._apply_attachments(extraction, await attachments_task, debug, manual=bool(overrides.get("manual_extraction")))
+            finally:
+                # a failed stage must not leave the others running, or their errors unretrieved
+                for t in tasks:
+                    if not t.done():
+                        t.cancel()
+                    elif not t.cancelled():
+                        t.exception()
+            debug["classification"] = {"value": classification, "source": source}
+            # template, Snowflake and file writes are blocking; keep them off the loop
+            return await asyncio.to_thread(self._finish_run, jira_id, jc, extraction, overrides, debug, run, text_blob)
+
+    async def arun_for_jiras(self, jira_ids, overrides=None):
+        """Run many tickets on one loop; per-backend semaphores bound the fan-out."""
+        started = time.monotonic()
+        ids = list(dict.fromkeys(j.strip() for j in (jira_ids or []) if j and j.strip()))
+
+        async def one(jira_id):
+            try:
+                return {"jira_id": jira_id, "status": "ok", "result": await self.arun_for_jira(jira_id, overrides=dict(overrides or {}))}
+            except Exception as e:
+                logger.warning("Batch ticket %s failed: %s", jira_id, e, extra={"run_id": "-", "step": "batch_ticket"})
+                return {"jira_id": jira_id, "status": "error", "error": f"{type(e).__name__}: {e}"}
+
+        ordered = await asyncio.gather(*(one(j) for j in ids))
+        return {"results": ordered, "summary": self._batch_summary(ordered, started)}
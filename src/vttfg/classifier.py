@@ -1,6 +1,16 @@
 from .connectors.llm_client import get_llm_client
-llm = get_llm_client()
+from .local_classifier import classify_local
+_llm = None
+def _get_llm():
+    # built on first LLM fallback, not at import
+    global _llm
+    if _llm is None:
+        _llm = get_llm_client()
+    return _llm
 def classify_text(text: str):
+    local = classify_local(text)  # model trained from audits; None when untrained or unsure
+    if local:
+        return local
     t = (text or '').lower()
     if 'merchant' in t:
         return 'UC2', 0.9
@@ -11,6 +21,6 @@ def classify_text(text: str):
     if 'tax' in t:
         return 'UC6', 0.7
     try:
-        return llm.classify(text)
+        return _get_llm().classify(text)
     except Exception:
         return 'UC6', 0.5
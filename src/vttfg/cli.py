@@ -1,15 +1,47 @@
 #!/usr/bin/env python3
-import argparse, sys, os, json
+import argparse, sys, os, json, asyncio
 from vttfg.orchestrator import Orchestrator
 
+def _read_jira_file(path):
+    ids = []
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                ids.extend(x for x in line.replace(",", " ").split() if x)
+    return ids
+
 def main():
     p = argparse.ArgumentParser()
-    p.add_argument('--jira', required=False, help='JIRA id to process')
+    src = p.add_mutually_exclusive_group()
+    src.add_argument('--jira', required=False, help='JIRA id to process')
+    src.add_argument('--jira-file', help='file with JIRA ids (one per line, # comments allowed) to process as a batch')
+    src.add_argument('--jql', help='JQL query selecting the JIRA tickets to process as a batch')
+    p.add_argument('--workers', type=int, default=None, help='max tickets in flight for batch runs')
+    p.add_argument('--async', dest='use_async', action='store_true', help='use the asyncio pipeline (concurrent doc fetches and classification)')
     args = p.parse_args()
-    orc = Orchestrator()
+    if args.use_async:
+        from vttfg.async_orchestrator import AsyncOrchestrator
+        orc = AsyncOrchestrator()
+    else:
+        orc = Orchestrator()
+    if args.jql and not args.use_async:
+        print(f'Running batch for JQL: {args.jql}')
+        res = orc.run_for_jql(args.jql, max_workers=args.workers)
+        print('Result:', json.dumps(res, indent=2, default=str))
+        sys.exit(1 if res["summary"]["failed"] else 0)
+    if args.jira_file or args.jql:
+        ids = _read_jira_file(args.jira_file) if args.jira_file else orc.jira.search_issue_keys(args.jql)
+        print(f'Running batch for {len(ids)} tickets...')
+        if args.use_async:
+            res = asyncio.run(orc.arun_for_jiras(ids))
+        else:
+            res = orc.run_for_jiras(ids, max_workers=args.workers)
+        print('Result:', json.dumps(res, indent=2, default=str))
+        sys.exit(1 if res["summary"]["failed"] else 0)
     jira = args.jira or input('Enter JIRA id: ').strip()
     print('Fetching and running...')
-    res = orc.run_for_jira(jira)
+    res = asyncio.run(orc.arun_for_jira(jira)) if args.use_async else orc.run_for_jira(jira)
     print('Result:', json.dumps(res, indent=2))
 
 if __name__ == '__main__':
@@ -9,6 +9,26 @@ class Config:
     portkey_virtual_key: str = os.getenv("PORTKEY_VIRTUAL_KEY")
     portkey_base_url: str = os.getenv("PORTKEY_BASE_URL")
     portkey_model: str = os.getenv("PORTKEY_MODEL", "gpt-4o-mini")
+    # one shared Portkey client per process; keep-alive pool size and timeouts for its HTTP connections
+    llm_pool_size: int = int(os.getenv("LLM_POOL_SIZE", 10))
+    llm_timeout_s: float = float(os.getenv("LLM_TIMEOUT_S", 60))
+    llm_keepalive_s: float = float(os.getenv("LLM_KEEPALIVE_S", 60))
+    # LLM backend: live | record (also write fixtures) | replay (serve fixtures locally, no gateway)
+    llm_backend: str = os.getenv("LLM_BACKEND", "live")
+    llm_fixtures_path: str = os.getenv("LLM_FIXTURES_PATH", os.path.join(os.getenv("DATA_DIR", "data"), "llm_fixtures.jsonl"))
+    llm_replay_latency_ms: float = float(os.getenv("LLM_REPLAY_LATENCY_MS", 0))
+    llm_replay_jitter_ms: float = float(os.getenv("LLM_REPLAY_JITTER_MS", 0))
+    llm_replay_miss: str = os.getenv("LLM_REPLAY_MISS", "nearest")
+    # gateway resilience: overall deadline, adaptive per-attempt timeout (multiplier x p95), retries, hedging, breaker
+    llm_deadline_s: float = float(os.getenv("LLM_DEADLINE_S", 120))
+    llm_timeout_min_s: float = float(os.getenv("LLM_TIMEOUT_MIN_S", 10))
+    llm_timeout_multiplier: float = float(os.getenv("LLM_TIMEOUT_MULTIPLIER", 3))
+    llm_retries: int = int(os.getenv("LLM_RETRIES", 2))
+    llm_backoff_s: float = float(os.getenv("LLM_BACKOFF_S", 0.5))
+    llm_hedge_enabled: bool = os.getenv("LLM_HEDGE", "0").lower() in ("1", "true", "yes")
+    llm_hedge_min_delay_s: float = float(os.getenv("LLM_HEDGE_MIN_DELAY_S", 1.0))
+    llm_breaker_failures: int = int(os.getenv("LLM_BREAKER_FAILURES", 5))
+    llm_breaker_reset_s: float = float(os.getenv("LLM_BREAKER_RESET_S", 30))
 
     jira_base_url: str = os.getenv("JIRA_BASE_URL")
     jira_user: str = os.getenv("JIRA_USER")
@@ -25,10 +45,78 @@ class Config:
     snowflake_schema: str = os.getenv("SNOWFLAKE_SCHEMA")
 
     bci_template_path: str = os.getenv("BCI_TEMPLATE_PATH", "sample_inputs/BCI Input Template_US and Canada - BCI Input Template_US and Canada.csv")
+    # compiled template product maps, one pickle per template keyed by mtime + size (empty to disable)
+    template_cache_dir: str = os.getenv("TEMPLATE_CACHE_DIR", os.path.join(os.getenv("OUTPUT_DIR", "output"), "template_cache"))
     output_dir: str = os.getenv("OUTPUT_DIR", "output")
     default_item: str = os.getenv("DEFAULT_ITEM", "BWATER")
     default_extended_price: str = os.getenv("DEFAULT_EXTENDED_PRICE", "")
     llm_confidence_threshold: float = float(os.getenv("LLM_CONFIDENCE_THRESHOLD", 0.6))
+    # classify + extract in one LLM call; a separate extract runs only below the confidence threshold
+    llm_combined_mode: bool = os.getenv("LLM_COMBINED_MODE", "1").lower() not in ("0", "false", "no")
+    # stream classify completions and stop reading once classification + confidence are parsed
+    llm_stream_classify: bool = os.getenv("LLM_STREAM_CLASSIFY", "1").lower() not in ("0", "false", "no")
+    # stream extract completions; the pipeline starts resolving products once item_codes is parsed
+    llm_stream_extract: bool = os.getenv("LLM_STREAM_EXTRACT", "1").lower() not in ("0", "false", "no")
+    # token budget for the ticket text blob (title > description > comments > linked docs)
+    llm_context_token_budget: int = int(os.getenv("LLM_CONTEXT_TOKEN_BUDGET", 6000))
+    # linked docs: paragraph chunks in a persistent BM25 index, only the top-k matching the ticket go in the prompt
+    doc_index_enabled: bool = os.getenv("DOC_INDEX_ENABLED", "1").lower() not in ("0", "false", "no")
+    doc_index_path: str = os.getenv("DOC_INDEX_PATH", os.path.join(os.getenv("OUTPUT_DIR", "output"), "doc_index.sqlite"))
+    doc_index_max_docs: int = int(os.getenv("DOC_INDEX_MAX_DOCS", 2000))
+    doc_index_top_k: int = int(os.getenv("DOC_INDEX_TOP_K", 4))
     data_dir: str = os.getenv("DATA_DIR", "data")
+    # local nearest-centroid classifier trained from audits; consulted before the LLM
+    local_classifier_enabled: bool = os.getenv("LOCAL_CLASSIFIER", "1").lower() not in ("0", "false", "no")
+    local_classifier_path: str = os.getenv("LOCAL_CLASSIFIER_PATH", os.path.join(os.getenv("DATA_DIR", "data"), "local_classifier.npz"))
+
+    # concurrency: ticket-level batch workers and per-backend caps
+    batch_max_workers: int = int(os.getenv("BATCH_MAX_WORKERS", 8))
+    jira_max_concurrency: int = int(os.getenv("JIRA_MAX_CONCURRENCY", 4))
+    gdocs_max_concurrency: int = int(os.getenv("GDOCS_MAX_CONCURRENCY", 4))
+    llm_max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", 4))
+    snowflake_max_concurrency: int = int(os.getenv("SNOWFLAKE_MAX_CONCURRENCY", 1))
+    # pooled HTTP sessions (connections kept per host) and concurrent Jira comment pages per ticket
+    http_pool_size: int = int(os.getenv("HTTP_POOL_SIZE", 16))
+    jira_page_concurrency: int = int(os.getenv("JIRA_PAGE_CONCURRENCY", 8))
+    jira_comment_page_size: int = int(os.getenv("JIRA_COMMENT_PAGE_SIZE", 50))
+    # batch runs load tickets through the JQL search endpoint (one request per page of issues)
+    jira_bulk_fetch: bool = os.getenv("JIRA_BULK_FETCH", "1").lower() not in ("0", "false", "no")
+    jira_search_page_size: int = int(os.getenv("JIRA_SEARCH_PAGE_SIZE", 100))
+    # on-disk JiraContext snapshots, refetched only when the issue's `updated` changed
+    jira_cache_enabled: bool = os.getenv("JIRA_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+    jira_cache_path: str = os.getenv("JIRA_CACHE_PATH", os.path.join(os.getenv("OUTPUT_DIR", "output"), "jira_cache.sqlite"))
+    jira_cache_max_entries: int = int(os.getenv("JIRA_CACHE_MAX_ENTRIES", 5000))
+    jira_cache_max_mb: int = int(os.getenv("JIRA_CACHE_MAX_MB", 256))
+    # serve tickets from the snapshot cache only; never call Jira
+    jira_offline: bool = os.getenv("JIRA_OFFLINE", "0").lower() in ("1", "true", "yes")
+    # CSV/XLSX attachments: downloaded concurrently (capped per file / per ticket), parsed into product/jurisdiction tables
+    attachments_enabled: bool = os.getenv("ATTACHMENTS_ENABLED", "1").lower() not in ("0", "false", "no")
+    attachment_dir: str = os.getenv("ATTACHMENT_DIR", os.path.join(os.getenv("OUTPUT_DIR", "output"), "attachments"))
+    attachment_concurrency: int = int(os.getenv("ATTACHMENT_CONCURRENCY", 4))
+    attachment_max_file_mb: int = int(os.getenv("ATTACHMENT_MAX_FILE_MB", 20))
+    attachment_max_ticket_mb: int = int(os.getenv("ATTACHMENT_MAX_TICKET_MB", 50))
+    attachment_max_rows: int = int(os.getenv("ATTACHMENT_MAX_ROWS", 50000))
+    # linked Google Docs text on disk per (doc id, revisionId); revision checks reused for a short while
+    gdocs_cache_enabled: bool = os.getenv("GDOCS_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+    gdocs_cache_dir: str = os.getenv("GDOCS_CACHE_DIR", os.path.join(os.getenv("OUTPUT_DIR", "output"), "gdocs_cache"))
+    gdocs_cache_max_docs: int = int(os.getenv("GDOCS_CACHE_MAX_DOCS", 2000))
+    gdocs_revision_ttl_s: float = float(os.getenv("GDOCS_REVISION_TTL_S", 60))
+    # Google Sheets are read in pages of this many rows
+    gsheets_page_rows: int = int(os.getenv("GSHEETS_PAGE_ROWS", 2000))
+
+    # per-stage timings, one JSON span per line (empty to disable)
+    metrics_path: str = os.getenv("METRICS_PATH", os.path.join(os.getenv("OUTPUT_DIR", "output"), "metrics.jsonl"))
+
+    # in-process memo of fetched contexts / LLM stage outputs (UI "Generate" reuses them)
+    stage_cache_max_entries: int = int(os.getenv("STAGE_CACHE_MAX_ENTRIES", 256))
+    stage_cache_ttl_s: float = float(os.getenv("STAGE_CACHE_TTL_S", 1800))
+
+    # persistent LLM response cache (SQLite), shared across threads and processes
+    llm_cache_enabled: bool = os.getenv("LLM_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+    llm_cache_bypass: bool = os.getenv("LLM_CACHE_BYPASS", "0").lower() in ("1", "true", "yes")
+    llm_cache_path: str = os.getenv("LLM_CACHE_PATH", os.path.join(os.getenv("OUTPUT_DIR", "output"), "llm_cache.sqlite"))
+    llm_cache_ttl_s: float = float(os.getenv("LLM_CACHE_TTL_S", 7 * 24 * 3600))
+    llm_cache_max_entries: int = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 20000))
+    llm_cache_max_mb: int = int(os.getenv("LLM_CACHE_MAX_MB", 256))
 
 CONFIG = Config()
@@ -1,2 +1,9 @@
-# package aggregator for connectors
-from . import jira, google_docs, google_sheets, snowflake
+# package aggregator for connectors; submodules load on first attribute access
+import importlib
+
+_SUBMODULES = ("jira", "google_docs", "google_sheets", "snowflake")
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,180 @@
+"""
+Atlassian Document Format (ADF) to compact plain text.
+
+Jira Cloud returns descriptions and comments as ADF trees (REST v3 always, v2
+for some sites). adf_to_text walks the tree once with an explicit stack, so
+deeply nested documents can't hit the recursion limit, and keeps the structure
+the LLM needs in a few characters:
+
+- paragraphs/headings end in a newline, headings keep their "#" level
+- bullet/ordered/task lists become "- ", "1. ", "[x] " lines, indented when nested
+- tables become one "| a | b |" line per row
+- links keep their target as "text (url)" so linked-doc detection still sees them
+- mentions, emoji, dates, status lozenges and smart links become their text or url
+
+Anything that isn't ADF (plain strings, None) is passed through as text.
+"""
+import datetime
+import re
+
+_BLOCK_END = {"paragraph", "heading", "codeBlock", "rule", "mediaSingle", "mediaGroup", "blockCard", "embedCard"}
+_NEWLINES_RE = re.compile(r"\n{3,}")
+_SPACES_RE = re.compile(r"\s+")
+
+
+def _inline(node, attrs):
+    """Text for leaf/inline nodes, or None when the node has children to walk."""
+    kind = node.get("type")
+    if kind == "text":
+        text = node.get("text") or ""
+        for mark in node.get("marks") or ():
+            href = (mark.get("attrs") or {}).get("href") if mark.get("type") == "link" else None
+            if href and href != text:
+                return f"{text} ({href})"
+        return text
+    if kind == "hardBreak":
+        return "\n"
+    if kind == "rule":
+        return "---"
+    if kind == "mention":
+        return attrs.get("text") or "@" + str(attrs.get("id", ""))
+    if kind == "emoji":
+        return attrs.get("text") or attrs.get("shortName") or ""
+    if kind in ("inlineCard", "blockCard", "embedCard"):
+        return attrs.get("url") or ""
+    if kind == "status":
+        return f"[{attrs.get('text', '')}]"
+    if kind == "date":
+        try:
+            return datetime.datetime.fromtimestamp(int(attrs.get("timestamp")) / 1000, datetime.timezone.utc).strftime("%Y-%m-%d")
+        except (TypeError, ValueError):
+            return ""
+    if kind == "media":
+        return f"[{attrs['alt']}]" if attrs.get("alt") else ""
+    return None
+
+
+def _paragraph_text(children):
+    """Text of a paragraph made only of inline nodes, else None."""
+    parts = []
+    for c in children or ():
+        if c.get("type") == "text" and not c.get("marks"):
+            text = c.get("text")
+        elif "content" in c:
+            return None
+        else:
+            text = _inline(c, c.get("attrs") or {})
+        if text:
+            parts.append(text)
+    return "".join(parts)
+
+
+def _cell_text(content):
+    """One-line text of a table cell holding only simple paragraphs, else None."""
+    parts = []
+    for block in content or ():
+        text = _paragraph_text(block.get("content")) if block.get("type") == "paragraph" else None
+        if text is None:
+            return None
+        parts.append(text)
+    return _SPACES_RE.sub(" ", " ".join(parts)).strip().replace("|", "/")
+
+
+_OPEN_CELL, _CLOSE_CELL, _NEWLINE = object(), object(), object()
+
+
+def adf_to_text(doc) -> str:
+    """Plain text for an ADF node/document (dict), a list of nodes, or a string (returned unchanged)."""
+    if doc is None:
+        return ""
+    if isinstance(doc, str):
+        return doc
+    out = []       # chunks of the current buffer; a table cell collects into its own
+    bufs = []      # enclosing buffers while inside table cells
+    # (node, list indent) to visit, a str to emit, or one of the markers above
+    stack = [(doc, "")]
+    pop, push = stack.pop, stack.append
+    while stack:
+        item = pop()
+        if item.__class__ is tuple:
+            node, indent = item
+        elif item.__class__ is str:
+            out.append(item)
+            continue
+        elif item is _NEWLINE:
+            if out and not out[-1].endswith("\n"):
+                out.append("\n")
+            continue
+        elif item is _OPEN_CELL:
+            bufs.append(out)
+            out = []
+            continue
+        else:  # _CLOSE_CELL
+            cell = _SPACES_RE.sub(" ", "".join(out)).strip().replace("|", "/")
+            out = bufs.pop()
+            out.append(" " + cell + " |")
+            continue
+        if node.__class__ is list:
+            stack.extend((child, indent) for child in reversed(node))
+            continue
+        if node.__class__ is str:
+            out.append(node)
+            continue
+        if not isinstance(node, dict):
+            continue
+        kind = node.get("type")
+        children = node.get("content")
+        if kind == "paragraph":
+            # the common case: a run of inline nodes, no need to go through the stack
+            text = _paragraph_text(children)
+            if text is not None:
+                out.append(text)
+                push(_NEWLINE)
+                continue
+        attrs = node.get("attrs") or {}
+        text = _inline(node, attrs)
+        if text is not None:
+            out.append(text)
+            if kind in _BLOCK_END:
+                out.append("\n")
+            continue
+        children = children or []
+        todo = []
+        if kind == "heading":
+            todo.append("#" * int(attrs.get("level") or 1) + " ")
+        elif kind in ("bulletList", "orderedList", "taskList", "decisionList"):
+            start = int(attrs.get("order") or 1)
+            for i, child in enumerate(children):
+                if kind == "orderedList":
+                    prefix = f"{start + i}. "
+                elif kind == "taskList":
+                    prefix = "[x] " if (child.get("attrs") or {}).get("state") == "DONE" else "[ ] "
+                else:
+                    prefix = "- "
+                todo += [indent + prefix, (child.get("content") or [], indent + "  "), _NEWLINE]
+            stack.extend(reversed(todo))
+            continue
+        elif kind == "tableRow":
+            cells = [_cell_text(cell.get("content")) for cell in children]
+            if None not in cells:
+                out.append("| " + " | ".join(cells) + " |\n" if cells else "")
+                continue
+            todo.append("|")
+            for cell in children:
+                todo += [_OPEN_CELL, (cell.get("content") or [], ""), _CLOSE_CELL]
+            todo.append("\n")
+            stack.extend(reversed(todo))
+            continue
+        elif kind in ("expand", "nestedExpand") and attrs.get("title"):
+            todo.append(attrs["title"] + "\n")
+        elif kind == "codeBlock" and children:
+            todo.append("```\n")
+        elif kind == "blockquote":
+            todo.append("> ")
+        todo.append((children, indent))
+        if kind == "codeBlock" and children:
+            todo.append("\n```")
+        if kind in _BLOCK_END or kind in ("table", "panel", "blockquote", "expand", "nestedExpand"):
+            todo.append(_NEWLINE)
+        stack.extend(reversed(todo))
+    return _NEWLINES_RE.sub("\n\n", "".join(out)).strip()
@@ -0,0 +1,292 @@
+"""
+Jira attachment ingestion: concurrent, size-capped downloads and streamed table parsing.
+
+MPF and taxability tickets often carry the real product list as an attached
+CSV/XLSX. ingest_attachments downloads the spreadsheet attachments of a
+ticket concurrently over the connector's pooled session, streaming each to
+CONFIG.attachment_dir/<jira id>/ with a per-file and a per-ticket byte cap
+(oversized files are skipped by their declared size, or aborted mid-stream,
+and their bytes go back to the ticket's budget). Files are named after the Jira
+attachment id, whose content never changes, so one already on disk is not
+downloaded again.
+
+Sheets are read row by row (csv module, openpyxl read_only) up to
+CONFIG.attachment_max_rows; the header row is located by name and the product,
+product class, state and postal columns become structured tables:
+
+    {"file", "sheet", "rows", "columns": {kind: header}, "item_codes", "product_classes", "states", "postal_codes"}
+
+merge_tables folds them into an extraction so the LLM never has to read the
+data back as prose.
+"""
+import contextvars
+import csv
+import hashlib
+import logging
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from ..config import CONFIG
+from ..geoutils import STATE_NAMES
+from ..metrics import span, record_event
+
+logger = logging.getLogger("vttfg.attachments")
+
+_TABLE_EXT = (".csv", ".tsv", ".xlsx", ".xlsm")
+_COLUMN_RES = {
+    "item_codes": re.compile(r"product|item|sku|upc|article|material"),
+    "product_classes": re.compile(r"class|categor"),
+    "states": re.compile(r"\b(state|states|jurisdiction|province|st)\b"),
+    "postal_codes": re.compile(r"zip|postal"),
+}
+# product "name"/"description" columns are not codes
+_NOT_CODE_RE = re.compile(r"name|desc|class|categor")
+
+_ATTACHMENT_ID_RE = re.compile(r"/attachment/(?:content/)?(\d+)")
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _submit(fn, *args):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=CONFIG.attachment_concurrency, thread_name_prefix="vttfg-attach")
+    return _pool.submit(contextvars.copy_context().run, fn, *args)
+
+
+def attachment_meta(fields):
+    """Attachment metadata from an issue's `fields`, in the JiraContext.attachments shape."""
+    out = []
+    for a in (fields or {}).get("attachment", []) or []:
+        if isinstance(a, dict):
+            out.append({"id": a.get("id"), "filename": a.get("filename"), "content_url": a.get("content"),
+                        "mimeType": a.get("mimeType"), "size": a.get("size")})
+    return out
+
+
+def _is_table(meta):
+    name = (meta.get("filename") or "").lower()
+    return bool(meta.get("content_url")) and name.endswith(_TABLE_EXT)
+
+
+class _CapReached(Exception):
+    pass
+
+
+class _Budget:
+    """Bytes left for one ticket, shared by its concurrent downloads."""
+    def __init__(self, total):
+        self.left = total
+        self._lock = threading.Lock()
+
+    def take(self, n):
+        with self._lock:
+            if n > self.left:
+                return False
+            self.left -= n
+            return True
+
+    def give(self, n):
+        with self._lock:
+            self.left += n
+
+
+def _file_name(meta):
+    """<attachment id>_<filename>; the id comes from the metadata or the content URL."""
+    m = _ATTACHMENT_ID_RE.search(meta.get("content_url") or "")
+    att_id = str(meta.get("id") or (m.group(1) if m else ""))
+    if not att_id:
+        att_id = hashlib.sha256(meta["content_url"].encode("utf-8")).hexdigest()[:16]
+    return f"{att_id}_{re.sub(r'[^A-Za-z0-9_.-]', '_', meta['filename'])}"
+
+
+def _download(session, meta, path, budget, file_cap):
+    declared = meta.get("size") or 0
+    if os.path.exists(path):
+        return path, "cached"
+    tmp = path + ".part"
+    got = taken = 0
+    done = False
+    with span("jira.attachment", file=meta.get("filename"), declared=declared) as sp:
+        try:
+            with session.get(meta["content_url"], stream=True, timeout=60) as resp:
+                resp.raise_for_status()
+                with open(tmp, "wb") as fh:
+                    for chunk in resp.iter_content(chunk_size=64 * 1024):
+                        got += len(chunk)
+                        if got > file_cap or not budget.take(len(chunk)):
+                            raise _CapReached(f"over the byte cap after {got} bytes")
+                        taken += len(chunk)
+                        fh.write(chunk)
+            os.replace(tmp, path)
+            done = True
+        finally:
+            sp.set(bytes=got)
+            if not done:
+                # an aborted or failed file keeps none of the ticket's budget
+                budget.give(taken)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return path, "downloaded"
+
+
+def download_attachments(session, jira_id, attachments, dest_dir=None):
+    """
+    Download the CSV/XLSX attachments concurrently; returns [(meta, path or None, status)].
+    Status is cached / downloaded / skipped_size / failed: <error>.
+    """
+    dest_dir = os.path.join(dest_dir or CONFIG.attachment_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", jira_id))
+    file_cap = CONFIG.attachment_max_file_mb * 1024 * 1024
+    budget = _Budget(CONFIG.attachment_max_ticket_mb * 1024 * 1024)
+    os.makedirs(dest_dir, exist_ok=True)
+    results, futures = [], []
+    for meta in (a for a in attachments or [] if _is_table(a)):
+        declared = meta.get("size") or 0
+        if declared > file_cap:
+            results.append((meta, None, "skipped_size"))
+            continue
+        futures.append((meta, _submit(_download, session, meta, os.path.join(dest_dir, _file_name(meta)), budget, file_cap)))
+    for meta, fut in futures:
+        try:
+            path, status = fut.result()
+            results.append((meta, path, status))
+        except Exception as e:
+            status = "skipped_size" if isinstance(e, _CapReached) else f"failed: {e}"
+            logger.warning("Attachment %s of %s not ingested: %s", meta.get("filename"), jira_id, e, extra={"run_id": "-", "step": "attachments"})
+            results.append((meta, None, status))
+    return results
+
+
+def _iter_sheets(path):
+    """(sheet name, row iterator) pairs; rows are tuples of cell values."""
+    lower = path.lower()
+    if lower.endswith((".xlsx", ".xlsm")):
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for ws in wb.worksheets:
+                yield ws.title, ws.iter_rows(values_only=True)
+        finally:
+            wb.close()
+        return
+    with open(path, newline="", encoding="utf-8-sig", errors="replace") as fh:
+        yield None, csv.reader(fh, delimiter="\t" if lower.endswith(".tsv") else ",")
+
+
+def _cell(v):
+    if v is None:
+        return ""
+    if isinstance(v, float) and v.is_integer():
+        v = int(v)
+    return str(v).strip()
+
+
+def _columns(header):
+    cols = {}
+    for idx, h in enumerate(header):
+        h = _cell(h).lower()
+        if not h:
+            continue
+        for kind, rx in _COLUMN_RES.items():
+            if kind in cols or not rx.search(h):
+                continue
+            if kind == "item_codes" and _NOT_CODE_RE.search(h):
+                continue
+            cols[kind] = idx
+            break
+    return cols
+
+
+def _normalize(kind, value):
+    if not value:
+        return None
+    if kind == "states":
+        v = value.upper()
+        return v if len(v) == 2 and v.isalpha() else STATE_NAMES.get(v)
+    if kind == "postal_codes":
+        digits = value.split("-")[0]
+        return digits.zfill(5) if digits.isdigit() and len(digits) <= 5 else None
+    if kind == "item_codes":
+        return value.upper()
+    return value
+
+
+def table_from_rows(rows, file, sheet=None, max_rows=None):
+    """One structured table from an iterable of row sequences, or None without a recognizable header.
+    Stops pulling rows once max_rows data rows are read, so lazy sources are never read further."""
+    max_rows = max_rows or CONFIG.attachment_max_rows
+    cols, header, scanned, data_rows = {}, None, 0, 0
+    values = {kind: {} for kind in _COLUMN_RES}
+    for row in rows:
+        if header is None:
+            scanned += 1
+            cols = _columns(row)
+            if cols:
+                header = [_cell(c) for c in row]
+            elif scanned >= 20:
+                break   # no header in the first 20 rows: not a product/jurisdiction table
+            continue
+        if data_rows >= max_rows:
+            break
+        data_rows += 1
+        for kind, idx in cols.items():
+            v = _normalize(kind, _cell(row[idx]) if idx < len(row) else "")
+            if v:
+                values[kind][v] = None   # dict as an ordered set
+    if header is None:
+        return None
+    return {"file": file, "sheet": sheet, "rows": data_rows, "columns": {kind: header[idx] for kind, idx in cols.items()},
+            **{kind: list(v) for kind, v in values.items()}}
+
+
+def parse_tables(path, filename=None, max_rows=None):
+    """Structured tables (see module doc) from one CSV/XLSX, one per sheet that has a recognizable header."""
+    tables = []
+    for sheet, rows in _iter_sheets(path):
+        table = table_from_rows(rows, filename or os.path.basename(path), sheet, max_rows)
+        if table is not None:
+            tables.append(table)
+    return tables
+
+
+def ingest_attachments(session, jira_id, attachments, dest_dir=None):
+    """Download + parse a ticket's spreadsheet attachments; (tables, per-file report)."""
+    tables, report = [], []
+    for meta, path, status in download_attachments(session, jira_id, attachments, dest_dir):
+        entry = {"file": meta.get("filename"), "size": meta.get("size"), "status": status}
+        if path:
+            try:
+                with span("stage.parse_attachment", file=meta.get("filename")) as sp:
+                    found = parse_tables(path, meta.get("filename"))
+                    sp.set(tables=len(found))
+                tables.extend(found)
+                entry["tables"] = len(found)
+            except Exception as e:
+                logger.warning("Failed parsing attachment %s of %s: %s", meta.get("filename"), jira_id, e, extra={"run_id": "-", "step": "attachments"})
+                entry["status"] = f"parse_failed: {e}"
+        report.append(entry)
+    if report:
+        record_event("attachments", jira_id=jira_id, files=len(report), tables=len(tables))
+    return tables, report
+
+
+def merge_tables(extraction, tables):
+    """Add the attachment values to the extraction's lists (order kept, no duplicates); returns what was added."""
+    added = {}
+    for kind in _COLUMN_RES:
+        current = list(extraction.get(kind) or [])
+        seen = {str(x).upper() for x in current}
+        new = []
+        for t in tables:
+            for v in t.get(kind) or []:
+                if v.upper() not in seen:
+                    seen.add(v.upper())
+                    new.append(v)
+        if new:
+            extraction[kind] = current + new
+            added[kind] = len(new)
+    return added
@@ -0,0 +1,72 @@
+"""
+Process-wide Google credentials and per-thread API service objects.
+
+Loading the service-account file and `build()`-ing a service (discovery
+document, HTTP transport) used to happen on every doc/sheet fetch. Credentials
+are now loaded once per (file, scopes) and refresh their token in place;
+services are built once per thread, since the httplib2 transport underneath a
+service object is not thread-safe.
+"""
+import logging
+import threading
+
+from ..config import CONFIG
+from ..metrics import span
+
+logger = logging.getLogger("vttfg.google")
+
+_SCOPES = {
+    "docs": ("https://www.googleapis.com/auth/documents.readonly",),
+    "sheets": ("https://www.googleapis.com/auth/spreadsheets.readonly",),
+    "drive": ("https://www.googleapis.com/auth/drive.metadata.readonly",),
+}
+
+_creds = {}
+_generation = 0
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def _libs():
+    try:
+        from googleapiclient.discovery import build
+        from google.oauth2 import service_account
+    except Exception as e:
+        logger.exception("google client libs not installed")
+        raise RuntimeError("google-api-python-client and google-auth required") from e
+    return build, service_account
+
+
+def get_credentials(scopes):
+    if not CONFIG.google_credentials:
+        raise RuntimeError("GOOGLE_CREDENTIALS_JSON not set in .env")
+    key = (CONFIG.google_credentials, tuple(scopes))
+    with _lock:
+        creds = _creds.get(key)
+        if creds is None:
+            _, service_account = _libs()
+            creds = _creds[key] = service_account.Credentials.from_service_account_file(CONFIG.google_credentials, scopes=list(scopes))
+        return creds
+
+
+def get_service(api, version):
+    """This thread's service object for `api` (docs | sheets | drive)."""
+    services = getattr(_local, "services", None)
+    if services is None:
+        services = _local.services = {}
+    key = (api, version, CONFIG.google_credentials, _generation)
+    service = services.get(key)
+    if service is None:
+        build, _ = _libs()
+        creds = get_credentials(_SCOPES[api])
+        with span("google.build_service", api=api):
+            service = services[key] = build(api, version, credentials=creds, cache_discovery=False)
+    return service
+
+
+def reset():
+    """Forget cached credentials (e.g. after rotating the key file); every thread rebuilds its services."""
+    global _generation
+    with _lock:
+        _creds.clear()
+        _generation += 1
@@ -1,23 +1,103 @@
-import logging, re
+import contextvars, hashlib, logging, os, re, asyncio, threading, time
+from concurrent.futures import ThreadPoolExecutor
 from ..config import CONFIG
+from ..metrics import span, record_event
+from .google_auth import get_service
 logger = logging.getLogger("vttfg.gdocs")
 
-def fetch_doc_text(url: str) -> str:
-    if not CONFIG.google_credentials:
-        raise RuntimeError("GOOGLE_CREDENTIALS_JSON not set in .env")
-    try:
-        from googleapiclient.discovery import build
-        from google.oauth2 import service_account
-    except Exception as e:
-        logger.exception("google client libs not installed")
-        raise RuntimeError("google-api-python-client and google-auth required") from e
-    m = re.search(r"/d/([a-zA-Z0-9_-]+)", url)
-    if not m:
-        return f"[Unsupported document URL: {url}]"
-    doc_id = m.group(1)
-    creds = service_account.Credentials.from_service_account_file(CONFIG.google_credentials, scopes=["https://www.googleapis.com/auth/documents.readonly"])
-    service = build("docs", "v1", credentials=creds)
-    doc = service.documents().get(documentId=doc_id).execute()
+_DOC_ID_RE = re.compile(r"/d/([a-zA-Z0-9_-]+)")
+
+
+class DocTextCache:
+    """
+    Doc text on disk, one file per (doc id, revisionId): <dir>/<doc id>/<revision hash>.txt.
+
+    A doc is re-downloaded only when its revisionId moves; writing a new revision
+    drops the older ones, and the least recently used docs go once there are more
+    than max_docs. Revision lookups are remembered for CONFIG.gdocs_revision_ttl_s
+    so a batch of tickets citing the same policy doc checks it once. Readers get
+    no revisionId from the Docs API; for them the revision is the Drive file's
+    version + modifiedTime.
+    """
+    def __init__(self, root=None, max_docs=None, revision_ttl_s=None):
+        self.root = root or CONFIG.gdocs_cache_dir
+        self.max_docs = max_docs or CONFIG.gdocs_cache_max_docs
+        self.revision_ttl_s = CONFIG.gdocs_revision_ttl_s if revision_ttl_s is None else revision_ttl_s
+        self._revisions = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, doc_id, revision):
+        return os.path.join(self.root, doc_id, hashlib.sha256(revision.encode("utf-8")).hexdigest()[:24] + ".txt")
+
+    def recent_revision(self, doc_id):
+        with self._lock:
+            hit = self._revisions.get(doc_id)
+        return hit[0] if hit and time.monotonic() - hit[1] < self.revision_ttl_s else None
+
+    def remember_revision(self, doc_id, revision):
+        with self._lock:
+            self._revisions[doc_id] = (revision, time.monotonic())
+
+    def get(self, doc_id, revision):
+        path = self._path(doc_id, revision)
+        try:
+            with open(path, encoding="utf-8") as fh:
+                text = fh.read()
+        except OSError:
+            return None
+        try:
+            # LRU touch; another thread may have evicted the doc since the read
+            os.utime(os.path.dirname(path))
+        except OSError:
+            pass
+        return text
+
+    def put(self, doc_id, revision, text):
+        path = self._path(doc_id, revision)
+        d = os.path.dirname(path)
+        os.makedirs(d, exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        os.replace(tmp, path)
+        for name in os.listdir(d):
+            if name.endswith(".txt") and os.path.join(d, name) != path:
+                os.remove(os.path.join(d, name))
+        self._evict()
+
+    def _evict(self):
+        docs = [e for e in os.scandir(self.root) if e.is_dir()]
+        if len(docs) <= self.max_docs:
+            return
+        docs.sort(key=lambda e: e.stat().st_mtime)
+        for e in docs[:len(docs) - self.max_docs]:
+            for name in os.listdir(e.path):
+                os.remove(os.path.join(e.path, name))
+            os.rmdir(e.path)
+
+
+_cache = None
+_lock = threading.Lock()
+_pool = None
+
+
+def get_doc_cache():
+    """Process-wide DocTextCache, or None when CONFIG.gdocs_cache_enabled is off or the dir is unusable."""
+    global _cache
+    if not CONFIG.gdocs_cache_enabled:
+        return None
+    with _lock:
+        if _cache is None:
+            try:
+                _cache = DocTextCache()
+            except OSError as e:
+                logger.warning("Doc cache unavailable: %s", e, extra={"run_id": "-", "step": "gdocs_cache"})
+                _cache = False
+        return _cache or None
+
+
+def _doc_text(doc):
     content = []
     for el in doc.get("body", {}).get("content", []):
         if "paragraph" in el:
@@ -26,3 +106,90 @@ def fetch_doc_text(url: str) -> str:
                 if txt:
                     content.append(txt)
     return "\n".join(content)
+
+
+def _drive_revision(doc_id):
+    meta = get_service("drive", "v3").files().get(fileId=doc_id, fields="version,modifiedTime", supportsAllDrives=True).execute()
+    if meta.get("version") or meta.get("modifiedTime"):
+        return f"drive:{meta.get('version')}:{meta.get('modifiedTime')}"
+    return None
+
+
+def _revision(service, cache, doc_id):
+    """
+    The doc's cache revision: its revisionId (only returned to editors), else
+    the Drive version. "" when neither is available; that is remembered too, so
+    such a doc is not probed again before every fetch.
+    """
+    rev = cache.recent_revision(doc_id)
+    if rev is None:
+        with span("gdocs.revision", doc_id=doc_id) as sp:
+            rev = service.documents().get(documentId=doc_id, fields="revisionId").execute().get("revisionId")
+            if not rev:
+                try:
+                    rev = _drive_revision(doc_id)
+                except Exception as e:
+                    logger.warning("Drive version lookup failed for %s: %s", doc_id, e, extra={"run_id": "-", "step": "gdocs_cache"})
+                sp.set(source="drive")
+        rev = rev or ""
+        cache.remember_revision(doc_id, rev)
+    return rev
+
+
+def fetch_doc_text(url: str) -> str:
+    """Plain text of a Google Doc; served from the doc cache while its revision is unchanged."""
+    m = _DOC_ID_RE.search(url)
+    if not m:
+        return f"[Unsupported document URL: {url}]"
+    if "/spreadsheets/d/" in url:
+        return f"[Spreadsheet {url}: read as a table]"
+    doc_id = m.group(1)
+    service = get_service("docs", "v1")
+    cache = get_doc_cache()
+    rev = _revision(service, cache, doc_id) if cache else None
+    if rev:
+        text = cache.get(doc_id, rev)
+        if text is not None:
+            record_event("gdocs_cache_hit", doc_id=doc_id)
+            return text
+    with span("gdocs.fetch_doc", doc_id=doc_id) as sp:
+        doc = service.documents().get(documentId=doc_id).execute()
+        text = _doc_text(doc)
+        sp.set(bytes=len(text.encode("utf-8")))
+    # the probed Drive version is the key when the fetch carries no revisionId
+    rev = doc.get("revisionId") or rev
+    if cache and rev:
+        cache.remember_revision(doc_id, rev)
+        try:
+            cache.put(doc_id, rev, text)
+        except OSError as e:
+            logger.warning("Failed caching doc %s: %s", doc_id, e, extra={"run_id": "-", "step": "gdocs_cache"})
+    return text
+
+
+def fetch_docs_text(urls):
+    """
+    Texts for `urls` (same order), fetched concurrently on a process-wide pool of
+    CONFIG.gdocs_max_concurrency workers; a doc that fails yields its exception.
+    """
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=max(1, CONFIG.gdocs_max_concurrency), thread_name_prefix="vttfg-gdocs")
+    futures = {}
+    for url in urls:
+        if url not in futures:
+            futures[url] = _pool.submit(contextvars.copy_context().run, fetch_doc_text, url)
+    out = []
+    for url in urls:
+        try:
+            out.append(futures[url].result())
+        except Exception as e:
+            logger.warning("Failed fetching linked doc %s: %s", url, e)
+            out.append(e)
+    return out
+
+
+async def fetch_doc_text_async(url: str) -> str:
+    """asyncio variant of fetch_doc_text; googleapiclient is blocking, so it runs on a worker thread."""
+    return await asyncio.to_thread(fetch_doc_text, url)
@@ -1,27 +1,146 @@
+"""
+Google Sheets, read in row-range pages.
+
+Taxability and product-mapping sheets run to tens of thousands of rows; one
+values().get over the whole tab is slow, memory hungry and can hit the API's
+response-size limit. Readers here request CONFIG.gsheets_page_rows rows at a
+time and are lazy: stop iterating (or pass max_rows) and no further pages are
+requested.
+
+- iter_rows      raw row lists
+- iter_records   {header: value} dicts (first row of the range is the header)
+- iter_columns   {header: [values]} per page, columnar
+- iter_frames    pandas DataFrame per page
+
+`url_or_id` is a sheet URL (its #gid=... picks the tab) or a bare id; `tab` names
+a tab explicitly and `a1_range` ("Products!B2:F", "A:D") narrows columns/rows.
+Without either, the first tab is read.
+"""
 import logging, re
 from ..config import CONFIG
+from ..metrics import span
+from .google_auth import get_service
 logger = logging.getLogger("vttfg.gsheets")
 
-def fetch_sheet_table(url_or_id: str):
-    if not CONFIG.google_credentials:
-        raise RuntimeError("GOOGLE_CREDENTIALS_JSON not set in .env")
-    try:
-        from googleapiclient.discovery import build
-        from google.oauth2 import service_account
-    except Exception as e:
-        logger.exception("google client libs not installed")
-        raise RuntimeError("google-api-python-client and google-auth required") from e
-    m = re.search(r"/spreadsheets/d/([a-zA-Z0-9_-]+)", url_or_id)
-    sheet_id = m.group(1) if m else url_or_id
-    creds = service_account.Credentials.from_service_account_file(CONFIG.google_credentials, scopes=["https://www.googleapis.com/auth/spreadsheets.readonly"])
-    service = build("sheets", "v4", credentials=creds)
-    sheet = service.spreadsheets().values().get(spreadsheetId=sheet_id, range="Sheet1").execute()
-    values = sheet.get("values", [])
-    if not values:
-        return []
-    headers = values[0]
-    rows = []
-    for row in values[1:]:
-        obj = {headers[i]: row[i] if i < len(row) else "" for i in range(len(headers))}
-        rows.append(obj)
-    return rows
+_ID_RE = re.compile(r"/spreadsheets/d/([a-zA-Z0-9_-]+)")
+_GID_RE = re.compile(r"[#&?]gid=(\d+)")
+_A1_RE = re.compile(r"^(?P<c0>[A-Z]+)?(?P<r0>\d+)?(?::(?P<c1>[A-Z]+)?(?P<r1>\d+)?)?$")
+
+
+def sheet_id(url_or_id: str) -> str:
+    m = _ID_RE.search(url_or_id)
+    return m.group(1) if m else url_or_id
+
+
+def is_sheet_url(url: str) -> bool:
+    return bool(_ID_RE.search(url or ""))
+
+
+def _tabs(service, spreadsheet_id):
+    with span("gsheets.metadata", sheet_id=spreadsheet_id):
+        meta = service.spreadsheets().get(spreadsheetId=spreadsheet_id,
+                                          fields="sheets.properties(sheetId,title,gridProperties.rowCount)").execute()
+    return [s.get("properties", {}) for s in meta.get("sheets", [])]
+
+
+def _resolve(service, url_or_id, tab, a1_range):
+    """(spreadsheet id, tab title, first col, last col, first row, last row)."""
+    spreadsheet_id = sheet_id(url_or_id)
+    c0 = c1 = r1 = None
+    r0 = 1
+    if a1_range and "!" not in a1_range and not _A1_RE.match(a1_range.replace("$", "")):
+        tab, a1_range = a1_range, None   # just a tab name
+    if a1_range:
+        tab_part, _, cells = a1_range.rpartition("!")
+        m = _A1_RE.match(cells.replace("$", "").upper())
+        if not m:
+            raise ValueError(f"unsupported A1 range: {a1_range}")
+        tab = tab_part.strip("'").replace("''", "'") or tab
+        c0, c1 = m.group("c0"), m.group("c1") or m.group("c0")
+        r0 = int(m.group("r0") or 1)
+        r1 = int(m.group("r1")) if m.group("r1") else None
+    tabs = _tabs(service, spreadsheet_id)
+    if not tabs:
+        raise ValueError(f"spreadsheet {spreadsheet_id} has no tabs")
+    props = tabs[0]
+    if tab:
+        props = next((p for p in tabs if p.get("title") == tab), None)
+        if props is None:
+            raise ValueError(f"spreadsheet {spreadsheet_id} has no tab {tab!r}")
+    else:
+        gid = _GID_RE.search(url_or_id)
+        if gid:
+            props = next((p for p in tabs if str(p.get("sheetId")) == gid.group(1)), props)
+    row_count = (props.get("gridProperties") or {}).get("rowCount") or 0
+    last = min(r1, row_count) if r1 and row_count else (r1 or row_count)
+    return spreadsheet_id, props.get("title"), c0, c1, r0, last
+
+
+def iter_pages(url_or_id: str, tab: str = None, a1_range: str = None, page_rows: int = None, max_rows: int = None):
+    """Lists of raw rows, one per page of at most page_rows rows, until the tab/range or max_rows ends."""
+    service = get_service("sheets", "v4")
+    spreadsheet_id, title, c0, c1, first, last = _resolve(service, url_or_id, tab, a1_range)
+    page_rows = page_rows or CONFIG.gsheets_page_rows
+    cols = (c0 or "A", c1 or "") if c0 else None
+    quoted = "'" + title.replace("'", "''") + "'"
+    start, sent = first, 0
+    while last and start <= last and (max_rows is None or sent < max_rows):
+        end = min(start + page_rows - 1, last)
+        rng = f"{quoted}!{cols[0]}{start}:{cols[1]}{end}" if cols else f"{quoted}!{start}:{end}"
+        with span("gsheets.page", sheet_id=spreadsheet_id, start_row=start) as sp:
+            values = service.spreadsheets().values().get(spreadsheetId=spreadsheet_id, range=rng).execute().get("values", [])
+            sp.set(rows=len(values))
+        if max_rows is not None:
+            values = values[:max_rows - sent]
+        if values:
+            sent += len(values)
+            yield values
+        start = end + 1
+
+
+def iter_rows(url_or_id: str, **kw):
+    for page in iter_pages(url_or_id, **kw):
+        yield from page
+
+
+def _header_and_pages(url_or_id, kw):
+    header = None
+    for page in iter_pages(url_or_id, **kw):
+        if header is None:
+            header, page = [str(h) for h in page[0]], page[1:]
+        yield header, page
+
+
+def iter_records(url_or_id: str, **kw):
+    """{header: value} per row, padding short rows with ""."""
+    for header, page in _header_and_pages(url_or_id, kw):
+        for row in page:
+            yield {h: row[i] if i < len(row) else "" for i, h in enumerate(header)}
+
+
+def iter_columns(url_or_id: str, columns=None, **kw):
+    """{header: [values]} per page; `columns` keeps only those headers."""
+    for header, page in _header_and_pages(url_or_id, kw):
+        wanted = [(i, h) for i, h in enumerate(header) if columns is None or h in columns]
+        if page:
+            yield {h: [row[i] if i < len(row) else "" for row in page] for i, h in wanted}
+
+
+def iter_frames(url_or_id: str, columns=None, **kw):
+    import pandas as pd
+    for chunk in iter_columns(url_or_id, columns=columns, **kw):
+        yield pd.DataFrame(chunk)
+
+
+def fetch_sheet_table(url_or_id: str, tab: str = None, max_rows: int = None):
+    """All rows as {header: value} dicts (kept for callers that want a list)."""
+    return list(iter_records(url_or_id, tab=tab, max_rows=max_rows))
+
+
+def sheet_tables(url: str, max_rows: int = None):
+    """Product/jurisdiction tables (connectors.attachments shape) from the sheet's tab; reads only as far as needed."""
+    from .attachments import table_from_rows
+    max_rows = max_rows or CONFIG.attachment_max_rows
+    # +20: header search rows; the table stops pulling pages once it has max_rows data rows
+    table = table_from_rows(iter_rows(url, max_rows=max_rows + 20), url, sheet_id(url), max_rows)
+    return [table] if table else []
@@ -0,0 +1,42 @@
+"""
+Shared `requests.Session` objects with a sized connection pool.
+
+A bare `requests.get` opens a new connection (and TLS handshake) per call. One
+Session per (service, base_url, user) keeps connections alive across calls and
+threads; the mounted HTTPAdapter holds up to CONFIG.http_pool_size connections
+per host, so concurrent page fetches don't queue on the pool or get discarded.
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..config import CONFIG
+
+_sessions = {}
+_lock = threading.Lock()
+
+
+def get_session(key, auth=None, headers=None, pool_size=None):
+    """Process-wide Session for `key`; auth and headers are fixed when it is first built."""
+    with _lock:
+        s = _sessions.get(key)
+        if s is None:
+            size = pool_size or CONFIG.http_pool_size
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=size, pool_block=False)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            if auth is not None:
+                s.auth = auth
+            if headers:
+                s.headers.update(headers)
+            _sessions[key] = s
+        return s
+
+
+def close_sessions():
+    with _lock:
+        for s in _sessions.values():
+            s.close()
+        _sessions.clear()
@@ -1,25 +1,203 @@
-import requests, logging, re
+import asyncio, contextvars, logging, re, threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
 from ..config import CONFIG
 from ..models import JiraContext
+from ..metrics import span
+from .adf import adf_to_text
+from .attachments import attachment_meta, ingest_attachments as _ingest
+from .http_session import get_session
+from .jira_cache import get_jira_cache
 logger = logging.getLogger("vttfg.jira")
 
-def fetch_issue(issue_key: str) -> JiraContext:
+# REST API version used by both Jira connectors (v3: descriptions and comment bodies arrive as ADF)
+API_PATH = "/rest/api/3"
+
+def _session():
+    return get_session(("jira", CONFIG.jira_base_url.rstrip("/"), CONFIG.jira_user), auth=(CONFIG.jira_user, CONFIG.jira_api_token),
+                       headers={"Accept": "application/json"})
+
+def _require_credentials():
     if not CONFIG.jira_base_url or not CONFIG.jira_user or not CONFIG.jira_api_token:
         raise RuntimeError("JIRA credentials not set in .env")
+
+def fetch_issue(issue_key: str) -> JiraContext:
+    """The issue as a JiraContext; served from the snapshot cache while its `updated` stamp is unchanged."""
+    cache = get_jira_cache()
+    if cache is None:
+        return _fetch_issue(issue_key)
+    return cache.fetch(issue_key, lambda: _fetch_updated(issue_key), lambda: _fetch_issue(issue_key))
+
+def _fetch_updated(issue_key: str) -> str:
+    _require_credentials()
+    base = CONFIG.jira_base_url.rstrip("/")
+    with span("jira.revalidate", jira_id=issue_key) as sp:
+        resp = _session().get(f"{base}{API_PATH}/issue/{issue_key}", params={"fields": "updated"}, timeout=15)
+        resp.raise_for_status()
+        sp.set(bytes=len(resp.content))
+    return (resp.json().get("fields") or {}).get("updated") or ""
+
+def _fetch_issue(issue_key: str) -> JiraContext:
+    _require_credentials()
     base = CONFIG.jira_base_url.rstrip("/")
-    url = f"{base}/rest/api/3/issue/{issue_key}?expand=renderedFields,changelog"
-    resp = requests.get(url, auth=(CONFIG.jira_user, CONFIG.jira_api_token), timeout=30)
-    resp.raise_for_status()
-    data = resp.json()
+    url = f"{base}{API_PATH}/issue/{issue_key}?expand=renderedFields,changelog"
+    with span("jira.fetch_issue", jira_id=issue_key) as sp:
+        resp = _session().get(url, timeout=30)
+        resp.raise_for_status()
+        sp.set(bytes=len(resp.content))
+        data = resp.json()
+    return build_context(issue_key, data)
+
+def _parse_created(value) -> datetime:
+    if value:
+        try:
+            return datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            try:
+                return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S.%f%z")
+            except ValueError:
+                pass
+    return datetime.utcnow()
+
+def build_context(issue_key: str, data: dict, comments: list = None) -> JiraContext:
+    """JiraContext from an issue payload (GET issue or one search hit); comments default to the embedded ones."""
     fields = data.get("fields", {})
-    title = fields.get("summary") or ""
-    # description may be object; coerce to string
-    desc = fields.get("description") or ""
-    if isinstance(desc, dict):
-        desc = str(desc)
-    comments = []
-    for c in fields.get("comment", {}).get("comments", []):
-        body = c.get("body") if isinstance(c.get("body"), str) else str(c.get("body"))
-        comments.append(body)
-    urls = re.findall(r"https?://\\S+", str(desc))
-    return JiraContext(jira_id=issue_key, title=title, description=desc, comments=comments, linked_docs=urls, raw_payload=data)
+    # v3 returns the description as an ADF document
+    desc = adf_to_text(fields.get("description"))
+    if comments is None:
+        comments = [_comment_body(c) for c in fields.get("comment", {}).get("comments", [])]
+    return JiraContext(jira_id=issue_key, title=fields.get("summary") or "", description=desc, comments=comments,
+                       linked_docs=linked_urls(desc, comments), attachments=attachment_meta(fields),
+                       created_at=_parse_created(fields.get("created")), updated=fields.get("updated") or "", raw_payload=data)
+
+# ADF links render as "text (url)" (see adf.py), so ")" ends a URL
+_URL_RE = re.compile(r"https?://[^\s)>\"]+")
+
+def linked_urls(description: str, comments) -> list:
+    """URLs in the description and every comment, deduplicated in order of appearance."""
+    urls = {}
+    for text in [description, *(comments or [])]:
+        for m in _URL_RE.finditer(text or ""):
+            urls[m.group(0).rstrip(".,;")] = None
+    return list(urls)
+
+def _comment_body(c: dict) -> str:
+    return adf_to_text(c.get("body"))
+
+def ingest_attachments(jc: JiraContext):
+    """(tables, report) from the ticket's CSV/XLSX attachments; see connectors.attachments."""
+    return _ingest(_session(), jc.jira_id, jc.attachments)
+
+async def fetch_issue_async(issue_key: str) -> JiraContext:
+    """asyncio variant of fetch_issue; the blocking HTTP call runs on a worker thread."""
+    return await asyncio.to_thread(fetch_issue, issue_key)
+
+def search_issue_keys(jql: str, max_results: int = 1000) -> list:
+    """Return issue keys matching a JQL query (paged through the search endpoint)."""
+    _require_credentials()
+    keys = []
+    for issues in search_pages(_session(), CONFIG.jira_base_url.rstrip("/"), jql, "key", min(100, max_results)):
+        keys.extend(i.get("key") for i in issues if i.get("key"))
+        if len(keys) >= max_results:
+            break
+    return keys[:max_results]
+
+_KEY_RE = re.compile(r"^[A-Za-z][A-Za-z0-9_]*-\d+$")
+SEARCH_FIELDS = "summary,description,created,updated,comment,attachment"
+
+def jql_for_keys(keys, chunk: int = 100):
+    """`key in (...)` queries of at most `chunk` keys; malformed keys are dropped (they would fail the whole query)."""
+    keys = [k.strip().upper() for k in keys if k and _KEY_RE.match(k.strip())]
+    for i in range(0, len(keys), chunk):
+        yield "key in (" + ",".join(keys[i:i + chunk]) + ")"
+
+def search_issues(keys=None, jql: str = None, page_size: int = None):
+    """search_contexts over the configured Jira site."""
+    _require_credentials()
+    yield from search_contexts(_session(), CONFIG.jira_base_url.rstrip("/"), keys, jql, page_size)
+
+# Bulk search, shared by this module and JiraConnector: each helper takes the
+# requests session and site base URL to use.
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def submit_request(fn, *args, **kwargs):
+    """Run fn on the process-wide Jira page pool (search prefetch, issue and comment pages), inside the caller's run context."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=CONFIG.jira_page_concurrency, thread_name_prefix="vttfg-jira")
+    return _pool.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+def search_contexts(session, base: str, keys=None, jql: str = None, page_size: int = None):
+    """
+    Yield a JiraContext per issue for `keys` and/or a `jql` query, a search page at a time.
+    Comments arrive embedded in the search results; the comment endpoint is only
+    paged (concurrently) for issues whose embedded list is truncated. Missing keys
+    are skipped. Cached keys are revalidated with one `updated` sweep and only
+    changed ones refetched.
+    """
+    cache = get_jira_cache()
+    if cache is not None and keys:
+        fresh, keys = cache.split(list(keys), lambda k, since: updated_since(session, base, k, since))
+        yield from fresh
+    if cache is not None and cache.offline:
+        if jql:
+            raise RuntimeError("JQL search needs Jira; JIRA_OFFLINE is set")
+        return
+    for query in list(jql_for_keys(keys or [])) + ([jql] if jql else []):
+        for issues in search_pages(session, base, query, SEARCH_FIELDS, page_size or CONFIG.jira_search_page_size):
+            for issue in issues:
+                jc = context_from_search(session, base, issue)
+                yield cache.put(jc) if cache is not None else jc
+
+def search_page(session, base: str, jql: str, start_at: int, max_results: int, fields: str = SEARCH_FIELDS) -> dict:
+    params = {"jql": jql, "fields": fields, "startAt": start_at, "maxResults": max_results, "validateQuery": "warn"}
+    with span("jira.search", start_at=start_at) as sp:
+        resp = session.get(f"{base}{API_PATH}/search", params=params, timeout=60)
+        resp.raise_for_status()
+        sp.set(bytes=len(resp.content))
+        return resp.json()
+
+def search_pages(session, base: str, jql: str, fields: str, page_size: int):
+    """Yield the issue list of each search page; the next page is requested before the current one is handed out."""
+    nxt = submit_request(search_page, session, base, jql, 0, page_size, fields)
+    while nxt is not None:
+        data = nxt.result()
+        issues = data.get("issues") or []
+        start = data.get("startAt", 0) + len(issues)
+        nxt = submit_request(search_page, session, base, jql, start, page_size, fields) if issues and start < data.get("total", 0) else None
+        yield issues
+
+def updated_since(session, base: str, keys, since):
+    """(key, updated) for `keys` updated at or after the JQL date `since` (all of them when None)."""
+    for query in jql_for_keys(keys):
+        if since:
+            query += f' AND updated >= "{since}"'
+        for issues in search_pages(session, base, query, "updated", CONFIG.jira_search_page_size):
+            for issue in issues:
+                yield issue.get("key"), (issue.get("fields") or {}).get("updated") or ""
+
+def comment_page(session, base: str, issue_key: str, start_at: int = 0, max_results: int = 50) -> dict:
+    with span("jira.comment_page", jira_id=issue_key, start_at=start_at) as sp:
+        resp = session.get(f"{base}{API_PATH}/issue/{issue_key}/comment", params={"startAt": start_at, "maxResults": max_results}, timeout=30)
+        resp.raise_for_status()
+        sp.set(bytes=len(resp.content))
+        return resp.json()
+
+def submit_comment_pages(session, base: str, issue_key: str, got: int, total: int, step: int) -> list:
+    """Futures for the comment pages after the first `got` comments, all requested at once."""
+    if not got or total <= got:
+        return []
+    return [submit_request(comment_page, session, base, issue_key, start, step) for start in range(got, total, step)]
+
+def context_from_search(session, base: str, issue: dict) -> JiraContext:
+    """JiraContext from one search hit, completing a truncated embedded comment list."""
+    key = issue.get("key")
+    embedded = (issue.get("fields") or {}).get("comment") or {}
+    comments = [_comment_body(c) for c in embedded.get("comments") or []]
+    step = embedded.get("maxResults") or CONFIG.jira_comment_page_size
+    for f in submit_comment_pages(session, base, key, len(comments), embedded.get("total", len(comments)) or 0, step):
+        comments.extend(_comment_body(c) for c in f.result().get("comments", []) or [])
+    return build_context(key, issue, comments)
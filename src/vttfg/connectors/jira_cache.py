@@ -0,0 +1,242 @@
+"""
+On-disk JiraContext snapshots (SQLite), revalidated against the issue's `updated` stamp.
+
+Re-opening a ticket normally re-downloads the issue, every comment page and the
+raw payload. With a snapshot on disk the connectors first ask Jira for just
+`updated` (fields=updated, a few hundred bytes) and only refetch when it moved:
+
+- one ticket:  JiraSnapshotCache.fetch(key, get_updated, get_full)
+- a batch:     JiraSnapshotCache.split(keys, sweep) runs a single JQL sweep
+               `key in (...) AND updated >= <watermark>` over the cached keys;
+               only the keys it reports as changed (plus uncached ones) are refetched
+
+Snapshots are zlib-compressed JSON, evicted LRU by entry count / total bytes
+(CONFIG.jira_cache_max_entries / jira_cache_max_mb). CONFIG.jira_offline serves
+snapshots without touching the network and fails for tickets that have none;
+when revalidation itself fails (VPN down, Jira outage) the snapshot is served
+with a warning instead of failing the run.
+"""
+from __future__ import annotations
+import datetime
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import asdict
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from ..config import CONFIG
+from ..metrics import record_event
+from ..models import JiraContext
+
+logger = logging.getLogger("vttfg.jira_cache")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    key TEXT PRIMARY KEY,
+    updated TEXT,
+    payload BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    fetched REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_accessed ON snapshots(accessed);
+"""
+
+
+def _dump(jc: JiraContext) -> bytes:
+    return zlib.compress(json.dumps(asdict(jc), default=str, ensure_ascii=False).encode("utf-8"), 6)
+
+
+def _load(blob: bytes) -> JiraContext:
+    d = json.loads(zlib.decompress(blob).decode("utf-8"))
+    try:
+        d["created_at"] = datetime.datetime.fromisoformat(d.get("created_at"))
+    except Exception:
+        d.pop("created_at", None)
+    return JiraContext(**{k: v for k, v in d.items() if k in JiraContext.__annotations__})
+
+
+def watermark(updated_values: Iterable[str]) -> Optional[str]:
+    """
+    JQL date ("yyyy/MM/dd HH:mm") one day before the oldest `updated`, or None if none parse.
+    JQL reads dates in the Jira user's timezone; the day of slack covers any offset,
+    and the sweep compares exact stamps afterwards, so over-matching is harmless.
+    """
+    stamps = []
+    for u in updated_values:
+        try:
+            stamps.append(datetime.datetime.strptime(u, "%Y-%m-%dT%H:%M:%S.%f%z").astimezone(datetime.timezone.utc))
+        except (TypeError, ValueError):
+            continue
+    if not stamps:
+        return None
+    return (min(stamps) - datetime.timedelta(days=1)).strftime("%Y/%m/%d %H:%M")
+
+
+class JiraSnapshotCache:
+    def __init__(self, path: Optional[str] = None, max_entries: Optional[int] = None,
+                 max_bytes: Optional[int] = None, offline: Optional[bool] = None):
+        self.path = path or CONFIG.jira_cache_path
+        self.max_entries = max_entries or CONFIG.jira_cache_max_entries
+        self.max_bytes = max_bytes or CONFIG.jira_cache_max_mb * 1024 * 1024
+        self.offline = CONFIG.jira_offline if offline is None else offline
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        d = os.path.dirname(self.path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, hit: bool, n: int = 1) -> None:
+        with self._counter_lock:
+            if hit:
+                self.hits += n
+            else:
+                self.misses += n
+
+    def get(self, key: str) -> Optional[JiraContext]:
+        try:
+            row = self._conn().execute("SELECT payload FROM snapshots WHERE key=?", (key.upper(),)).fetchone()
+            if row:
+                self._conn().execute("UPDATE snapshots SET accessed=? WHERE key=?", (time.time(), key.upper()))
+                return _load(row[0])
+        except (sqlite3.Error, ValueError, zlib.error) as e:
+            logger.warning("Jira cache read failed for %s: %s", key, e, extra={"run_id": "-", "step": "jira_cache"})
+        return None
+
+    def updated_of(self, keys: Iterable[str]) -> dict:
+        """{KEY: cached updated stamp} for the keys that have a snapshot."""
+        keys = [k.upper() for k in keys]
+        out = {}
+        try:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                out.update(self._conn().execute(f"SELECT key, updated FROM snapshots WHERE key IN ({marks})", chunk).fetchall())
+        except sqlite3.Error as e:
+            logger.warning("Jira cache read failed: %s", e, extra={"run_id": "-", "step": "jira_cache"})
+        return out
+
+    def put(self, jc: JiraContext) -> JiraContext:
+        if not jc or not jc.jira_id:
+            return jc
+        now = time.time()
+        try:
+            blob = _dump(jc)
+            conn = self._conn()
+            conn.execute("INSERT OR REPLACE INTO snapshots(key, updated, payload, size, fetched, accessed) VALUES (?,?,?,?,?,?)",
+                         (jc.jira_id.upper(), jc.updated or "", blob, len(blob), now, now))
+            self._evict(conn)
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning("Jira cache write failed for %s: %s", jc.jira_id, e, extra={"run_id": "-", "step": "jira_cache"})
+        return jc
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM snapshots").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        excess = 0
+        for (size,) in conn.execute("SELECT size FROM snapshots ORDER BY accessed ASC"):
+            if count - excess <= self.max_entries and total <= self.max_bytes:
+                break
+            excess += 1
+            total -= size
+        conn.execute("DELETE FROM snapshots WHERE key IN (SELECT key FROM snapshots ORDER BY accessed ASC LIMIT ?)", (excess,))
+
+    def fetch(self, key: str, get_updated: Callable[[], str], get_full: Callable[[], JiraContext]) -> JiraContext:
+        """The snapshot when Jira's `updated` still matches it, else get_full() (stored)."""
+        snap = self.get(key)
+        if self.offline:
+            if snap is None:
+                raise RuntimeError(f"{key} is not in the local Jira cache (JIRA_OFFLINE is set)")
+            self._count(True)
+            record_event("jira_cache", jira_id=key, result="offline")
+            return snap
+        if snap is not None:
+            try:
+                current = get_updated()
+            except Exception as e:
+                logger.warning("Jira revalidation failed for %s, serving the cached snapshot: %s", key, e, extra={"run_id": "-", "step": "jira_cache"})
+                self._count(True)
+                record_event("jira_cache", jira_id=key, result="stale_served")
+                return snap
+            if current and current == snap.updated:
+                self._count(True)
+                record_event("jira_cache", jira_id=key, result="hit")
+                return snap
+        self._count(False)
+        record_event("jira_cache", jira_id=key, result="miss" if snap is None else "changed")
+        return self.put(get_full())
+
+    def split(self, keys: List[str], sweep: Callable[[List[str], Optional[str]], Iterable[Tuple[str, str]]]) -> Tuple[List[JiraContext], List[str]]:
+        """
+        (fresh snapshots, keys to fetch) for a batch. sweep(cached_keys, since) yields
+        (key, updated) for cached issues updated since the watermark; one changed stamp
+        marks that key for refetch. If the sweep fails the snapshots are served as-is.
+        """
+        cached = self.updated_of(keys)
+        changed = set()
+        if cached and not self.offline:
+            try:
+                for key, updated in sweep(list(cached), watermark(cached.values())):
+                    if (key or "").upper() in cached and updated != cached[key.upper()]:
+                        changed.add(key.upper())
+            except Exception as e:
+                logger.warning("Jira revalidation sweep failed, serving %d cached snapshots: %s", len(cached), e, extra={"run_id": "-", "step": "jira_cache"})
+        fresh, fetch = [], []
+        for key in keys:
+            snap = self.get(key) if key.upper() in cached and key.upper() not in changed else None
+            if snap is not None:
+                fresh.append(snap)
+            else:
+                fetch.append(key)
+        if self.offline and fetch:
+            raise RuntimeError(f"{len(fetch)} tickets are not in the local Jira cache (JIRA_OFFLINE is set): {', '.join(fetch[:10])}")
+        self._count(True, len(fresh))
+        self._count(False, len(fetch))
+        record_event("jira_cache_sweep", keys=len(keys), fresh=len(fresh), changed=len(changed), fetched=len(fetch))
+        return fresh, fetch
+
+    def stats(self) -> dict:
+        try:
+            count, total = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM snapshots").fetchone()
+        except sqlite3.Error:
+            count, total = None, None
+        return {"hits": self.hits, "misses": self.misses, "entries": count, "bytes": total}
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM snapshots")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_jira_cache() -> Optional[JiraSnapshotCache]:
+    """Process-wide snapshot cache, or None when CONFIG.jira_cache_enabled is off or the file is unusable."""
+    global _cache
+    if not CONFIG.jira_cache_enabled and not CONFIG.jira_offline:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = JiraSnapshotCache()
+            except Exception as e:
+                logger.warning("Jira snapshot cache unavailable: %s", e, extra={"run_id": "-", "step": "jira_cache"})
+                _cache = False
+        return _cache or None
@@ -1,16 +1,19 @@
 # src/vttfg/connectors/jira_connector.py
 import logging
-import re
 import requests
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Iterator
 from ..models import JiraContext
 from ..config import CONFIG
-from datetime import datetime
+from ..metrics import span
+from .adf import adf_to_text
+from .attachments import ingest_attachments
+from .http_session import get_session
+from .jira import API_PATH, build_context, comment_page, search_contexts, submit_comment_pages, submit_request
+from .jira_cache import get_jira_cache
 from requests.auth import HTTPBasicAuth
 
 logger = logging.getLogger("vttfg.jira")
 
-_URL_RE = re.compile(r"https?://[^\s)>\"]+")
 
 class JiraConnector:
     """
@@ -45,128 +48,86 @@ class JiraConnector:
         # Standard headers
         self._headers = {"Accept": "application/json"}
 
+        # keep-alive connections shared by every connector for this site/user
+        self.session = get_session(("jira", self.base_url, self.user), auth=self.auth, headers=self._headers,
+                                   pool_size=CONFIG.http_pool_size)
+
     def _issue_url(self, issue_key: str) -> str:
         # Use fields param to limit returned data
-        return f"{self.base_url}/rest/api/2/issue/{issue_key}?fields=summary,description,created,comment,attachment"
+        # comments come from the paginated comment endpoint, fetched alongside
+        return f"{self.base_url}{API_PATH}/issue/{issue_key}?fields=summary,description,created,updated,attachment"
+
+    def _get_issue(self, issue_key: str) -> Dict:
+        with span("jira.fetch_issue", jira_id=issue_key) as sp:
+            r = self.session.get(self._issue_url(issue_key), timeout=30)
+            r.raise_for_status()
+            sp.set(bytes=len(r.content))
+            return r.json()
+
+    def search_issues(self, keys: Optional[List[str]] = None, jql: Optional[str] = None,
+                      page_size: Optional[int] = None) -> Iterator[JiraContext]:
+        """
+        Stream JiraContext objects for issue `keys` and/or a `jql` query via the search
+        endpoint, over this connector's session (see jira.search_contexts).
+        """
+        yield from search_contexts(self.session, self.base_url, keys, jql, page_size)
 
-    def _comment_page(self, issue_key: str, start_at: int = 0, max_results: int = 50) -> Dict:
-        url = f"{self.base_url}/rest/api/2/issue/{issue_key}/comment?startAt={start_at}&maxResults={max_results}"
-        resp = requests.get(url, auth=self.auth, headers=self._headers, timeout=30)
-        resp.raise_for_status()
-        return resp.json()
+    def ingest_attachments(self, jc: JiraContext):
+        """(tables, report) from the ticket's CSV/XLSX attachments, downloaded over this connector's session."""
+        return ingest_attachments(self.session, jc.jira_id, jc.attachments)
 
-    def _extract_urls(self, text: Optional[str]) -> List[str]:
-        if not text:
-            return []
-        return list({m.group(0) for m in _URL_RE.finditer(text)})
+    def _comment_text(self, c: Dict) -> str:
+        # body is ADF on v3; adf_to_text also passes plain (v2 / cached) text through
+        return adf_to_text(c.get("body"))
+
+    def _build_context(self, jira_id: str, payload: Dict, comments_list: List[str]) -> JiraContext:
+        """JiraContext from an issue payload (GET issue or one search hit) plus its comment texts."""
+        return build_context(jira_id, payload, comments_list)
 
     def fetch_issue(self, jira_id: str) -> JiraContext:
         """
         Fetch a JIRA issue and return JiraContext.
+
+        With the Jira cache enabled a stored snapshot is returned as long as the
+        issue's `updated` stamp (one fields=updated request) hasn't moved.
         """
+        cache = get_jira_cache()
+        if cache is None:
+            return self._fetch_issue(jira_id)
+        return cache.fetch(jira_id, lambda: self._get_updated(jira_id), lambda: self._fetch_issue(jira_id))
+
+    def _get_updated(self, issue_key: str) -> str:
+        with span("jira.revalidate", jira_id=issue_key) as sp:
+            r = self.session.get(f"{self.base_url}{API_PATH}/issue/{issue_key}?fields=updated", timeout=15)
+            r.raise_for_status()
+            sp.set(bytes=len(r.content))
+            return (r.json().get("fields") or {}).get("updated") or ""
+
+    def _fetch_issue(self, jira_id: str) -> JiraContext:
         run_ctx = {"run_id": "-", "step": "jira_fetch"}
         try:
-            url = self._issue_url(jira_id)
-            logger.info("Fetching JIRA issue %s from %s", jira_id, url, extra=run_ctx)
-            r = requests.get(url, auth=self.auth, headers=self._headers, timeout=30)
-            r.raise_for_status()
-            payload = r.json()
-            fields = payload.get("fields", {})
-
-            title = fields.get("summary") or ""
-            # description in JIRA can be either a string or structured content
-            description = fields.get("description") or ""
-            # created is ISO8601
-            created_str = fields.get("created")
-            created_at = None
-            if created_str:
-                try:
-                    created_at = datetime.fromisoformat(created_str.replace("Z", "+00:00"))
-                except Exception:
-                    try:
-                        created_at = datetime.strptime(created_str, "%Y-%m-%dT%H:%M:%S.%f%z")
-                    except Exception:
-                        created_at = datetime.utcnow()
-
-            # Comments: JIRA sometimes includes them in fields.comment.comments but pagination is safer
+            page_size = CONFIG.jira_comment_page_size
+            logger.info("Fetching JIRA issue %s from %s", jira_id, self.base_url, extra=run_ctx)
+            # issue payload and the first comment page in parallel; page one tells us how many more there are
+            issue_f = submit_request(self._get_issue, jira_id)
+            first_f = submit_request(comment_page, self.session, self.base_url, jira_id, 0, page_size)
             comments_list: List[str] = []
             try:
-                # Use paginated comment endpoint for robustness
-                start = 0
-                page_size = 50
-                while True:
-                    page = self._comment_page(jira_id, start_at=start, max_results=page_size)
-                    for c in page.get("comments", []) or []:
-                        body = c.get("body")
-                        # body can be rich content in some setups; attempt to get plain text
-                        if isinstance(body, dict):
-                            # try common fields
-                            text = body.get("content")
-                            if not text:
-                                text = str(body)
-                            else:
-                                # fallback: join text nodes
-                                try:
-                                    # naive flatten of Atlassian storage-format -> text
-                                    def flatten_content(content):
-                                        out = []
-                                        if isinstance(content, list):
-                                            for it in content:
-                                                out.extend(flatten_content(it))
-                                        elif isinstance(content, dict):
-                                            if content.get("text"):
-                                                out.append(content.get("text"))
-                                            else:
-                                                for v in content.values():
-                                                    out.extend(flatten_content(v))
-                                        elif isinstance(content, str):
-                                            out.append(content)
-                                        return out
-                                    text = " ".join(flatten_content(text))
-                                except Exception:
-                                    text = str(body)
-                        else:
-                            text = str(body or "")
-                        comments_list.append(text)
-                    # paging
-                    if page.get("isLast", False) or page.get("total", 0) <= (start + page_size):
-                        break
-                    start += page_size
+                first = first_f.result()
+                got = len(first.get("comments") or [])
+                total = first.get("total", got) or 0
+                step = first.get("maxResults") or page_size  # the server may cap the page size
+                rest = submit_comment_pages(self.session, self.base_url, jira_id, got, total, step) if not first.get("isLast", False) else []
+                comments_list.extend(self._comment_text(c) for c in first.get("comments", []) or [])
+                for f in rest:
+                    comments_list.extend(self._comment_text(c) for c in f.result().get("comments", []) or [])
             except requests.HTTPError as he:
                 # non-fatal: log and continue
                 logger.warning("Failed to fetch comments for %s: %s", jira_id, he, extra=run_ctx)
-
-            # Attachments metadata
-            attachments_meta: List[Dict] = []
-            for a in fields.get("attachment", []) or []:
-                try:
-                    attachments_meta.append({
-                        "filename": a.get("filename"),
-                        "content_url": a.get("content"),
-                        "mimeType": a.get("mimeType"),
-                        "size": a.get("size"),
-                    })
-                except Exception:
-                    continue
-
-            # linked docs: extract URLs from description + comments
-            linked_docs = set(self._extract_urls(description))
-            for c in comments_list:
-                for u in self._extract_urls(c):
-                    linked_docs.add(u)
-
-            jc = JiraContext(
-                jira_id=jira_id,
-                title=title,
-                description=(description if isinstance(description, str) else str(description)),
-                comments=comments_list,
-                linked_docs=list(linked_docs),
-                attachments=attachments_meta,
-                created_at=created_at or datetime.utcnow(),
-                raw_payload=payload
-            )
+            payload = issue_f.result()
+            jc = self._build_context(jira_id, payload, comments_list)
             logger.info("Fetched JIRA %s: title=%s comments=%d attachments=%d linked_docs=%d",
-                        jira_id, title, len(comments_list), len(attachments_meta), len(linked_docs),
+                        jira_id, jc.title, len(jc.comments), len(jc.attachments), len(jc.linked_docs),
                         extra=run_ctx)
             return jc
         except requests.HTTPError as e:
@@ -0,0 +1,257 @@
+"""
+Pluggable LLM backends: live, record and replay.
+
+Both LLM clients only ever call `backend.chat.completions.create(...)`, so a
+backend is anything with that shape. CONFIG.llm_backend picks it:
+
+- live    the shared Portkey SDK instance (llm_pool.get_portkey)
+- record  live, plus every request/response pair appended to the fixture store
+          (CONFIG.llm_fixtures_path, JSONL)
+- replay  answers from the fixture store with synthetic latency
+          (CONFIG.llm_replay_latency_ms +/- CONFIG.llm_replay_jitter_ms), no network.
+          A request without a fixture gets a recorded answer for the same prompt
+          (CONFIG.llm_replay_miss="nearest"), or raises KeyError ("error").
+
+`python -m vttfg.connectors.llm_backends serve` exposes replay as an
+OpenAI-compatible HTTP stand-in (POST .../chat/completions, incl. stream=true),
+for load tests that must go through the real SDK: point PORTKEY_BASE_URL at it.
+
+Load tests usually want LLM_CACHE_ENABLED=0 as well, or the response cache answers first.
+"""
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+import types
+
+from ..config import CONFIG
+from ..metrics import llm_usage
+from .llm_pool import get_client, get_portkey
+
+logger = logging.getLogger("vttfg.llm_backends")
+
+
+def request_key(model, messages, max_tokens):
+    payload = json.dumps([model, messages, max_tokens], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _prompt_key(messages):
+    # the instructions part of the user message (everything before the ticket text)
+    content = str((messages or [{}])[0].get("content", ""))
+    return hashlib.sha256(content.split("Ticket:", 1)[0].encode("utf-8")).hexdigest()
+
+
+def _content_of(resp):
+    if isinstance(resp, dict):
+        choice = (resp.get("choices") or [{}])[0]
+        return (choice.get("message") or {}).get("content") or choice.get("text") or ""
+    choices = getattr(resp, "choices", None)
+    return getattr(getattr(choices[0], "message", None), "content", "") or "" if choices else ""
+
+
+def _completion(content, model, usage=None):
+    return {"object": "chat.completion", "model": model, "usage": usage or {},
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}]}
+
+
+def _chunks(content, model, size=16):
+    for i in range(0, len(content), size):
+        yield {"object": "chat.completion.chunk", "model": model,
+               "choices": [{"index": 0, "delta": {"content": content[i:i + size]}, "finish_reason": None}]}
+
+
+class FixtureStore:
+    """Append-only JSONL of {key, prompt_key, model, max_tokens, messages, content, usage}; safe across threads."""
+    def __init__(self, path=None):
+        self.path = path or CONFIG.llm_fixtures_path
+        self._lock = threading.Lock()
+        self._by_key = {}
+        self._by_prompt = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    self._index(json.loads(line))
+                except ValueError:
+                    continue
+
+    def _index(self, rec):
+        self._by_key[rec["key"]] = rec
+        self._by_prompt.setdefault(rec.get("prompt_key"), []).append(rec)
+
+    def __len__(self):
+        return len(self._by_key)
+
+    def add(self, model, messages, max_tokens, content, usage=None, partial=False):
+        rec = {"key": request_key(model, messages, max_tokens), "prompt_key": _prompt_key(messages), "model": model,
+               "max_tokens": max_tokens, "messages": messages, "content": content, "usage": usage or {}, "partial": partial}
+        d = os.path.dirname(self.path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with self._lock, open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            self._index(rec)
+
+    def lookup(self, model, messages, max_tokens):
+        rec = self._by_key.get(request_key(model, messages, max_tokens))
+        if rec is None and CONFIG.llm_replay_miss == "nearest":
+            # same prompt, different ticket: a stable pick so repeated runs replay identically
+            same = self._by_prompt.get(_prompt_key(messages)) or []
+            if same:
+                rec = same[int(request_key(model, messages, max_tokens), 16) % len(same)]
+        return rec
+
+
+class _Namespace:
+    """Gives a backend the SDK's `.chat.completions.create` shape."""
+    def __init__(self, create):
+        self.chat = types.SimpleNamespace(completions=types.SimpleNamespace(create=create))
+
+
+class ReplayBackend(_Namespace):
+    def __init__(self, store=None, latency_ms=None, jitter_ms=None):
+        super().__init__(self.create)
+        self.store = store if store is not None else FixtureStore()
+        self.latency_ms = CONFIG.llm_replay_latency_ms if latency_ms is None else latency_ms
+        self.jitter_ms = CONFIG.llm_replay_jitter_ms if jitter_ms is None else jitter_ms
+
+    def _latency_s(self):
+        return max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000.0
+
+    def create(self, messages, model=None, max_tokens=None, temperature=0.0, stream=False, **_):
+        rec = self.store.lookup(model, messages, max_tokens)
+        if rec is None:
+            raise KeyError(f"no LLM fixture for request ({len(self.store)} fixtures in {self.store.path})")
+        total = self._latency_s()
+        if not stream:
+            time.sleep(total)
+            return _completion(rec["content"], model, rec.get("usage"))
+        return self._stream(rec["content"], model, total)
+
+    def _stream(self, content, model, total):
+        chunks = list(_chunks(content, model))
+        # ~30% of the latency before the first token, the rest spread over the chunks
+        time.sleep(total * 0.3)
+        step = total * 0.7 / max(1, len(chunks))
+        for c in chunks:
+            yield c
+            time.sleep(step)
+
+
+class RecordingBackend(_Namespace):
+    def __init__(self, live, store=None):
+        super().__init__(self.create)
+        self.live = live
+        self.store = store if store is not None else FixtureStore()
+
+    def create(self, messages, model=None, max_tokens=None, temperature=0.0, stream=False, **kw):
+        resp = self.live.chat.completions.create(messages=messages, model=model, max_tokens=max_tokens, temperature=temperature, stream=stream, **kw)
+        if stream:
+            return self._record_stream(resp, messages, model, max_tokens)
+        self.store.add(model, messages, max_tokens, _content_of(resp), llm_usage(resp))
+        return resp
+
+    def _record_stream(self, stream, messages, model, max_tokens):
+        from .llm_stream import _delta
+        parts, finished = [], False
+        try:
+            for chunk in stream:
+                parts.append(_delta(chunk))
+                yield chunk
+            finished = True
+        finally:
+            # early-closed streams (classify stops after its fields) are kept, marked partial
+            self.store.add(model, messages, max_tokens, "".join(parts), partial=not finished)
+            close = getattr(stream, "close", None)
+            if callable(close):
+                close()
+
+
+def get_backend(base_url=None, virtual_key=None):
+    """The `.chat.completions.create` provider for CONFIG.llm_backend (live | record | replay)."""
+    mode = (CONFIG.llm_backend or "live").lower()
+    if mode == "replay":
+        return get_client("backend:replay", ReplayBackend)
+    live = get_portkey(base_url, virtual_key)
+    if mode == "record":
+        return get_client(f"backend:record:{id(live)}", lambda: RecordingBackend(live))
+    return live
+
+
+def needs_gateway():
+    return (CONFIG.llm_backend or "live").lower() != "replay"
+
+
+def serve(host="127.0.0.1", port=8808, backend=None):
+    """OpenAI-compatible HTTP stand-in over a ReplayBackend; blocks until interrupted."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    backend = backend or ReplayBackend()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            logger.debug(fmt, *args, extra={"run_id": "-", "step": "llm_standin"})
+
+        def _send(self, code, body, ctype="application/json"):
+            data = body.encode("utf-8") if isinstance(body, str) else body
+            self.send_response(code)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._send(404, json.dumps({"error": {"message": f"unknown path {self.path}"}}))
+            try:
+                req = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+                resp = backend.create(messages=req.get("messages"), model=req.get("model"), max_tokens=req.get("max_tokens"), stream=bool(req.get("stream")))
+            except KeyError as e:
+                return self._send(404, json.dumps({"error": {"message": str(e)}}))
+            except Exception as e:
+                return self._send(400, json.dumps({"error": {"message": str(e)}}))
+            if not req.get("stream"):
+                return self._send(200, json.dumps(resp))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for chunk in list(resp) + ["[DONE]"]:
+                line = ("data: " + (chunk if isinstance(chunk, str) else json.dumps(chunk)) + "\n\n").encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    logger.info("LLM stand-in serving %d fixtures on http://%s:%d", len(backend.store), host, port, extra={"run_id": "-", "step": "llm_standin"})
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+    return server
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(prog="python -m vttfg.connectors.llm_backends")
+    p.add_argument("command", choices=["serve", "stats"])
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8808)
+    p.add_argument("--fixtures", default=None, help="fixture JSONL (default: CONFIG.llm_fixtures_path)")
+    p.add_argument("--latency-ms", type=float, default=None)
+    p.add_argument("--jitter-ms", type=float, default=None)
+    args = p.parse_args()
+    store = FixtureStore(args.fixtures)
+    if args.command == "stats":
+        print(json.dumps({"path": store.path, "fixtures": len(store), "prompts": len(store._by_prompt)}, indent=2))
+    else:
+        serve(args.host, args.port, ReplayBackend(store, args.latency_ms, args.jitter_ms))
@@ -0,0 +1,162 @@
+"""
+Persistent on-disk cache of LLM completions (SQLite).
+
+All pipeline calls run at temperature=0.0, so the same model + prompt + ticket
+text + max_tokens yields the same answer; re-running a ticket during review or
+regression should not pay for another gateway round trip.
+
+- key: sha256 over (model, prompt hash, max_tokens, ticket-text hash)
+- only completions holding a parseable JSON object are stored; an empty or
+  garbled answer would otherwise be replayed for the whole TTL
+- TTL (CONFIG.llm_cache_ttl_s) and LRU eviction by entry count / total bytes
+- per-process hit/miss counters (stats())
+- CONFIG.llm_cache_enabled turns it off; CONFIG.llm_cache_bypass skips lookups
+  but still stores fresh responses (forced refresh)
+- safe across threads (one connection per thread) and processes (SQLite WAL +
+  busy timeout), so batch runs and the Streamlit server share one file
+"""
+from __future__ import annotations
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from ..config import CONFIG
+
+logger = logging.getLogger("vttfg.llm_cache")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT,
+    content TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed);
+"""
+
+
+def _sha(text: Optional[str]) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    def __init__(self, path: Optional[str] = None, ttl_s: Optional[float] = None,
+                 max_entries: Optional[int] = None, max_bytes: Optional[int] = None, bypass: Optional[bool] = None):
+        self.path = path or CONFIG.llm_cache_path
+        self.ttl_s = CONFIG.llm_cache_ttl_s if ttl_s is None else ttl_s
+        self.max_entries = max_entries or CONFIG.llm_cache_max_entries
+        self.max_bytes = max_bytes or CONFIG.llm_cache_max_mb * 1024 * 1024
+        self.bypass = CONFIG.llm_cache_bypass if bypass is None else bypass
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+        d = os.path.dirname(self.path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(model: str, prompt: Optional[str], max_tokens: int, ticket_text: Optional[str]) -> str:
+        return _sha("|".join([model or "", _sha(prompt), str(max_tokens), _sha(ticket_text)]))
+
+    def _count(self, hit: bool) -> None:
+        with self._counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key: str) -> Optional[str]:
+        if self.bypass:
+            self._count(False)
+            return None
+        now = time.time()
+        try:
+            row = self._conn().execute("SELECT content, created FROM responses WHERE key=?", (key,)).fetchone()
+            if row and self.ttl_s and now - row[1] > self.ttl_s:
+                self._conn().execute("DELETE FROM responses WHERE key=?", (key,))
+                row = None
+            if row:
+                self._conn().execute("UPDATE responses SET accessed=? WHERE key=?", (now, key))
+        except sqlite3.Error as e:
+            logger.warning("LLM cache read failed: %s", e, extra={"run_id": "-", "step": "llm_cache"})
+            row = None
+        self._count(bool(row))
+        return row[0] if row else None
+
+    def put(self, key: str, content: str, model: Optional[str] = None) -> bool:
+        """Store `content` unless it holds no (non-empty) JSON object; returns whether it was stored."""
+        from ..utils.json_parser import safe_parse_json_from_text
+        if not isinstance(content, str) or not safe_parse_json_from_text(content):
+            logger.info("Not caching an LLM completion without parseable JSON", extra={"run_id": "-", "step": "llm_cache"})
+            return False
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute("INSERT OR REPLACE INTO responses(key, model, content, size, created, accessed) VALUES (?,?,?,?,?,?)",
+                         (key, model, content, len(content.encode("utf-8")), now, now))
+            self._evict(conn, now)
+        except sqlite3.Error as e:
+            logger.warning("LLM cache write failed: %s", e, extra={"run_id": "-", "step": "llm_cache"})
+            return False
+        return True
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        if self.ttl_s:
+            conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_s,))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        # drop least-recently-used rows until both limits hold
+        excess = 0
+        for (size,) in conn.execute("SELECT size FROM responses ORDER BY accessed ASC"):
+            if count - excess <= self.max_entries and total <= self.max_bytes:
+                break
+            excess += 1
+            total -= size
+        conn.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed ASC LIMIT ?)", (excess,))
+
+    def stats(self) -> dict:
+        try:
+            count, total = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        except sqlite3.Error:
+            count, total = None, None
+        return {"hits": self.hits, "misses": self.misses, "entries": count, "bytes": total}
+
+    def clear(self) -> None:
+        self._conn().execute("DELETE FROM responses")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[LLMResponseCache]:
+    """Process-wide cache instance, or None when CONFIG.llm_cache_enabled is off or the file is unusable."""
+    global _cache
+    if not CONFIG.llm_cache_enabled:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = LLMResponseCache()
+            except Exception as e:
+                logger.warning("LLM response cache unavailable: %s", e, extra={"run_id": "-", "step": "llm_cache"})
+                _cache = False
+        return _cache or None
@@ -11,42 +11,43 @@ Exposed API:
 """
 from __future__ import annotations
 import json
-import re
 import logging
 from typing import Tuple, Optional, Any, Dict
 
 from ..config import CONFIG
-from ..logging_config import setup_logging
+from ..metrics import span, llm_usage, record_event
+from ..models import LLMResult
+from .llm_cache import get_response_cache, LLMResponseCache
+from ..utils.json_parser import safe_parse_json_from_text
+from .llm_pool import get_client
+from .llm_backends import get_backend, needs_gateway
+from .resilience import get_caller, with_timeout
+from .llm_stream import stream_fields
 
-LOG_PATH, LOG_SENSITIVE = setup_logging()
 logger = logging.getLogger("vttfg.llm")
 
-# Regex helpers to find JSON blocks
-_JSON_BLOCK_RE = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.S | re.I)
-_BRACE_RE = re.compile(r"(\{(?:.|\n)*\})", re.S)
-
-
-def _safe_parse_json(text: Optional[str]) -> Optional[dict]:
-    """Try JSON loads on whole text, fenced JSON blocks, or first {...} ... returns dict or None."""
-    if not text or not isinstance(text, str):
-        return None
-    s = text.strip()
-    try:
-        return json.loads(s)
-    except Exception:
-        pass
-    m = _JSON_BLOCK_RE.search(s)
-    if m:
-        try:
-            return json.loads(m.group(1))
-        except Exception:
-            pass
-    for m in _BRACE_RE.finditer(s):
-        try:
-            return json.loads(m.group(1))
-        except Exception:
-            continue
-    return None
+# single-pass scanner shared with vttfg.llm (fenced, bare and truncated JSON)
+_safe_parse_json = safe_parse_json_from_text
+
+
+_CLASSIFY_INSTRUCTIONS = 'Return JSON: {"classification":"UC2|UC3|UC4|UC6|Maintenance","confidence":0.0}'
+
+
+def fallback_classification(ticket_text: Optional[str]) -> LLMResult:
+    """
+    Keyword guess used when the LLM answers without JSON: confidence 0 and
+    source "fallback", so it never passes a threshold or becomes training data.
+    """
+    t = (ticket_text or "").lower()
+    if "merchant" in t:
+        label = "UC2"
+    elif "mpf" in t or "marketplace" in t:
+        label = "UC3"
+    elif "fee" in t:
+        label = "UC4"
+    else:
+        label = "UC6"
+    return LLMResult((label, 0.0), source="fallback")
 
 
 class PortkeySdkClient:
@@ -59,24 +60,22 @@ class PortkeySdkClient:
       - CONFIG.portkey_model (defaults in config)
     """
     def __init__(self, base_url: Optional[str] = None, virtual_key: Optional[str] = None, model: Optional[str] = None):
-        try:
-            from portkey_ai import Portkey  # dynamic import
-        except Exception as e:
-            logger.exception("portkey_ai import failed", extra={"run_id": "-", "step": "llm_init"})
-            raise RuntimeError("portkey_ai SDK not installed") from e
-
-        self.base_url = (base_url or CONFIG.portkey_base_url).rstrip("/")
+        self.base_url = (base_url or CONFIG.portkey_base_url or "").rstrip("/")
         self.virtual_key = virtual_key or CONFIG.portkey_virtual_key
         self.model = model or CONFIG.portkey_model
+        self.cache = get_response_cache()
+        self.caller = get_caller("portkey")
 
-        if not self.virtual_key:
+        if not self.virtual_key and needs_gateway():
             raise RuntimeError("PORTKEY_VIRTUAL_KEY must be set for PortkeySdkClient")
 
         try:
-            # Construct Portkey client (we pass api_key=None and virtual_key)
-            # The SDK's constructor may accept base_url and virtual_key as shown in examples.
-            self.client = Portkey(api_key=None, virtual_key=self.virtual_key, base_url=self.base_url)
+            # shared, connection-pooled SDK instance, or the record/replay backend (see llm_backends)
+            self.client = get_backend(self.base_url, self.virtual_key)
             logger.info("Portkey SDK client initialized", extra={"run_id": "-", "step": "llm_init"})
+        except ImportError as e:
+            logger.exception("portkey_ai import failed", extra={"run_id": "-", "step": "llm_init"})
+            raise RuntimeError("portkey_ai SDK not installed") from e
         except Exception as e:
             logger.exception("Failed to instantiate Portkey SDK client", extra={"run_id": "-", "step": "llm_init"})
             raise
@@ -126,15 +125,33 @@ class PortkeySdkClient:
             pass
         return self._coerce_text(resp)
 
-    def _call_completion(self, messages: list, max_tokens: int = 800, temperature: float = 0.0) -> Any:
-        """Call Portkey SDK chat completion and return raw SDK response."""
-        try:
-            prompt_len = sum(len(str(m.get("content", ""))) for m in messages if isinstance(m, dict))
-            logger.debug("Portkey SDK request prepared (model=%s prompt_len=%d)", self.model, prompt_len, extra={"run_id": "-", "step": "llm_request"})
-        except Exception:
-            pass
+    def _call_completion(self, messages: list, max_tokens: int = 800, temperature: float = 0.0,
+                         prompt: Optional[str] = None, ticket_text: Optional[str] = None) -> Any:
+        """
+        Call Portkey SDK chat completion and return raw SDK response.
 
-        resp = self.client.chat.completions.create(messages=messages, model=self.model, max_tokens=max_tokens, temperature=temperature)
+        Deterministic calls (temperature 0) go through the persistent response cache;
+        a hit returns a dict in chat-completion shape that _extract_content understands.
+        `prompt`/`ticket_text` form the cache key; without them the messages are hashed.
+        """
+        key = None
+        if self.cache and temperature == 0.0:
+            if prompt is None and ticket_text is None:
+                ticket_text = json.dumps(messages, sort_keys=True)
+            key = LLMResponseCache.make_key(self.model, prompt, max_tokens, ticket_text)
+        prompt_len = sum(len(str(m.get("content", ""))) for m in messages if isinstance(m, dict))
+        with span("llm.completion", model=self.model, max_tokens=max_tokens, prompt_chars=prompt_len) as sp:
+            content = self.cache.get(key) if key else None
+            if content is not None:
+                sp.set(cache="hit")
+                logger.debug("LLM cache hit (model=%s)", self.model, extra={"run_id": "-", "step": "llm_cache"})
+                return {"choices": [{"message": {"role": "assistant", "content": content}}], "cached": True}
+            logger.debug("Portkey SDK request prepared (model=%s prompt_len=%d)", self.model, prompt_len, extra={"run_id": "-", "step": "llm_request"})
+            # deadline/retry/hedge/breaker policy; CircuitOpenError when the gateway is known to be down
+            resp = self.caller.call(lambda: with_timeout(self.client).chat.completions.create(messages=messages, model=self.model, max_tokens=max_tokens, temperature=temperature))
+            sp.set(cache="miss" if key else "off", **llm_usage(resp))
+        if key:
+            self.cache.put(key, self._extract_content(resp), model=self.model)
         try:
             txt = self._coerce_text(resp)
             logger.debug("Portkey SDK responded (len=%d)", len(txt), extra={"run_id": "-", "step": "llm_response"})
@@ -145,51 +162,66 @@ class PortkeySdkClient:
     def classify(self, ticket_text: str, prompt_override: Optional[str] = None) -> Tuple[str, float]:
         """
         Ask Portkey to classify the ticket into UC2/UC3/UC4/UC6/Maintenance.
-        Returns (classification, confidence).
+        Returns (classification, confidence). Gateway failures (CircuitOpenError,
+        DeadlineExceeded, exhausted retries) propagate; only an answer without
+        JSON falls back.
         """
-        prompt = (prompt_override or 'Return JSON: {"classification":"UC2|UC3|UC4|UC6|Maintenance","confidence":0.0}') + "\nTicket:\n" + (ticket_text or "")
+        if CONFIG.llm_stream_classify:
+            try:
+                return self.classify_streaming(ticket_text, prompt_override)
+            except Exception as e:
+                logger.warning("Streamed classify failed, retrying unstreamed: %s", str(e), extra={"run_id": "-", "step": "llm_request_error"})
+                record_event("llm_fallback", op="classify_stream", reason=f"{type(e).__name__}: {str(e)[:200]}")
+        instructions = prompt_override or _CLASSIFY_INSTRUCTIONS
+        prompt = instructions + "\nTicket:\n" + (ticket_text or "")
         messages = [{"role": "user", "content": prompt}]
-        try:
-            raw = self._call_completion(messages, max_tokens=200, temperature=0.0)
-            content = self._extract_content(raw)
-            parsed = _safe_parse_json(content)
-            if parsed and isinstance(parsed, dict):
-                cls = parsed.get("classification", "UC6")
-                conf = float(parsed.get("confidence", 0.0) or 0.0)
-                logger.debug("Portkey classify parsed result: %s (conf=%s)", cls, conf, extra={"run_id": "-", "step": "llm_parse"})
-                return cls, conf
-        except Exception as e:
-            logger.warning("Portkey SDK classify call failed: %s", str(e), extra={"run_id": "-", "step": "llm_request_error"})
-
-        # heuristics fallback (sane default)
-        t = (ticket_text or "").lower()
-        if "merchant" in t:
-            return "UC2", 0.9
-        if "mpf" in t or "marketplace" in t:
-            return "UC3", 0.9
-        if "fee" in t:
-            return "UC4", 0.8
-        if "tax" in t:
-            return "UC6", 0.7
-        return "UC6", 0.5
+        raw = self._call_completion(messages, max_tokens=200, temperature=0.0, prompt=instructions, ticket_text=ticket_text)
+        parsed = _safe_parse_json(self._extract_content(raw))
+        if parsed and isinstance(parsed, dict):
+            cls = parsed.get("classification", "UC6")
+            conf = float(parsed.get("confidence", 0.0) or 0.0)
+            logger.debug("Portkey classify parsed result: %s (conf=%s)", cls, conf, extra={"run_id": "-", "step": "llm_parse"})
+            return cls, conf
+        record_event("llm_fallback", op="classify", reason="no_json_in_response")
+        return fallback_classification(ticket_text)
+
+    def classify_streaming(self, ticket_text: str, prompt_override: Optional[str] = None) -> Tuple[str, float]:
+        """
+        Streamed classify: returns (and closes the stream) as soon as `classification`
+        and `confidence` are complete, without waiting for the rest of the JSON.
+        Raises when the stream ends without a classification.
+        """
+        instructions = prompt_override or _CLASSIFY_INSTRUCTIONS
+        messages = [{"role": "user", "content": instructions + "\nTicket:\n" + (ticket_text or "")}]
+        fields = {path[0]: value for path, value in stream_fields(self, "llm.completion", instructions, ticket_text, messages, 200,
+                                                                  required=("classification", "confidence"))}
+        if not fields.get("classification"):
+            raise ValueError("stream ended without a classification")
+        return fields["classification"], float(fields.get("confidence", 0.0) or 0.0)
+
+    def iter_extract(self, ticket_text: str, classification: str, prompt_override: Optional[str] = None):
+        """
+        Streamed extract: yields ((key,), value) for each top-level member as soon as it
+        is complete, e.g. (("item_codes",), ["COFFEE"]) long before the response is finished.
+        Shares extract()'s response cache entry.
+        """
+        messages = [{"role": "user", "content": (prompt_override or "") + "\nTicket:\n" + (ticket_text or "")}]
+        yield from stream_fields(self, "llm.completion", prompt_override or "", ticket_text, messages, 800)
 
     def extract(self, ticket_text: str, classification: str, prompt_override: Optional[str] = None) -> Dict[str, Any]:
         """
         Ask Portkey to extract fields (product codes, division, states, dates, flex fields, etc.)
-        Returns a parsed dict (or a fallback minimal structure).
+        Returns a parsed dict, or a minimal structure when the answer has no JSON;
+        gateway failures propagate.
         """
         prompt = (prompt_override or "") + "\nTicket:\n" + (ticket_text or "")
         messages = [{"role": "user", "content": prompt}]
-        try:
-            raw = self._call_completion(messages, max_tokens=800, temperature=0.0)
-            content = self._extract_content(raw)
-            parsed = _safe_parse_json(content)
-            if parsed and isinstance(parsed, dict):
-                logger.debug("Portkey extract parsed keys=%s", list(parsed.keys()), extra={"run_id": "-", "step": "llm_parse"})
-                return parsed
-        except Exception as e:
-            logger.warning("Portkey SDK extract call failed: %s", str(e), extra={"run_id": "-", "step": "llm_request_error"})
-
+        raw = self._call_completion(messages, max_tokens=800, temperature=0.0, prompt=prompt_override or "", ticket_text=ticket_text)
+        parsed = _safe_parse_json(self._extract_content(raw))
+        if parsed and isinstance(parsed, dict):
+            logger.debug("Portkey extract parsed keys=%s", list(parsed.keys()), extra={"run_id": "-", "step": "llm_parse"})
+            return parsed
+        record_event("llm_fallback", op="extract", reason="no_json_in_response")
         # fallback minimal structure
         logger.info("Using default extraction fallback (no parsed output)", extra={"run_id": "-", "step": "llm_fallback"})
         return {
@@ -205,40 +237,63 @@ class PortkeySdkClient:
             "raw_extracted_text": ticket_text[:1000],
         }
 
+    def classify_and_extract(self, ticket_text: str, prompt_override: Optional[str] = None) -> Tuple[str, float, Optional[Dict[str, Any]]]:
+        """
+        Single round trip returning (classification, confidence, extraction) using the
+        combined prompt (prompts/classify_extract.json). extraction is None when the
+        response had no usable payload, so callers can fall back to extract();
+        gateway failures propagate.
+        """
+        prompt = (prompt_override or "") + "\nTicket:\n" + (ticket_text or "")
+        messages = [{"role": "user", "content": prompt}]
+        raw = self._call_completion(messages, max_tokens=1000, temperature=0.0, prompt=prompt_override or "", ticket_text=ticket_text)
+        parsed = _safe_parse_json(self._extract_content(raw))
+        if parsed and isinstance(parsed, dict) and parsed.get("classification"):
+            extraction = parsed.get("extraction")
+            return (parsed["classification"], float(parsed.get("confidence", 0.0) or 0.0),
+                    extraction if isinstance(extraction, dict) else None)
+        record_event("llm_fallback", op="classify_extract", reason="no_json_in_response")
+        return LLMResult((*fallback_classification(ticket_text), None), source="fallback")
+
+
+class _MockClient:
+    """Stand-in when the SDK client cannot be built (local development without a gateway or fixtures)."""
+    def classify(self, ticket_text: str, prompt_override: Optional[str] = None) -> Tuple[str, float]:
+        logger.info("Mock LLM classify used", extra={"run_id": "-", "step": "llm_mock"})
+        return ("UC6", 0.6)
+
+    def extract(self, ticket_text: str, classification: str, prompt_override: Optional[str] = None) -> Dict[str, Any]:
+        logger.info("Mock LLM extract used", extra={"run_id": "-", "step": "llm_mock"})
+        return {
+            "item_codes": [CONFIG.default_item],
+            "product_classes": [],
+            "division_codes": [],
+            "department_codes": [],
+            "postal_codes": [],
+            "states": [],
+            "date_specs": [{"type": "effective", "date": None}],
+            "flex_fields": {},
+            "confidence": 0.0,
+            "raw_extracted_text": (ticket_text or "")[:1000],
+        }
+
+    def classify_and_extract(self, ticket_text: str, prompt_override: Optional[str] = None) -> Tuple[str, float, Optional[Dict[str, Any]]]:
+        cls, conf = self.classify(ticket_text, prompt_override)
+        return cls, conf, self.extract(ticket_text, cls, prompt_override)
+
 
 # Factory
 def get_llm_client():
     """
-    Returns:
+    Process-wide shared client (built once, thread-safe):
       - PortkeySdkClient if portkey_ai is installed and initialization succeeds.
-      - Otherwise, a Mock client that supports classify(...) and extract(...).
+      - Otherwise a Mock client for that call only; the next call retries the SDK
+        client, so a transient init failure does not pin the process to the Mock.
     """
-    try:
-        client = PortkeySdkClient(base_url=CONFIG.portkey_base_url, virtual_key=CONFIG.portkey_virtual_key, model=CONFIG.portkey_model)
-        logger.info("Using Portkey SDK client", extra={"run_id": "-", "step": "llm_init"})
-        return client
-    except Exception as e:
-        logger.warning("Portkey SDK client init failed: %s. Falling back to Mock.", str(e), extra={"run_id": "-", "step": "llm_init"})
-
-    # Mock client
-    class Mock:
-        def classify(self, t: str, p: Optional[str] = None) -> Tuple[str, float]:
-            logger.info("Mock LLM classify used", extra={"run_id": "-", "step": "llm_mock"})
-            return ("UC6", 0.6)
-
-        # def extract(self, t: str, c: str, p: Optional[str] = None) -> Dict[str, Any]:
-        #     logger.info("Mock LLM extract used", extra={"run_id": "-", "step": "llm_mock"})
-        #     return {
-        #         "item_codes": [CONFIG.default_item],
-        #         "product_classes": [],
-        #         "division_codes": [],
-        #         "department_codes": [],
-        #         "postal_codes": [],
-        #         "states": [],
-        #         "date_specs": [{"type": "effective", "date": None}],
-        #         "flex_fields": {},
-        #         "confidence": 0.0,
-        #         "raw_extracted_text": t[:1000],
-        #     }
-
-    return Mock()
+    return get_client("portkey_sdk", _build_llm_client, fallback=_MockClient)
+
+
+def _build_llm_client():
+    client = PortkeySdkClient(base_url=CONFIG.portkey_base_url, virtual_key=CONFIG.portkey_virtual_key, model=CONFIG.portkey_model)
+    logger.info("Using Portkey SDK client", extra={"run_id": "-", "step": "llm_init"})
+    return client
@@ -0,0 +1,88 @@
+"""
+Process-wide registry of LLM clients and the Portkey SDK instances behind them.
+
+Building a Portkey client opens fresh TLS connections, so every entry point
+(vttfg.llm.get_llm_client for the orchestrator, connectors.llm_client.get_llm_client
+for extraction/classifier) resolves to one shared, thread-safe instance. The SDK
+instance is given an httpx.Client whose keep-alive pool is CONFIG.llm_pool_size
+connections wide when the installed SDK accepts `http_client`.
+"""
+import logging
+import threading
+
+from ..config import CONFIG
+
+logger = logging.getLogger("vttfg.llm")
+
+_lock = threading.RLock()
+_sdk = {}
+_clients = {}
+
+
+def _http_client():
+    try:
+        import httpx
+    except Exception:
+        return None
+    size = max(1, CONFIG.llm_pool_size)
+    limits = httpx.Limits(max_connections=size, max_keepalive_connections=size, keepalive_expiry=CONFIG.llm_keepalive_s)
+    # a ceiling: each request is sent with its attempt's own timeout (resilience.with_timeout)
+    return httpx.Client(limits=limits, timeout=CONFIG.llm_timeout_s)
+
+
+def get_portkey(base_url=None, virtual_key=None):
+    """Shared Portkey SDK instance per (base_url, virtual_key); safe to call from any thread."""
+    base_url = (base_url or CONFIG.portkey_base_url or "").rstrip("/") or None
+    virtual_key = virtual_key or CONFIG.portkey_virtual_key
+    key = (base_url, virtual_key)
+    with _lock:
+        sdk = _sdk.get(key)
+        if sdk is None:
+            from portkey_ai import Portkey
+            http_client = _http_client()
+            try:
+                sdk = Portkey(api_key=None, virtual_key=virtual_key, base_url=base_url, http_client=http_client)
+            except TypeError:
+                # older SDKs have no http_client parameter; they keep their own pool
+                if http_client is not None:
+                    http_client.close()
+                sdk = Portkey(api_key=None, virtual_key=virtual_key, base_url=base_url)
+            _sdk[key] = sdk
+            logger.info("Portkey SDK initialized (pool=%d)", CONFIG.llm_pool_size, extra={"run_id": "-", "step": "llm_init"})
+        return sdk
+
+
+def get_client(name, factory, fallback=None):
+    """
+    Return the registered client `name`, building it with factory() on first use.
+    If factory() raises and a fallback is given, fallback() is returned for this
+    call only; nothing is registered, so the next call tries factory() again.
+    """
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                try:
+                    client = factory()
+                except Exception as e:
+                    if fallback is None:
+                        raise
+                    logger.warning("LLM client %s init failed, using its fallback for this call: %s", name, e, extra={"run_id": "-", "step": "llm_init"})
+                    return fallback()
+                _clients[name] = client
+    return client
+
+
+def reset():
+    """Drop all shared clients (tests, or after changing credentials)."""
+    with _lock:
+        for sdk in _sdk.values():
+            close = getattr(sdk, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception:
+                    pass
+        _sdk.clear()
+        _clients.clear()
@@ -0,0 +1,99 @@
+"""
+Streamed chat completions parsed as they arrive.
+
+Classification only needs `classification` and `confidence`, which the prompts
+put first; `stream_fields(..., required=(...))` stops reading (and closes the
+HTTP stream) as soon as those members are complete instead of waiting for the
+`reasoning` text. Without `required` every top-level member is yielded as soon
+as it is complete: the orchestrator starts resolving `item_codes` against the
+template while the rest of the extraction is still being generated.
+
+Shared by vttfg.llm.PortkeyClient and connectors.llm_client.PortkeySdkClient
+(anything with .client, .caller, .model and .cache).
+"""
+import json
+import logging
+import time
+
+from ..metrics import span
+from ..utils.json_parser import JSONFieldStream, safe_parse_json_from_text
+from .llm_cache import LLMResponseCache
+from .resilience import with_timeout
+
+logger = logging.getLogger("vttfg.llm")
+
+
+def _delta(chunk):
+    try:
+        if isinstance(chunk, dict):
+            return (chunk.get("choices") or [{}])[0].get("delta", {}).get("content") or ""
+        choices = getattr(chunk, "choices", None)
+        return (getattr(choices[0].delta, "content", None) or "") if choices else ""
+    except Exception:
+        return ""
+
+
+def _close(stream):
+    close = getattr(stream, "close", None) or getattr(getattr(stream, "response", None), "close", None)
+    if callable(close):
+        try:
+            close()
+        except Exception:
+            pass
+
+
+def stream_content(owner, messages, max_tokens, op="llm.stream"):
+    """Generator of content deltas; closing it closes the underlying HTTP stream."""
+    # a hedged open returns one stream; the caller closes the other (and any late one) via discard
+    stream = owner.caller.call(lambda: with_timeout(owner.client).chat.completions.create(
+        messages=messages, model=owner.model, max_tokens=max_tokens, temperature=0.0, stream=True), op=op, discard=_close)
+    try:
+        for chunk in stream:
+            d = _delta(chunk)
+            if d:
+                yield d
+    finally:
+        _close(stream)
+
+
+def stream_fields(owner, name, prompt, text, messages, max_tokens, required=None):
+    """
+    Yield (path, value) for JSON members of the completion as they complete.
+    With `required` (top-level keys) the stream is cut once all of them are in.
+    Goes through the response cache: a hit replays the cached text; an early-cut
+    stream caches just the required members.
+    """
+    key = LLMResponseCache.make_key(owner.model, prompt, max_tokens, text) if owner.cache else None
+    parser = JSONFieldStream()
+    parts, early = [], False
+    with span(name, model=owner.model, prompt_chars=len(messages[0]["content"]), stream=True) as sp:
+        cached = owner.cache.get(key) if key else None
+        if cached is not None:
+            sp.set(cache="hit")
+            yield from parser.feed(cached)
+            return
+        started, first = time.perf_counter(), None
+        deltas = stream_content(owner, messages, max_tokens, op=name)
+        try:
+            for d in deltas:
+                if first is None:
+                    first = time.perf_counter()
+                parts.append(d)
+                yield from parser.feed(d)
+                if required and all(k in parser.fields for k in required):
+                    early = True
+                    break
+        finally:
+            deltas.close()
+        sp.set(cache="miss" if key else "off", early_stop=early, chars=sum(len(p) for p in parts),
+               first_token_ms=round((first - started) * 1000, 1) if first else None)
+    full = "".join(parts)
+    if not early and not parser.done:
+        # not a clean streamed object (truncated / odd framing): recover what the full text offers
+        recovered = safe_parse_json_from_text(full) or {}
+        for k, v in recovered.items():
+            if k not in parser.fields:
+                parser.fields[k] = v
+                yield (k,), v
+    if key and (early or full):
+        owner.cache.put(key, json.dumps({k: parser.fields[k] for k in required}) if early else full, model=owner.model)
@@ -0,0 +1,359 @@
+"""
+Deadlines, retries, hedging and a circuit breaker around LLM gateway calls.
+
+`get_caller(name)` returns a process-wide ResilientCaller (shared by both LLM
+clients for the same gateway). `caller.call(fn)` runs fn() with:
+
+- an overall deadline (CONFIG.llm_deadline_s) and a per-attempt timeout that
+  adapts to observed latency (CONFIG.llm_timeout_multiplier x p95, capped by
+  CONFIG.llm_timeout_s). The attempt clock starts when fn() starts running,
+  not while it waits for a free worker (that wait is bounded by the deadline).
+  fn() should build its request with `with_timeout(client)` so the HTTP call
+  itself gives up when the attempt does, instead of holding a worker thread
+  and a pooled connection for up to CONFIG.llm_timeout_s
+- up to CONFIG.llm_retries retries with full-jitter exponential backoff, for
+  transient errors only (timeouts, connection errors, HTTP 429 and 5xx); any
+  other error (a 400, an auth failure, a bug in fn) is raised at once
+- optionally (CONFIG.llm_hedge_enabled) one duplicate request once the primary
+  has been outstanding longer than the p95 latency; the first answer wins
+- a circuit breaker that fails fast with CircuitOpenError after
+  CONFIG.llm_breaker_failures consecutive transient failures, and lets one
+  probe through after CONFIG.llm_breaker_reset_s
+
+Retries, hedges, timeouts and breaker trips are recorded via metrics.record_event,
+so they show up in the run's audit.
+"""
+import asyncio
+import collections
+import contextvars
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ..config import CONFIG
+from ..metrics import record_event
+
+
+# timeout of the attempt fn() is running in; set by ResilientCaller around each fn()
+_attempt_timeout = contextvars.ContextVar("llm_attempt_timeout", default=None)
+
+
+def attempt_timeout():
+    """Seconds left for the current attempt's request, or None outside ResilientCaller."""
+    return _attempt_timeout.get()
+
+
+def with_timeout(client):
+    """client with the current attempt's timeout applied (SDK `with_options`), or client itself when unsupported/unset."""
+    timeout = attempt_timeout()
+    with_options = getattr(client, "with_options", None)
+    if timeout is None or not callable(with_options):
+        return client
+    try:
+        return with_options(timeout=timeout)
+    except TypeError:
+        return client
+
+
+def _timed(timeout, deadline, fn, running=None):
+    if running is not None:
+        running.set()
+    # runs inside a copied context: nothing leaks to the caller
+    _attempt_timeout.set(max(0.0, min(timeout, deadline - time.monotonic())))
+    return fn()
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+# transport errors of httpx / requests / OpenAI-style SDKs, which don't subclass the builtins
+_TRANSIENT_NAMES = {"TimeoutException", "NetworkError", "RemoteProtocolError", "ConnectionError", "Timeout",
+                    "APIConnectionError", "APITimeoutError"}
+
+
+def is_transient(err):
+    """Worth retrying (and counting toward the breaker): timeouts, connection errors, HTTP 429 and 5xx."""
+    if isinstance(err, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(err, "status_code", None)
+    if status is None:
+        status = getattr(getattr(err, "response", None), "status_code", None)
+    if isinstance(status, int):
+        return status == 429 or status >= 500
+    return any(cls.__name__ in _TRANSIENT_NAMES for cls in type(err).__mro__)
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies (seconds)."""
+    def __init__(self, window=200, min_samples=20):
+        self._samples = collections.deque(maxlen=window)
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def p95(self):
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+
+
+class CircuitBreaker:
+    """closed -> open after `failures` consecutive errors; half-open (one probe) after reset_s."""
+    def __init__(self, failures=None, reset_s=None):
+        self.failures = failures or CONFIG.llm_breaker_failures
+        self.reset_s = CONFIG.llm_breaker_reset_s if reset_s is None else reset_s
+        self.state = "closed"
+        self._consecutive = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_s:
+                self.state = "half_open"
+                self._probe_in_flight = False
+            if self.state == "half_open" and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state, self._consecutive, self._probe_in_flight = "closed", 0, False
+
+    def record_failure(self):
+        with self._lock:
+            self._consecutive += 1
+            tripped = self.state == "half_open" or self._consecutive >= self.failures
+            if tripped and self.state != "open":
+                self.state, self._opened_at, self._probe_in_flight = "open", time.monotonic(), False
+                return True
+            return False
+
+
+def _discard_rest(futures, winner, discard):
+    """Hand every other successful result to discard(), now or when its call finishes."""
+    if discard is None:
+        return
+
+    def done(f):
+        if not f.cancelled() and f.exception() is None:
+            try:
+                discard(f.result())
+            except Exception:
+                pass
+    for f in futures:
+        if f is not winner:
+            f.add_done_callback(done)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # primaries + hedges; sized with the LLM connection pool
+            _executor = ThreadPoolExecutor(max_workers=max(2, CONFIG.llm_pool_size * 2), thread_name_prefix="vttfg-llm")
+        return _executor
+
+
+class ResilientCaller:
+    def __init__(self, name):
+        self.name = name
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyTracker()
+
+    def _attempt_timeout(self, remaining):
+        p95 = self.latency.p95()
+        timeout = CONFIG.llm_timeout_s if p95 is None else min(CONFIG.llm_timeout_s, max(CONFIG.llm_timeout_min_s, p95 * CONFIG.llm_timeout_multiplier))
+        return max(0.0, min(timeout, remaining))
+
+    def _hedge_delay(self):
+        if not CONFIG.llm_hedge_enabled:
+            return None
+        p95 = self.latency.p95()
+        return None if p95 is None else max(CONFIG.llm_hedge_min_delay_s, p95)
+
+    def _check_breaker(self, op):
+        if not self.breaker.allow():
+            record_event("llm_circuit_open", backend=self.name, op=op)
+            raise CircuitOpenError(f"{self.name} circuit open; failing fast")
+
+    def _failed(self, op, attempt, err):
+        """Record a failed attempt; returns whether it is transient (retry it)."""
+        transient = is_transient(err)
+        if not transient:
+            # the gateway answered (or fn itself is broken): not an outage, and it ends a half-open probe
+            self.breaker.record_success()
+        elif self.breaker.record_failure():
+            record_event("llm_circuit_tripped", backend=self.name, op=op, error=str(err)[:200])
+        record_event("llm_attempt_failed", backend=self.name, op=op, attempt=attempt, transient=transient,
+                     error=f"{type(err).__name__}: {str(err)[:200]}")
+        return transient
+
+    def _backoff(self, attempt, remaining):
+        return min(remaining, random.uniform(0, CONFIG.llm_backoff_s * (2 ** attempt)))
+
+    def call(self, fn, op="completion", discard=None):
+        """
+        Run fn() (a blocking gateway call) under deadline, retry, hedge and breaker policy.
+        discard(result) is called on results that are not returned (a hedge's loser,
+        an answer after the attempt timed out), e.g. to close a stream.
+        """
+        deadline = time.monotonic() + CONFIG.llm_deadline_s
+        last = None
+        for attempt in range(CONFIG.llm_retries + 1):
+            self._check_breaker(op)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            started = time.monotonic()
+            try:
+                result = self._run_attempt(fn, op, attempt, self._attempt_timeout(remaining), deadline, discard)
+            except Exception as e:
+                if not self._failed(op, attempt, e):
+                    raise
+                last = e
+                if attempt < CONFIG.llm_retries:
+                    time.sleep(self._backoff(attempt, max(0.0, deadline - time.monotonic())))
+                continue
+            self.latency.observe(time.monotonic() - started)
+            self.breaker.record_success()
+            return result
+        if last is None:
+            last = DeadlineExceeded(f"{self.name} {op}: deadline of {CONFIG.llm_deadline_s}s exceeded")
+        raise last
+
+    def _run_attempt(self, fn, op, attempt, timeout, deadline, discard=None):
+        pool = _get_executor()
+        running = threading.Event()
+        futures = [pool.submit(contextvars.copy_context().run, _timed, timeout, deadline, fn, running)]
+        # waiting for a free worker is bounded by the overall deadline, not by the attempt timeout
+        if not running.wait(timeout=max(0.0, deadline - time.monotonic())) and futures[0].cancel():
+            record_event("llm_timeout", backend=self.name, op=op, attempt=attempt, queued=True)
+            raise DeadlineExceeded(f"{self.name} {op}: no free worker before the deadline")
+        running.wait()
+        started = time.monotonic()
+        timeout = max(0.0, min(timeout, deadline - started))
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is not None and hedge_delay < timeout:
+            done, _ = wait(futures, timeout=hedge_delay)
+            if not done:
+                record_event("llm_hedge", backend=self.name, op=op, attempt=attempt, after_s=round(hedge_delay, 3))
+                futures.append(pool.submit(contextvars.copy_context().run, _timed, timeout, deadline, fn))
+        error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=max(0.0, timeout - (time.monotonic() - started)), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for f in done:
+                if f.exception() is None:
+                    if len(futures) > 1:
+                        record_event("llm_hedge_result", backend=self.name, op=op, winner="hedge" if f is futures[1] else "primary")
+                    _discard_rest(futures, f, discard)
+                    return f.result()
+                error = f.exception()
+        _discard_rest(futures, None, discard)
+        if pending:
+            # the losing/late calls finish in the background; their results are discarded
+            record_event("llm_timeout", backend=self.name, op=op, attempt=attempt, timeout_s=round(timeout, 3))
+            raise DeadlineExceeded(f"{self.name} {op}: no response within {timeout:.1f}s")
+        raise error
+
+    async def acall(self, coro_fn, op="completion"):
+        """asyncio variant of call(); coro_fn() must return a fresh awaitable per attempt (see with_timeout)."""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + CONFIG.llm_deadline_s
+        last = None
+        for attempt in range(CONFIG.llm_retries + 1):
+            self._check_breaker(op)
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            started = loop.time()
+            try:
+                result = await self._arun_attempt(coro_fn, op, attempt, self._attempt_timeout(remaining))
+            except Exception as e:
+                if not self._failed(op, attempt, e):
+                    raise
+                last = e
+                if attempt < CONFIG.llm_retries:
+                    await asyncio.sleep(self._backoff(attempt, max(0.0, deadline - loop.time())))
+                continue
+            self.latency.observe(loop.time() - started)
+            self.breaker.record_success()
+            return result
+        if last is None:
+            last = DeadlineExceeded(f"{self.name} {op}: deadline of {CONFIG.llm_deadline_s}s exceeded")
+        raise last
+
+    def _astart(self, coro_fn, timeout):
+        # the task copies the context, so coro_fn()'s request sees this attempt's timeout
+        token = _attempt_timeout.set(timeout)
+        try:
+            return asyncio.ensure_future(coro_fn())
+        finally:
+            _attempt_timeout.reset(token)
+
+    async def _arun_attempt(self, coro_fn, op, attempt, timeout):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        tasks = [self._astart(coro_fn, timeout)]
+        try:
+            hedge_delay = self._hedge_delay()
+            if hedge_delay is not None and hedge_delay < timeout:
+                done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+                if not done:
+                    record_event("llm_hedge", backend=self.name, op=op, attempt=attempt, after_s=round(hedge_delay, 3))
+                    tasks.append(self._astart(coro_fn, timeout))
+            error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, timeout - (loop.time() - started)), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    break
+                for t in done:
+                    if t.exception() is None:
+                        if len(tasks) > 1:
+                            record_event("llm_hedge_result", backend=self.name, op=op, winner="hedge" if t is tasks[1] else "primary")
+                        return t.result()
+                    error = t.exception()
+            if pending:
+                record_event("llm_timeout", backend=self.name, op=op, attempt=attempt, timeout_s=round(timeout, 3))
+                raise DeadlineExceeded(f"{self.name} {op}: no response within {timeout:.1f}s")
+            raise error
+        finally:
+            for t in tasks:
+                if not t.done():
+                    t.cancel()
+
+
+_callers = {}
+_callers_lock = threading.Lock()
+
+
+def get_caller(name="portkey"):
+    """Process-wide caller per backend, so breaker state and latency history are shared."""
+    with _callers_lock:
+        caller = _callers.get(name)
+        if caller is None:
+            caller = _callers[name] = ResilientCaller(name)
+        return caller
@@ -1,15 +1,14 @@
 import logging
 from ..config import CONFIG
+from ..metrics import span
 logger = logging.getLogger("vttfg.snowflake")
-try:
-    import snowflake.connector as sf
-except Exception:
-    sf = None
 
 class SnowflakeConnector:
     def __init__(self):
-        if not sf:
-            raise RuntimeError("snowflake-connector-python not installed")
+        try:
+            import snowflake.connector as sf  # deferred: slow import, only needed when Snowflake is used
+        except Exception as e:
+            raise RuntimeError("snowflake-connector-python not installed") from e
         if not (CONFIG.snowflake_account and CONFIG.snowflake_user and CONFIG.snowflake_password):
             raise RuntimeError("Snowflake credentials not configured in .env")
         self.conn = sf.connect(
@@ -28,14 +27,16 @@ class SnowflakeConnector:
         returns dict mapping key->rate
         """
         out = {}
-        cur = self.conn.cursor()
-        try:
-            for (prod, state, postal, date) in queries:
-                sql = "SELECT rate FROM TAX_RATES WHERE product_code=%s AND state=%s AND postal=%s AND effective_date <= %s ORDER BY effective_date DESC LIMIT 1"
-                cur.execute(sql, (prod, state or "", postal or "", date or "1970-01-01"))
-                row = cur.fetchone()
-                if row:
-                    out[(prod.upper(), (state or "").upper(), (postal or ""), date)] = row[0]
-        finally:
-            cur.close()
+        with span("snowflake.expected_rates", queries=len(queries)) as sp:
+            cur = self.conn.cursor()
+            try:
+                for (prod, state, postal, date) in queries:
+                    sql = "SELECT rate FROM TAX_RATES WHERE product_code=%s AND state=%s AND postal=%s AND effective_date <= %s ORDER BY effective_date DESC LIMIT 1"
+                    cur.execute(sql, (prod, state or "", postal or "", date or "1970-01-01"))
+                    row = cur.fetchone()
+                    if row:
+                        out[(prod.upper(), (state or "").upper(), (postal or ""), date)] = row[0]
+            finally:
+                cur.close()
+            sp.set(rows=len(out))
         return out
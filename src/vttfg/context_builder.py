@@ -0,0 +1,167 @@
+"""
+Token-budgeted assembly of the ticket text sent to the LLM.
+
+The blob is built in priority order — title, description, comments (most
+recent / most relevant first), then linked docs — and stops adding material
+once CONFIG.llm_context_token_budget is reached. Exact and near-duplicate
+comments and bot/boilerplate comments are dropped up front. Everything left
+out is listed in the returned report, which the orchestrator puts in the audit.
+Linked docs longer than doc_max_chars contribute only their paragraphs that
+best match the ticket (vttfg.doc_index), not their opening characters.
+
+Token counts use tiktoken when it is installed, otherwise ~4 chars per token.
+"""
+import math, re, logging
+from vttfg.config import CONFIG
+
+logger = logging.getLogger("vttfg.context")
+
+_encoder = None
+
+def count_tokens(text):
+    global _encoder
+    if not text:
+        return 0
+    if _encoder is None:
+        try:
+            import tiktoken
+            _encoder = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoder = False
+    if _encoder:
+        return len(_encoder.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+_BOT_RE = re.compile(
+    r"automation for jira|\bjira ?bot\b|github-actions|\[bot\]|this (issue|ticket) (was|has been) (automatically|auto-?)"
+    r"|^\s*(build|pipeline|deployment) (passed|failed|succeeded)|^\s*(\+1|bump|ping|thanks!?|thank you!?|done\.?|ok\.?)\s*$",
+    re.I | re.M)
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SIGNAL_RE = re.compile(
+    r"\b(19|20)\d{2}-\d{2}-\d{2}\b|\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\b|\beffective\b"
+    r"|\bmpf\b|\bmarketplace\b|\btaxab\w*|\bnon-?taxable\b|\bsku\b|\bproduct\b|\bcategory\b|\bfee\b|\bstate\b",
+    re.I)
+_STOP = {"the", "and", "for", "with", "this", "that", "from", "are", "was", "will", "have", "has", "not", "but", "you", "can", "all", "any"}
+
+
+def _words(text):
+    return _WORD_RE.findall((text or "").lower())
+
+def _shingles(words, k=5):
+    if len(words) < k:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+def _jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def _is_boilerplate(text):
+    return not text.strip() or bool(_BOT_RE.search(text))
+
+def _truncate_to_tokens(text, tokens):
+    if tokens <= 0:
+        return ""
+    if count_tokens(text) <= tokens:
+        return text
+    # shrink proportionally, then trim until it fits
+    cut = text[:max(1, int(len(text) * tokens / max(1, count_tokens(text))))]
+    while cut and count_tokens(cut) > tokens:
+        cut = cut[:int(len(cut) * 0.9)]
+    return cut
+
+
+def build_context(jc, docs, token_budget=None, doc_max_chars=2000, near_dup_threshold=0.85):
+    """
+    jc: JiraContext; docs: list of (url, text-or-exception) in linked_docs order.
+    Returns (text_blob, report).
+    """
+    budget = token_budget or CONFIG.llm_context_token_budget
+    report = {"budget_tokens": budget, "tokens": 0, "comments_total": len(jc.comments or []), "comments_kept": 0, "dropped": []}
+    used = 0
+
+    def drop(kind, index, reason, text):
+        report["dropped"].append({"kind": kind, "index": index, "reason": reason,
+                                  "tokens": count_tokens(text), "preview": (text or "")[:80]})
+
+    def take(text):
+        nonlocal used
+        n = count_tokens(text)
+        used += n
+        return n
+
+    # title and description always lead; the description is truncated if it alone blows the budget
+    head = []
+    if getattr(jc, "title", None):
+        head.append(f"Title: {jc.title}")
+        take(head[-1])
+    desc = jc.description if isinstance(jc.description, str) else str(jc.description or "")
+    if desc:
+        section = "Description:\n" + desc
+        fitted = _truncate_to_tokens(section, budget - used)
+        if fitted != section:
+            drop("description", 0, "truncated_to_budget", section[len(fitted):])
+        if fitted:
+            head.append(fitted)
+            take(fitted)
+
+    # comments: drop boilerplate and (near-)duplicates, then rank by recency + relevance
+    signal = {w for w in _words(f"{jc.title} {desc}") if len(w) > 2 and w not in _STOP}
+    comments = [c if isinstance(c, str) else str(c) for c in (jc.comments or [])]
+    kept_shingles, candidates = [], []
+    for i, c in enumerate(comments):
+        if _is_boilerplate(c):
+            drop("comment", i, "bot_or_boilerplate", c)
+            continue
+        words = _words(c)
+        sh = _shingles(words)
+        if any(_jaccard(sh, prev) >= near_dup_threshold for prev in kept_shingles):
+            drop("comment", i, "duplicate", c)
+            continue
+        kept_shingles.append(sh)
+        relevance = (sum(1 for w in words if w in signal) / max(1, len(words))) + min(1.0, len(_SIGNAL_RE.findall(c)) / 5)
+        recency = (i + 1) / len(comments)
+        candidates.append((0.5 * recency + 0.5 * relevance, i, c))
+    chosen = []
+    for score, i, c in sorted(candidates, key=lambda t: -t[0]):
+        n = count_tokens(c) + 1
+        if used + n > budget:
+            drop("comment", i, "over_budget", c)
+            continue
+        used += n
+        chosen.append((i, c))
+    chosen.sort()  # keep chronological order in the prompt
+    report["comments_kept"] = len(chosen)
+
+    pieces = list(head)
+    if chosen:
+        pieces.append("Comments:\n" + "\n\n".join(c for _, c in chosen))
+
+    # linked docs take whatever budget is left; long ones only their passages matching the ticket
+    query = None
+    for i, (url, txt) in enumerate(docs or []):
+        if isinstance(txt, Exception):
+            section = f"Linked doc (url included): {url}"
+        elif len(txt) > doc_max_chars:
+            from vttfg.doc_index import relevant_text, ticket_terms
+            query = query if query is not None else ticket_terms(jc)
+            body, info = relevant_text(url, txt, query, doc_max_chars)
+            report.setdefault("doc_chunks", {})[url] = info
+            section = "Linked doc content:\n" + body
+        else:
+            section = "Linked doc content:\n" + txt
+        fitted = _truncate_to_tokens(section, budget - used)
+        if not fitted:
+            drop("doc", i, "over_budget", url)
+            continue
+        if fitted != section:
+            drop("doc", i, "truncated_to_budget", url)
+        pieces.append(fitted)
+        take(fitted)
+
+    report["tokens"] = used
+    if report["dropped"]:
+        logger.info("Context built: %d/%d tokens, dropped %d parts", used, budget, len(report["dropped"]),
+                    extra={"run_id": "-", "step": "context_build"})
+    return "\n\n".join(pieces), report
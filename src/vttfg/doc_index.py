@@ -0,0 +1,315 @@
+"""
+BM25 index over paragraph chunks of linked documents (SQLite, persists across runs).
+
+Linked docs used to go into the prompt as their first 2000 characters, which is
+mostly preamble; the effective dates and state lists sit further down. Here a
+doc is split into paragraph chunks, indexed once per content hash, and
+build_context keeps only the chunks that best match the ticket's products,
+states and date terms, in document order:
+
+    terms = ticket_terms(jc)
+    text, info = relevant_text(url, doc_text, terms, max_chars=2000)
+
+IDF comes from every chunk indexed so far, so terms that appear in all policy
+docs ("tax", "product") weigh little. Least recently used docs are dropped past
+CONFIG.doc_index_max_docs. Without the index (DOC_INDEX_ENABLED=0, unusable
+file) the same ranking runs on a throwaway in-memory index.
+"""
+from __future__ import annotations
+import hashlib
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from .config import CONFIG
+
+logger = logging.getLogger("vttfg.doc_index")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    url TEXT PRIMARY KEY,
+    hash TEXT NOT NULL,
+    chunks INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS docs_accessed ON docs(accessed);
+CREATE TABLE IF NOT EXISTS chunks (
+    url TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    text TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    PRIMARY KEY (url, idx)
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    url TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    tf INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS postings_term ON postings(term, url);
+CREATE INDEX IF NOT EXISTS postings_url ON postings(url);
+"""
+
+_K1, _B = 1.2, 0.75
+_PARA_RE = re.compile(r"\n\s*\n")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOP = {"the", "and", "for", "with", "this", "that", "from", "are", "was", "will", "have", "has", "not", "but", "you",
+         "can", "all", "any", "its", "our", "per", "into", "be", "is", "of", "to", "a", "an", "on", "at", "as", "by", "it"}
+_MONTHS = ("january", "february", "march", "april", "may", "june", "july", "august", "september", "october", "november", "december")
+_DATE_RE = re.compile(r"\b(19|20)\d{2}\b|\b(jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\b|\beffective\b", re.I)
+_CODE_RE = re.compile(r"\b[A-Za-z]*\d[A-Za-z0-9-]*\b")
+_TOKEN_RE = re.compile(r"[A-Za-z]+|\d+|\S")
+_STATE_CUES = {"in", "across", "state", "states", "jurisdiction", "jurisdictions"}
+
+
+_state_tables = None
+
+
+def _state_info():
+    """({full name: code}, {codes}, full-name regex), built on first use."""
+    global _state_tables
+    if _state_tables is None:
+        from .geoutils import STATE_NAMES
+        names = re.compile(r"\b(" + "|".join(sorted(map(re.escape, STATE_NAMES), key=len, reverse=True)) + r")\b", re.I)
+        _state_tables = STATE_NAMES, set(STATE_NAMES.values()), names
+    return _state_tables
+
+
+def terms(text: str) -> List[str]:
+    """Index terms: lowercase words without stop words; full state names also yield their code ("texas" -> "tx")."""
+    names, _, names_re = _state_info()
+    out = [w for w in _WORD_RE.findall((text or "").lower()) if w not in _STOP]
+    out += [names[m.group(1).upper()].lower() for m in names_re.finditer(text or "")]
+    return out
+
+
+def _state_codes(text: str) -> List[str]:
+    """
+    Two-letter state codes written as states: after "in", "states", "jurisdiction",
+    "state of" ..., in a list of two or more codes ("CA, TX and NY") or before a ZIP.
+    A lone "OR", "IN", "ME" or "OK" in a title is a word, not a state.
+    """
+    _, codes, _ = _state_info()
+    toks = _TOKEN_RE.findall(text or "")
+    out, i = [], 0
+    while i < len(toks):
+        if toks[i] not in codes:
+            i += 1
+            continue
+        run, j = [toks[i]], i + 1
+        while j < len(toks) and (toks[j] in codes or toks[j] in (",", "/", "&", "and", "or")):
+            if toks[j] in codes:
+                run.append(toks[j])
+            j += 1
+        prev = [t.lower() for t in toks[max(0, i - 3):i] if t != ":"]
+        cue = bool(prev) and (prev[-1] in _STATE_CUES or prev[-2:] in (["state", "of"], ["states", "of"]))
+        zip_after = j < len(toks) and len(toks[j]) == 5 and toks[j].isdigit()
+        if len(run) > 1 or cue or zip_after:
+            out += [c.lower() for c in run]
+        i = j
+    return out
+
+
+def ticket_terms(jc) -> Counter:
+    """
+    Query terms for a ticket: title/description words once, plus product codes,
+    states and date terms from title, description and comments, weighted x2.
+    """
+    names, _, names_re = _state_info()
+    desc = jc.description if isinstance(jc.description, str) else str(jc.description or "")
+    head = f"{getattr(jc, 'title', '') or ''}\n{desc}"
+    text = head + "\n" + "\n".join(c if isinstance(c, str) else str(c) for c in (jc.comments or []))
+    query = Counter(w for w in terms(head) if len(w) > 2)
+    strong = _state_codes(text) + [names[m.group(1).upper()].lower() for m in names_re.finditer(text)]
+    strong += terms(" ".join(m.group(0) for m in _CODE_RE.finditer(text)))
+    strong += terms(" ".join(m.group(0) for m in _DATE_RE.finditer(text)))
+    for t in strong:
+        query[t] += 2
+    for month in _MONTHS:   # docs spell months out or abbreviate them
+        short = month[:3]
+        if query[month] or query[short]:
+            query[month] = query[short] = max(query[month], query[short])
+    return query
+
+
+def chunk_text(text: str, max_chars: int = 600, min_chars: int = 150) -> List[str]:
+    """Paragraphs, short ones merged with what follows (headings stay with their section), long ones split at sentences."""
+    chunks, cur = [], ""
+    for para in _PARA_RE.split(text or ""):
+        para = para.strip()
+        while len(para) > max_chars:
+            cut = para.rfind(". ", 0, max_chars) + 1
+            if cut <= 0:
+                cut = para.rfind(" ", 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            if cur:
+                chunks.append(cur)
+                cur = ""
+            chunks.append(para[:cut].strip())
+            para = para[cut:].strip()
+        if not para:
+            continue
+        if cur and (len(cur) >= min_chars or len(cur) + len(para) + 1 > max_chars):
+            chunks.append(cur)
+            cur = para
+        else:
+            cur = f"{cur}\n{para}" if cur else para
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+
+class DocIndex:
+    def __init__(self, path: Optional[str] = None, max_docs: Optional[int] = None):
+        self.path = path or CONFIG.doc_index_path
+        self.max_docs = max_docs or CONFIG.doc_index_max_docs
+        self._local = threading.local()
+        d = os.path.dirname(self.path) if self.path != ":memory:" else ""
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            if self.path != ":memory:":
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def add(self, url: str, text: str) -> int:
+        """Index `text` under `url` unless that exact text is already indexed; returns the chunk count."""
+        digest = hashlib.sha256((text or "").encode("utf-8")).hexdigest()[:24]
+        conn = self._conn()
+        row = conn.execute("SELECT hash, chunks FROM docs WHERE url=?", (url,)).fetchone()
+        if row and row[0] == digest:
+            conn.execute("UPDATE docs SET accessed=? WHERE url=?", (time.time(), url))
+            return row[1]
+        chunks = chunk_text(text)
+        rows, postings, total = [], [], 0
+        for i, chunk in enumerate(chunks):
+            tf = Counter(terms(chunk))
+            n = sum(tf.values())
+            total += n
+            rows.append((url, i, chunk, n))
+            postings += [(t, url, i, c) for t, c in tf.items()]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._delete(conn, url)
+            conn.executemany("INSERT INTO chunks(url, idx, text, length) VALUES (?,?,?,?)", rows)
+            conn.executemany("INSERT INTO postings(term, url, idx, tf) VALUES (?,?,?,?)", postings)
+            conn.execute("INSERT INTO docs(url, hash, chunks, length, accessed) VALUES (?,?,?,?,?)",
+                         (url, digest, len(chunks), total, time.time()))
+            self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return len(chunks)
+
+    @staticmethod
+    def _delete(conn, url):
+        for table in ("postings", "chunks", "docs"):
+            conn.execute(f"DELETE FROM {table} WHERE url=?", (url,))
+
+    def _evict(self, conn):
+        (count,) = conn.execute("SELECT COUNT(*) FROM docs").fetchone()
+        if count <= self.max_docs:
+            return
+        for (url,) in conn.execute("SELECT url FROM docs ORDER BY accessed ASC LIMIT ?", (count - self.max_docs,)).fetchall():
+            self._delete(conn, url)
+
+    def search(self, url: str, query: Dict[str, int], k: int) -> List[Tuple[float, int, str]]:
+        """Top-k (score, chunk index, text) of `url` by BM25 against `query` ({term: weight}); zero scores left out."""
+        query = {t: w for t, w in query.items() if t}
+        if not query:
+            return []
+        conn = self._conn()
+        n_chunks, total = conn.execute("SELECT COALESCE(SUM(chunks), 0), COALESCE(SUM(length), 0) FROM docs").fetchone()
+        if not n_chunks:
+            return []
+        avgdl = total / n_chunks
+        qterms = list(query)
+        scores = Counter()
+        for i in range(0, len(qterms), 500):
+            part = qterms[i:i + 500]
+            marks = ",".join("?" * len(part))
+            df = dict(conn.execute(f"SELECT term, COUNT(*) FROM postings WHERE term IN ({marks}) GROUP BY term", part).fetchall())
+            hits = conn.execute(f"SELECT p.term, p.idx, p.tf, c.length FROM postings p JOIN chunks c ON c.url=p.url AND c.idx=p.idx "
+                                f"WHERE p.url=? AND p.term IN ({marks})", [url, *part]).fetchall()
+            for term, idx, tf, length in hits:
+                idf = math.log(1 + (n_chunks - df[term] + 0.5) / (df[term] + 0.5))
+                scores[idx] += query[term] * idf * tf * (_K1 + 1) / (tf + _K1 * (1 - _B + _B * length / avgdl))
+        top = scores.most_common(k)
+        if not top:
+            return []
+        marks = ",".join("?" * len(top))
+        texts = dict(conn.execute(f"SELECT idx, text FROM chunks WHERE url=? AND idx IN ({marks})", [url, *[i for i, _ in top]]).fetchall())
+        return [(score, idx, texts[idx]) for idx, score in top]
+
+    def stats(self) -> dict:
+        docs, chunks = self._conn().execute("SELECT COUNT(*), COALESCE(SUM(chunks), 0) FROM docs").fetchone()
+        return {"docs": docs, "chunks": chunks}
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_doc_index() -> Optional[DocIndex]:
+    """Process-wide DocIndex, or None when CONFIG.doc_index_enabled is off or the file is unusable."""
+    global _index
+    if not CONFIG.doc_index_enabled:
+        return None
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = DocIndex()
+            except Exception as e:
+                logger.warning("Doc index unavailable: %s", e, extra={"run_id": "-", "step": "doc_index"})
+                _index = False
+        return _index or None
+
+
+def relevant_text(url: str, text: str, query: Dict[str, int], max_chars: int = 2000, k: Optional[int] = None) -> Tuple[str, dict]:
+    """
+    The doc's best-matching chunks (at most k, within max_chars) in document order,
+    gaps marked "[...]"; the doc's opening when nothing matches. Returns (text, info).
+    """
+    k = k or CONFIG.doc_index_top_k
+    index = get_doc_index()
+    try:
+        index = index or DocIndex(":memory:")
+        total = index.add(url, text)
+        hits = index.search(url, query, k)
+    except sqlite3.Error as e:
+        logger.warning("Doc index failed for %s: %s", url, e, extra={"run_id": "-", "step": "doc_index"})
+        return text[:max_chars], {"chunks": None, "kept": None}
+    kept, used = [], 0
+    for _, idx, chunk in hits:
+        if used + len(chunk) > max_chars:
+            continue
+        kept.append((idx, chunk))
+        used += len(chunk) + 6
+    if not kept:
+        return text[:max_chars], {"chunks": total, "kept": []}
+    kept.sort()
+    out, prev = [], -1
+    for idx, chunk in kept:
+        if idx != prev + 1:
+            out.append("[...]")
+        out.append(chunk)
+        prev = idx
+    if prev != total - 1:
+        out.append("[...]")
+    return "\n".join(out), {"chunks": total, "kept": [idx for idx, _ in kept]}
@@ -1,4 +1,4 @@
-import pandas as pd, os, logging
+import os, logging
 from vttfg.config import CONFIG
 logger = logging.getLogger("vttfg.generator")
 
@@ -37,5 +37,6 @@ def rows_to_csv_bytes(test_rows):
             "Product Code": r.product_code,
             "Expected Value": r.expected_value
         })
+    import pandas as pd  # deferred: heavy import, only needed when writing output
     df = pd.DataFrame(records, columns=cols)
     return df.to_csv(index=False).encode("utf-8")
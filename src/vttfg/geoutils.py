@@ -2,6 +2,16 @@ import csv, os, logging
 from vttfg.config import CONFIG
 logger = logging.getLogger("vttfg.geoutils")
 
+# full US state / territory name (upper case) -> USPS code
+STATE_NAMES = dict(pair.replace("_", " ").split(":") for pair in (
+    "ALABAMA:AL ALASKA:AK ARIZONA:AZ ARKANSAS:AR CALIFORNIA:CA COLORADO:CO CONNECTICUT:CT DELAWARE:DE "
+    "DISTRICT_OF_COLUMBIA:DC FLORIDA:FL GEORGIA:GA HAWAII:HI IDAHO:ID ILLINOIS:IL INDIANA:IN IOWA:IA KANSAS:KS "
+    "KENTUCKY:KY LOUISIANA:LA MAINE:ME MARYLAND:MD MASSACHUSETTS:MA MICHIGAN:MI MINNESOTA:MN MISSISSIPPI:MS "
+    "MISSOURI:MO MONTANA:MT NEBRASKA:NE NEVADA:NV NEW_HAMPSHIRE:NH NEW_JERSEY:NJ NEW_MEXICO:NM NEW_YORK:NY "
+    "NORTH_CAROLINA:NC NORTH_DAKOTA:ND OHIO:OH OKLAHOMA:OK OREGON:OR PENNSYLVANIA:PA RHODE_ISLAND:RI "
+    "SOUTH_CAROLINA:SC SOUTH_DAKOTA:SD TENNESSEE:TN TEXAS:TX UTAH:UT VERMONT:VT VIRGINIA:VA WASHINGTON:WA "
+    "WEST_VIRGINIA:WV WISCONSIN:WI WYOMING:WY PUERTO_RICO:PR").split())
+
 _us_cache = None
 def load_us_zips(path=None):
     global _us_cache
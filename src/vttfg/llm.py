@@ -1,8 +1,15 @@
 import logging
 from vttfg.config import CONFIG
-from vttfg.logging_config import setup_logging
+from vttfg.metrics import span, llm_usage, record_event
+from vttfg.connectors.llm_cache import get_response_cache, LLMResponseCache
+from vttfg.utils.json_parser import safe_parse_json_from_text
+from vttfg.connectors.llm_pool import get_client
+from vttfg.connectors.llm_backends import get_backend, needs_gateway
+from vttfg.connectors.resilience import get_caller, with_timeout
+from vttfg.connectors.llm_stream import stream_fields
+from vttfg.connectors.llm_client import fallback_classification
+from vttfg.models import LLMResult
 
-LOG_PATH, _ = setup_logging(CONFIG.output_dir)
 logger = logging.getLogger("vttfg.llm")
 
 def _extract_text_from_sdk_resp(resp):
@@ -26,45 +33,63 @@ def _extract_text_from_sdk_resp(resp):
 
 class PortkeyClient:
     def __init__(self):
+        if not CONFIG.portkey_virtual_key and needs_gateway():
+            raise RuntimeError("PORTKEY_VIRTUAL_KEY not set in env")
         try:
-            from portkey_ai import Portkey
-        except Exception as e:
+            self.client = get_backend()
+        except ImportError as e:
             logger.exception("portkey_ai import failed")
             raise RuntimeError("portkey_ai SDK required") from e
-        if not CONFIG.portkey_virtual_key:
-            raise RuntimeError("PORTKEY_VIRTUAL_KEY not set in env")
-        self.client = Portkey(api_key=None, virtual_key=CONFIG.portkey_virtual_key, base_url=CONFIG.portkey_base_url)
         self.model = CONFIG.portkey_model
+        self.cache = get_response_cache()
+        self.caller = get_caller("portkey")
+        self._async_client = None
 
-    def classify(self, text, prompt=None):
-        prompt = prompt or 'Return JSON: {"classification":"UC2|UC3|UC4|UC6|Maintenance","confidence":0.0}'
-        messages = [{"role":"user","content": prompt + "\n\nTicket:\n" + (text or "")}]
-        resp = self.client.chat.completions.create(messages=messages, model=self.model, max_tokens=200, temperature=0.0)
+    def _classify_prompt(self, prompt=None):
+        return prompt or 'Return JSON: {"classification":"UC2|UC3|UC4|UC6|Maintenance","confidence":0.0}'
+
+    def _messages(self, prompt, text):
+        return [{"role":"user","content": (prompt or "") + "\n\nTicket:\n" + (text or "")}]
+
+    def _content(self, resp):
         import json
-        resp_json = json.loads(str(resp))
-        txt = _extract_text_from_sdk_resp(resp_json)
+        if isinstance(resp, dict):
+            return _extract_text_from_sdk_resp(resp)
+        return _extract_text_from_sdk_resp(json.loads(str(resp)))
+
+    def _parse_classify(self, text, txt):
+        """(classification, confidence); without JSON in `txt`, a flagged keyword guess (see fallback_classification)."""
         try:
-            j = json.loads(txt)
+            j = safe_parse_json_from_text(txt)
+            if j is None:
+                raise ValueError("no JSON object in LLM output")
             return j.get("classification", "UC6"), float(j.get("confidence", 0.0) or 0.0)
         except Exception:
-            t = (text or "").lower()
-            if "merchant" in t: return "UC2", 0.9
-            if "mpf" in t or "marketplace" in t: return "UC3", 0.9
-            if "fee" in t: return "UC4", 0.8
-            if "tax" in t: return "UC6", 0.7
-            return "UC6", 0.5
+            record_event("llm_fallback", op="classify", reason="non_json_output")
+            return fallback_classification(text)
 
-    def extract(self, text, classification, prompt=None):
-        messages = [{"role":"user","content": (prompt or "") + "\n\nTicket:\n" + (text or "")}]
-        resp = self.client.chat.completions.create(messages=messages, model=self.model, max_tokens=800, temperature=0.0)
-        import json
-        resp_json = json.loads(str(resp))
-        txt = _extract_text_from_sdk_resp(resp_json)
-        import json
+    def _parse_classify_extract(self, text, txt):
+        """(classification, confidence, extraction-or-None); extraction is None when unusable."""
+        try:
+            j = safe_parse_json_from_text(txt)
+            if j is None:
+                raise ValueError("no JSON object in LLM output")
+            extraction = j.get("extraction")
+            return (j.get("classification", "UC6"), float(j.get("confidence", 0.0) or 0.0),
+                    extraction if isinstance(extraction, dict) else None)
+        except Exception:
+            record_event("llm_fallback", op="classify_extract", reason="non_json_output")
+            logger.warning("LLM returned non-json output during classify_extract; falling back to separate calls")
+            return LLMResult((*fallback_classification(text), None), source="fallback")
+
+    def _parse_extract(self, text, txt):
         try:
-            j = json.loads(txt)
+            j = safe_parse_json_from_text(txt)
+            if j is None:
+                raise ValueError("no JSON object in LLM output")
             return j
         except Exception:
+            record_event("llm_fallback", op="extract", reason="non_json_output")
             logger.warning("LLM returned non-json output during extract; returning minimal structure")
             return {
                 "item_codes": [], "product_classes": [], "states": [], "postal_codes": [],
@@ -72,5 +97,98 @@ class PortkeyClient:
                 "confidence": 0.0, "raw_extracted_text": (text or "")[:1000]
             }
 
+    def _complete(self, name, prompt, text, max_tokens):
+        """Return the completion text for prompt + ticket text, via the response cache when enabled."""
+        messages = self._messages(prompt, text)
+        key = LLMResponseCache.make_key(self.model, prompt, max_tokens, text) if self.cache else None
+        with span(name, model=self.model, prompt_chars=len(messages[0]["content"])) as sp:
+            content = self.cache.get(key) if key else None
+            if content is not None:
+                sp.set(cache="hit")
+                return content
+            resp = self.caller.call(lambda: with_timeout(self.client).chat.completions.create(messages=messages, model=self.model, max_tokens=max_tokens, temperature=0.0), op=name)
+            sp.set(cache="miss" if key else "off", **llm_usage(resp))
+        content = self._content(resp)
+        if key:
+            self.cache.put(key, content, model=self.model)
+        return content
+
+    def classify(self, text, prompt=None):
+        if CONFIG.llm_stream_classify:
+            try:
+                return self.classify_streaming(text, prompt)
+            except Exception as e:
+                logger.warning("Streamed classify failed, retrying unstreamed: %s", e)
+                record_event("llm_fallback", op="classify_stream", reason=f"{type(e).__name__}: {str(e)[:200]}")
+        content = self._complete("llm.classify", self._classify_prompt(prompt), text, max_tokens=200)
+        return self._parse_classify(text, content)
+
+    def classify_streaming(self, text, prompt=None):
+        """Stops reading the stream once classification and confidence are complete."""
+        prompt = self._classify_prompt(prompt)
+        fields = {path[0]: value for path, value in stream_fields(self, "llm.classify", prompt, text, self._messages(prompt, text), 200,
+                                                                  required=("classification", "confidence"))}
+        if not fields.get("classification"):
+            raise ValueError("stream ended without a classification")
+        return fields["classification"], float(fields.get("confidence", 0.0) or 0.0)
+
+    def extract(self, text, classification, prompt=None):
+        content = self._complete("llm.extract", prompt, text, max_tokens=800)
+        return self._parse_extract(text, content)
+
+    def iter_extract(self, text, classification, prompt=None):
+        """Yield ((key,), value) per top-level extraction member as it streams in; shares extract()'s cache entry."""
+        yield from stream_fields(self, "llm.extract", prompt, text, self._messages(prompt, text), 800)
+
+    def classify_and_extract(self, text, prompt=None):
+        """One round trip for classification, confidence and extraction (prompts/classify_extract.json)."""
+        content = self._complete("llm.classify_extract", prompt, text, max_tokens=1000)
+        return self._parse_classify_extract(text, content)
+
+    # asyncio variants: native AsyncPortkey when the SDK provides it, else the sync call on a worker thread
+    def _get_async_client(self):
+        if self._async_client is None and CONFIG.llm_backend != "live":
+            self._async_client = False  # record/replay backends are sync; run them on a worker thread
+        if self._async_client is None:
+            try:
+                from portkey_ai import AsyncPortkey
+                self._async_client = AsyncPortkey(api_key=None, virtual_key=CONFIG.portkey_virtual_key, base_url=CONFIG.portkey_base_url)
+            except Exception:
+                self._async_client = False
+        return self._async_client
+
+    async def _acomplete(self, name, prompt, text, max_tokens):
+        import asyncio
+        aclient = self._get_async_client()
+        if not aclient:
+            return await asyncio.to_thread(self._complete, name, prompt, text, max_tokens)
+        messages = self._messages(prompt, text)
+        key = LLMResponseCache.make_key(self.model, prompt, max_tokens, text) if self.cache else None
+        with span(name, model=self.model, prompt_chars=len(messages[0]["content"])) as sp:
+            # SQLite is blocking: keep it off the event loop
+            content = await asyncio.to_thread(self.cache.get, key) if key else None
+            if content is not None:
+                sp.set(cache="hit")
+                return content
+            resp = await self.caller.acall(lambda: with_timeout(aclient).chat.completions.create(messages=messages, model=self.model, max_tokens=max_tokens, temperature=0.0), op=name)
+            sp.set(cache="miss" if key else "off", **llm_usage(resp))
+        content = self._content(resp)
+        if key:
+            await asyncio.to_thread(self.cache.put, key, content, self.model)
+        return content
+
+    async def aclassify(self, text, prompt=None):
+        content = await self._acomplete("llm.classify", self._classify_prompt(prompt), text, max_tokens=200)
+        return self._parse_classify(text, content)
+
+    async def aextract(self, text, classification, prompt=None):
+        content = await self._acomplete("llm.extract", prompt, text, max_tokens=800)
+        return self._parse_extract(text, content)
+
+    async def aclassify_and_extract(self, text, prompt=None):
+        content = await self._acomplete("llm.classify_extract", prompt, text, max_tokens=1000)
+        return self._parse_classify_extract(text, content)
+
 def get_llm_client():
-    return PortkeyClient()
+    # one client (and one pooled Portkey SDK instance) per process
+    return get_client("portkey", PortkeyClient)
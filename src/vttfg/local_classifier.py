@@ -0,0 +1,229 @@
+"""
+Local fast-path ticket classifier trained from audit history.
+
+Features are hashed word 1-2 grams plus character 3-grams (crc32 into
+2**HASH_BITS buckets), weighted by sublinear TF x IDF and L2-normalized. The
+model is one L2-normalized centroid per classification (nearest centroid by
+cosine); confidence is a softmax over the centroid similarities. Runtime needs
+only NumPy and the model is a single compressed .npz (CONFIG.local_classifier_path).
+
+Training data are the `audit_*.json` files the orchestrator writes: each holds
+the classification the run used and the ticket text it was made from. Only
+override and LLM classifications are used: audits whose classification came
+from this model or from the keyword fallback are skipped, so it never learns
+from guesses.
+
+    python -m vttfg.local_classifier train [--audits "output/audit_*.json"] [--model path]
+    python -m vttfg.local_classifier evaluate [--audits ...] [--folds 5]
+"""
+import glob, json, logging, math, os, re, threading, time, zlib
+from vttfg.config import CONFIG
+
+logger = logging.getLogger("vttfg.local_classifier")
+
+HASH_BITS = 16
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _features(text):
+    """{bucket: raw count} over hashed word unigrams/bigrams and char 3-grams."""
+    words = _WORD_RE.findall((text or "").lower())
+    grams = words + [a + " " + b for a, b in zip(words, words[1:])]
+    for w in words:
+        padded = f"<{w}>"
+        grams.extend("#" + padded[i:i + 3] for i in range(len(padded) - 2))
+    mask = (1 << HASH_BITS) - 1
+    counts = {}
+    for g in grams:
+        h = zlib.crc32(g.encode("utf-8")) & mask
+        counts[h] = counts.get(h, 0) + 1
+    return counts
+
+
+def _vector(counts, idf):
+    """Sparse (indices, values) of the L2-normalized TF-IDF vector."""
+    import numpy as np
+    if not counts:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+    idx = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+    tf = 1.0 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))
+    vals = tf * idf[idx]
+    norm = float(np.linalg.norm(vals))
+    return idx, (vals / norm if norm else vals).astype(np.float32)
+
+
+class LocalClassifier:
+    def __init__(self, labels, centroids, idf, scale=20.0):
+        self.labels = list(labels)
+        self.centroids = centroids   # (n_labels, 2**HASH_BITS) float32, rows L2-normalized
+        self.idf = idf               # (2**HASH_BITS,) float32
+        self.scale = scale           # softmax sharpness applied to cosine similarities
+
+    @classmethod
+    def fit(cls, texts, labels, scale=20.0):
+        import numpy as np
+        dim = 1 << HASH_BITS
+        docs = [_features(t) for t in texts]
+        df = np.zeros(dim, dtype=np.float32)
+        for d in docs:
+            df[list(d.keys())] += 1
+        idf = (np.log((1 + len(docs)) / (1 + df)) + 1.0).astype(np.float32)
+        names = sorted(set(labels))
+        centroids = np.zeros((len(names), dim), dtype=np.float32)
+        row = {n: i for i, n in enumerate(names)}
+        for d, label in zip(docs, labels):
+            idx, vals = _vector(d, idf)
+            centroids[row[label], idx] += vals
+        norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+        centroids /= np.where(norms == 0, 1.0, norms)
+        return cls(names, centroids, idf, scale)
+
+    def scores(self, text):
+        import numpy as np
+        idx, vals = _vector(_features(text), self.idf)
+        sims = self.centroids[:, idx] @ vals if len(idx) else np.zeros(len(self.labels), dtype=np.float32)
+        z = np.exp((sims - sims.max()) * self.scale)
+        return z / z.sum()
+
+    def predict(self, text):
+        """(classification, confidence)."""
+        probs = self.scores(text)
+        best = int(probs.argmax())
+        return self.labels[best], float(probs[best])
+
+    def save(self, path=None):
+        import numpy as np
+        path = path or CONFIG.local_classifier_path
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        # centroids are sparse in practice; float16 halves the file without moving any argmax
+        with open(path, "wb") as fh:
+            np.savez_compressed(fh, labels=np.array(self.labels), centroids=self.centroids.astype(np.float16),
+                                idf=self.idf.astype(np.float16), scale=np.array(self.scale), hash_bits=np.array(HASH_BITS))
+        return path
+
+    @classmethod
+    def load(cls, path=None):
+        import numpy as np
+        with np.load(path or CONFIG.local_classifier_path) as z:
+            if int(z["hash_bits"]) != HASH_BITS:
+                raise ValueError(f"model was trained with hash_bits={int(z['hash_bits'])}, runtime uses {HASH_BITS}")
+            return cls([str(x) for x in z["labels"]], z["centroids"].astype(np.float32), z["idf"].astype(np.float32), float(z["scale"]))
+
+
+# classification sources whose labels are trusted; not "local" (this model) or "fallback" (keyword guess)
+_TRAINING_SOURCES = {"override", "llm", "llm_combined"}
+
+
+def load_audit_examples(pattern=None):
+    """
+    [(ticket_text, classification)] from audits that record a confirmed classification
+    (override or LLM) and the full ticket text; audits classified by this model, by the
+    keyword fallback, and older audits without those fields are skipped.
+    """
+    pattern = pattern or os.path.join(CONFIG.output_dir, "audit_*.json")
+    examples = {}
+    for path in sorted(glob.glob(pattern)):
+        try:
+            with open(path, encoding="utf-8") as fh:
+                audit = json.load(fh)
+        except Exception as e:
+            logger.warning("Skipping unreadable audit %s: %s", path, e, extra={"run_id": "-", "step": "local_train"})
+            continue
+        label, text, source = audit.get("classification"), audit.get("ticket_text"), audit.get("classification_source")
+        if not label or not text or source not in _TRAINING_SOURCES:
+            continue
+        # later audits of the same ticket win (files sort by timestamp)
+        examples[audit.get("jira_id") or path] = (text, label)
+    return list(examples.values())
+
+
+def train(pattern=None, model_path=None):
+    examples = load_audit_examples(pattern)
+    if len({label for _, label in examples}) < 2:
+        raise ValueError(f"need audits for at least two classifications, found {len(examples)} usable audits")
+    model = LocalClassifier.fit([t for t, _ in examples], [label for _, label in examples])
+    path = model.save(model_path)
+    logger.info("Local classifier trained on %d audits -> %s", len(examples), path, extra={"run_id": "-", "step": "local_train"})
+    return model, len(examples), path
+
+
+def evaluate(pattern=None, folds=5, threshold=None):
+    """k-fold accuracy overall and above the LLM threshold (with coverage), plus predict latency."""
+    threshold = CONFIG.llm_confidence_threshold if threshold is None else threshold
+    examples = load_audit_examples(pattern)
+    folds = max(2, min(folds, len(examples)))
+    correct = confident = confident_correct = 0
+    latencies = []
+    for k in range(folds):
+        train_set = [e for i, e in enumerate(examples) if i % folds != k]
+        test_set = [e for i, e in enumerate(examples) if i % folds == k]
+        if not test_set or len({label for _, label in train_set}) < 2:
+            continue
+        model = LocalClassifier.fit([t for t, _ in train_set], [label for _, label in train_set])
+        for text, label in test_set:
+            t0 = time.perf_counter()
+            pred, conf = model.predict(text)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            correct += pred == label
+            if conf >= threshold:
+                confident += 1
+                confident_correct += pred == label
+    n = len(latencies)
+    latencies.sort()
+    return {
+        "examples": len(examples), "evaluated": n, "folds": folds, "threshold": threshold,
+        "accuracy": correct / n if n else None,
+        "coverage": confident / n if n else None,
+        "accuracy_above_threshold": confident_correct / confident if confident else None,
+        "p50_ms": latencies[n // 2] if n else None,
+        "p95_ms": latencies[min(n - 1, int(math.ceil(0.95 * n)) - 1)] if n else None,
+    }
+
+
+_model = None
+_model_key = None
+_model_lock = threading.Lock()
+
+
+def get_local_classifier():
+    """The persisted model (reloaded when the file changes), or None when disabled or not trained yet."""
+    global _model, _model_key
+    path = CONFIG.local_classifier_path
+    if not CONFIG.local_classifier_enabled or not path or not os.path.exists(path):
+        return None
+    key = (path, os.path.getmtime(path))
+    with _model_lock:
+        if key != _model_key:
+            try:
+                _model = LocalClassifier.load(path)
+            except Exception as e:
+                logger.warning("Local classifier unavailable: %s", e, extra={"run_id": "-", "step": "local_classify"})
+                _model = None
+            _model_key = key
+        return _model
+
+
+def classify_local(text):
+    """(classification, confidence) when the local model is at least CONFIG.llm_confidence_threshold sure, else None."""
+    model = get_local_classifier()
+    if model is None or not text:
+        return None
+    cls, conf = model.predict(text)
+    return (cls, conf) if conf >= CONFIG.llm_confidence_threshold else None
+
+
+if __name__ == "__main__":
+    import argparse
+    p = argparse.ArgumentParser(prog="python -m vttfg.local_classifier")
+    p.add_argument("command", choices=["train", "evaluate"])
+    p.add_argument("--audits", default=None, help='glob of audit files (default: "<OUTPUT_DIR>/audit_*.json")')
+    p.add_argument("--model", default=None, help="model path (default: CONFIG.local_classifier_path)")
+    p.add_argument("--folds", type=int, default=5)
+    args = p.parse_args()
+    if args.command == "train":
+        _, n, path = train(args.audits, args.model)
+        print(f"trained on {n} audits -> {path}")
+    else:
+        print(json.dumps(evaluate(args.audits, folds=args.folds), indent=2))
@@ -1,6 +1,12 @@
 import logging, os
 
+_configured = None
+
 def setup_logging(output_dir="output"):
+    # idempotent: entry points call this on startup, later calls are free
+    global _configured
+    if _configured is not None:
+        return _configured
     os.makedirs(output_dir, exist_ok=True)
     log_path = os.path.join(output_dir, "vttfg.log")
     # add only one file handler and one stream handler
@@ -14,4 +20,5 @@ def setup_logging(output_dir="output"):
         ch.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
         root.addHandler(ch)
     root.setLevel(logging.INFO)
-    return log_path, True
+    _configured = (log_path, True)
+    return _configured
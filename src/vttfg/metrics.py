@@ -0,0 +1,168 @@
+"""
+Lightweight per-run timing and instrumentation.
+
+Every stage and connector wraps its work in `span(name, **attrs)`. Spans report
+into the run started by `start_run()` (tracked in a contextvar, so it follows
+asyncio tasks and asyncio.to_thread), capturing wall time plus optional counters
+such as bytes, rows, prompt_chars and tokens. Spans opened outside a run are
+only logged.
+
+At the end of a run the orchestrator copies the spans into the audit JSON and
+appends them to CONFIG.metrics_path as JSONL (one span per line), which
+`python -m vttfg.metrics [path]` summarizes as p50/p95 per stage.
+"""
+import contextvars, datetime, json, logging, os, threading, time, uuid
+from contextlib import contextmanager
+from vttfg.config import CONFIG
+
+logger = logging.getLogger("vttfg.metrics")
+
+_current_run = contextvars.ContextVar("vttfg_current_run", default=None)
+_file_lock = threading.Lock()
+
+
+def new_run_id():
+    return f"run_{datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}_{uuid.uuid4().hex[:8]}"
+
+
+class RunMetrics:
+    def __init__(self, run_id=None, jira_id=None):
+        self.run_id = run_id or new_run_id()
+        self.jira_id = jira_id
+        self.spans = []
+        self.events = []
+        self._lock = threading.Lock()
+
+    def add_span(self, record):
+        with self._lock:
+            self.spans.append(record)
+
+    def add_event(self, kind, **attrs):
+        with self._lock:
+            self.events.append({"event": kind, "ts": datetime.datetime.utcnow().isoformat(), **attrs})
+
+    def summary(self):
+        """Total wall ms per span name (a name can repeat, e.g. one gdocs fetch per doc)."""
+        out = {}
+        with self._lock:
+            for s in self.spans:
+                out[s["name"]] = round(out.get(s["name"], 0.0) + s["wall_ms"], 3)
+        return out
+
+    def write_jsonl(self, path=None):
+        path = path or CONFIG.metrics_path
+        if not path:
+            return None
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with self._lock:
+            lines = "".join(json.dumps({"run_id": self.run_id, "jira_id": self.jira_id, **s}, default=str) + "\n" for s in self.spans)
+        with _file_lock, open(path, "a", encoding="utf-8") as fh:
+            fh.write(lines)
+        return path
+
+
+def current_run():
+    return _current_run.get()
+
+
+def current_run_id():
+    run = _current_run.get()
+    return run.run_id if run else "-"
+
+
+def record_event(kind, **attrs):
+    """Attach a notable event (fallback, retry, hedge...) to the current run, if any."""
+    run = _current_run.get()
+    if run is not None:
+        run.add_event(kind, **attrs)
+    logger.info("event %s %s", kind, attrs, extra={"run_id": current_run_id(), "step": kind})
+
+
+@contextmanager
+def start_run(run_id=None, jira_id=None):
+    run = RunMetrics(run_id=run_id, jira_id=jira_id)
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+
+
+class Span:
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = dict(attrs)
+        self._t0 = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def incr(self, key, n=1):
+        self.attrs[key] = self.attrs.get(key, 0) + n
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall_ms = round((time.perf_counter() - self._t0) * 1000.0, 3)
+        record = {"name": self.name, "wall_ms": wall_ms, "ts": datetime.datetime.utcnow().isoformat(), **self.attrs}
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        run = _current_run.get()
+        if run is not None:
+            run.add_span(record)
+        logger.debug("span %s %.1fms %s", self.name, wall_ms, self.attrs, extra={"run_id": current_run_id(), "step": self.name})
+        return False
+
+
+def span(name, **attrs):
+    return Span(name, **attrs)
+
+
+def llm_usage(resp):
+    """Pull token counts from a chat completion response (dict or SDK object); {} if absent."""
+    usage = resp.get("usage") if isinstance(resp, dict) else getattr(resp, "usage", None)
+    if not usage:
+        return {}
+    out = {}
+    for k in ("prompt_tokens", "completion_tokens", "total_tokens"):
+        v = usage.get(k) if isinstance(usage, dict) else getattr(usage, k, None)
+        if isinstance(v, int):
+            out[k] = v
+    return out
+
+
+def _percentile(sorted_vals, q):
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, max(0, int(round(q * (len(sorted_vals) - 1)))))
+    return sorted_vals[idx]
+
+
+def summarize_file(path=None):
+    """Return {span name: {count, p50_ms, p95_ms, max_ms}} over a metrics JSONL file."""
+    path = path or CONFIG.metrics_path
+    per = {}
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                rec = json.loads(line)
+            except Exception:
+                continue
+            per.setdefault(rec.get("name", "?"), []).append(float(rec.get("wall_ms", 0.0)))
+    out = {}
+    for name, vals in sorted(per.items()):
+        vals.sort()
+        out[name] = {"count": len(vals), "p50_ms": _percentile(vals, 0.5), "p95_ms": _percentile(vals, 0.95), "max_ms": vals[-1]}
+    return out
+
+
+if __name__ == "__main__":
+    import sys
+    stats = summarize_file(sys.argv[1] if len(sys.argv) > 1 else None)
+    print(f"{'stage':40s} {'count':>7s} {'p50_ms':>10s} {'p95_ms':>10s} {'max_ms':>10s}")
+    for name, s in stats.items():
+        print(f"{name:40s} {s['count']:7d} {s['p50_ms']:10.1f} {s['p95_ms']:10.1f} {s['max_ms']:10.1f}")
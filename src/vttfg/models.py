@@ -11,6 +11,7 @@ class JiraContext:
     linked_docs: List[str] = field(default_factory=list)
     attachments: List[Dict[str, Any]] = field(default_factory=list)
     created_at: datetime = field(default_factory=datetime.utcnow)
+    updated: str = ""  # raw Jira `updated` timestamp; changes whenever the issue does
     raw_payload: Dict[str, Any] = field(default_factory=dict)
 
 @dataclass
@@ -57,3 +58,14 @@ class TestRow:
     expected_value: Optional[str] = None
     source: Dict[str, Any] = field(default_factory=dict)
     metadata: Dict[str, Any] = field(default_factory=dict)
+
+
+class LLMResult(tuple):
+    """A classify / classify_and_extract tuple that says where it came from: "llm", or "fallback" when the answer had no JSON."""
+    def __new__(cls, values, source="llm"):
+        self = super().__new__(cls, values)
+        self.source = source
+        return self
+
+    def __getnewargs__(self):
+        return tuple(self), self.source
@@ -1,66 +1,346 @@
-import os, logging, json, datetime
+import os, logging, json, datetime, threading, time, copy, importlib, contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from vttfg.config import CONFIG
 from vttfg.logging_config import setup_logging
 from vttfg.prompts_loader import load_classify_prompt, load_prompt_for
-from vttfg.llm import get_llm_client
-from vttfg.connectors import jira as jira_conn, google_docs as gdocs, google_sheets as gsheets, snowflake as snowconn
 from vttfg.validators import validate_uc3
 from vttfg.rules import build_testrows
 from vttfg.generator import rows_to_csv_bytes
+from vttfg.metrics import start_run, span, record_event
+from vttfg.context_builder import build_context
+from vttfg.stage_cache import STAGE_CACHE, stage_key, content_hash
 
-LOG_PATH, _ = setup_logging(CONFIG.output_dir)
 logger = logging.getLogger("vttfg.orchestrator")
 
+_init_lock = threading.RLock()
+_stage_pool = None
+
+
+def _submit_stage(fn, *args):
+    """Run a side stage (attachments) next to the main pipeline of a ticket, inside its run context."""
+    global _stage_pool
+    with _init_lock:
+        if _stage_pool is None:
+            _stage_pool = ThreadPoolExecutor(max_workers=max(1, CONFIG.batch_max_workers), thread_name_prefix="vttfg-stage")
+    return _stage_pool.submit(contextvars.copy_context().run, fn, *args)
+
+class _BatchResults(dict):
+    """Batch outcomes keyed by jira_id; `started` is when the batch began (monotonic)."""
+    def __init__(self):
+        super().__init__()
+        self.started = time.monotonic()
+
+
 class Orchestrator:
+    # connectors are created on first use (see __getattr__), so a run that never
+    # touches Snowflake or the LLM never pays for their imports or connections
+    _LAZY = {
+        "llm": "_make_llm",
+        "jira": "_make_jira",
+        "gdocs": "_make_gdocs",
+        "gsheets": "_make_gsheets",
+        "snow": "_make_snow",
+    }
+
     def __init__(self):
-        self.llm = get_llm_client()
-        self.jira = jira_conn
-        self.gdocs = gdocs
-        self.gsheets = gsheets
+        setup_logging(CONFIG.output_dir)
+        self.stage_cache = STAGE_CACHE
+        # per-backend caps so batch runs overlap stages without flooding any one service
+        self._limits = {
+            "jira": threading.BoundedSemaphore(max(1, CONFIG.jira_max_concurrency)),
+            "gdocs": threading.BoundedSemaphore(max(1, CONFIG.gdocs_max_concurrency)),
+            "llm": threading.BoundedSemaphore(max(1, CONFIG.llm_max_concurrency)),
+            "snowflake": threading.BoundedSemaphore(max(1, CONFIG.snowflake_max_concurrency)),
+        }
+
+    def __getattr__(self, name):
+        factory = type(self)._LAZY.get(name)
+        if factory is None:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        with _init_lock:
+            if name not in self.__dict__:
+                self.__dict__[name] = getattr(self, factory)()
+            return self.__dict__[name]
+
+    def _make_llm(self):
+        from vttfg.llm import get_llm_client
+        return get_llm_client()
+
+    def _make_jira(self):
+        return importlib.import_module("vttfg.connectors.jira")
+
+    def _make_gdocs(self):
+        return importlib.import_module("vttfg.connectors.google_docs")
+
+    def _make_gsheets(self):
+        return importlib.import_module("vttfg.connectors.google_sheets")
+
+    def _make_snow(self):
         try:
-            self.snow = snowconn.SnowflakeConnector()
+            from vttfg.connectors.snowflake import SnowflakeConnector
+            return SnowflakeConnector()
         except Exception as e:
             logger.warning("Snowflake connector not available: %s", e)
-            self.snow = None
+            return None
 
     def run_for_jira(self, jira_id, overrides=None):
         overrides = overrides or {}
-        run_id = f"run_{int(datetime.datetime.utcnow().timestamp())}"
-        debug = {"notes": []}
-        # 1) Jira context (fetch once)
-        jc = overrides.get("jira_context")
-        if not jc:
+        with start_run(jira_id=jira_id) as run:
+            debug = {"notes": []}
+            # 1) Jira context + text blob (fetch once; reuses what the UI already fetched)
+            jc = overrides.get("jira_context")
+            text_blob = overrides.get("text_blob")
+            if not jc and overrides.get("prefetched_context") is not None:
+                # bulk-fetched by a batch run: cache it as the latest context instead of fetching again
+                jc, cached_blob = self._cache_context(jira_id, overrides["prefetched_context"])
+                text_blob = text_blob or cached_blob
+            elif not jc:
+                jc, cached_blob = self.prepare_context(jira_id, refresh=overrides.get("refresh", False))
+                text_blob = text_blob or cached_blob
+            # 2) Build text blob (title + description + comments + linked docs text if any)
+            if not text_blob:
+                text_blob = self._text_blob_for(jc)
+            # attachments download/parse while the LLM works
+            attachments = _submit_stage(self.attachment_tables, jira_id, jc)
+            report = self._context_report(text_blob)
+            if report:
+                debug["context"] = report
+            classification = overrides.get("classification")
+            # manual_extraction: edited by hand, used as-is; ui_extraction: the LLM extraction the UI already showed
+            extraction = overrides.get("manual_extraction") or overrides.get("ui_extraction")
+            source = "override" if classification else None
+            # 3a) Local classifier first; the LLM classifies only when it is not confident enough
+            if not classification:
+                local = self.local_classify(text_blob)
+                if local:
+                    (classification, conf), source = local, "local"
+            # 3+4) Combined classification + extraction in one LLM call when neither is overridden
+            if not classification and not extraction and CONFIG.llm_combined_mode and hasattr(self.llm, "classify_and_extract"):
+                result = self.classify_and_extract_context(jira_id, jc, text_blob, prompt=load_prompt_for("classify_extract"))
+                (classification, extraction), source = self._combined_outcome(result, debug), "llm_combined"
+            # 3) Classification (LLM) once unless override
+            if not classification:
+                result = self.classify_context(jira_id, jc, jc.title, prompt=load_classify_prompt())
+                classification, conf = result
+                source = getattr(result, "source", "llm")
+            # 4) Extraction (LLM) unless manual override; products resolve while the rest of it streams in
+            products = None
+            if not extraction:
+                def on_field(key, value):
+                    nonlocal products
+                    if key == "item_codes" and isinstance(value, list) and products is None:
+                        products = _submit_stage(self.resolve_items, value, overrides.get("template_path"))
+                extraction = self.extract_context(jira_id, jc, text_blob, classification, prompt=load_prompt_for("uc3"), on_field=on_field)
+            self._apply_attachments(extraction, attachments.result(), debug, manual=bool(overrides.get("manual_extraction")))
+            debug["classification"] = {"value": classification, "source": source}
+            return self._finish_run(jira_id, jc, extraction, overrides, debug, run, text_blob=text_blob, products=products)
+
+    def prepare_context(self, jira_id, refresh=False):
+        """
+        Return (JiraContext, text_blob) for a ticket, memoized in the stage cache.
+
+        Without refresh the most recent context fetched for jira_id in this process
+        is reused as-is; otherwise the issue is refetched and the linked docs are
+        only re-read when the issue's `updated` timestamp changed.
+        """
+        latest_key = stage_key("latest_context", jira_id)
+        if not refresh:
+            ctx_key = self.stage_cache.get(latest_key)
+            cached = self.stage_cache.get(ctx_key) if ctx_key else None
+            if cached is not None:
+                record_event("stage_cache_hit", stage="context", jira_id=jira_id)
+                return cached
+        with self._limits["jira"], span("stage.jira"):
             jc = self.jira.fetch_issue(jira_id)
-        # 2) Build text blob (title + description + comments + linked docs text if any)
-        pieces = []
-        if getattr(jc, "title", None):
-            pieces.append(f"Title: {jc.title}")
-        if getattr(jc, "description", None):
-            pieces.append("Description:\n" + (jc.description if isinstance(jc.description, str) else str(jc.description)))
-        if getattr(jc, "comments", None):
-            comments_text = "\n\n".join([str(c) for c in (jc.comments or [])])
-            if comments_text:
-                pieces.append("Comments:\n" + comments_text)
-        # linked docs fetch
-        linked_docs = getattr(jc, "linked_docs", []) or []
-        for url in linked_docs:
+        return self._cache_context(jira_id, jc)
+
+    def _cache_context(self, jira_id, jc):
+        """Store a freshly fetched context as the latest for jira_id; linked docs are re-read only when it changed."""
+        latest_key = stage_key("latest_context", jira_id)
+        ctx_key = stage_key("context", jira_id, self._context_version(jc))
+        cached = self.stage_cache.get(ctx_key)
+        if cached is None:
+            cached = self.stage_cache.put(ctx_key, (jc, self._text_blob_for(jc)))
+        else:
+            cached = self.stage_cache.put(ctx_key, (jc, cached[1]))
+        self.stage_cache.put(latest_key, ctx_key)
+        return cached
+
+    def local_classify(self, text):
+        """(classification, confidence) from the local model when it clears the LLM threshold, else None."""
+        if not CONFIG.local_classifier_enabled:
+            return None
+        from vttfg.local_classifier import classify_local
+        with span("stage.local_classify") as sp:
+            result = classify_local(text)
+            sp.set(hit=bool(result))
+        if result:
+            record_event("local_classification", classification=result[0], confidence=round(result[1], 4))
+        return result
+
+    def classify_context(self, jira_id, jc, text, prompt=None):
+        """LLM classification of `text`, memoized per (jira id, updated, prompt hash, text hash); fallbacks are not memoized."""
+        key = stage_key("classify", jira_id, self._context_version(jc), content_hash(prompt or ""), content_hash(text or ""))
+        cached = self.stage_cache.get(key)
+        if cached is not None:
+            record_event("stage_cache_hit", stage="classify", jira_id=jira_id)
+            return cached
+        with self._limits["llm"], span("stage.classify"):
+            result = self.llm.classify(text, prompt=prompt)
+        if getattr(result, "source", "llm") == "fallback":
+            return result
+        return self.stage_cache.put(key, tuple(result))
+
+    def extract_context(self, jira_id, jc, text_blob, classification, prompt=None, on_field=None):
+        """
+        LLM extraction, memoized per (jira id, updated, prompt hash, classification, text hash).
+        When streamed (CONFIG.llm_stream_extract), on_field(key, value) is called for each
+        top-level member as soon as it is complete.
+        """
+        key = stage_key("extract", jira_id, self._context_version(jc), content_hash(prompt or ""), classification, content_hash(text_blob or ""))
+        cached = self.stage_cache.get(key)
+        if cached is not None:
+            record_event("stage_cache_hit", stage="extract", jira_id=jira_id, classification=classification)
+            return copy.deepcopy(cached)
+        with self._limits["llm"], span("stage.extract"):
+            extraction = self._extract(text_blob, classification, prompt, on_field)
+        self.stage_cache.put(key, copy.deepcopy(extraction))
+        return extraction
+
+    def _extract(self, text_blob, classification, prompt, on_field=None):
+        if not CONFIG.llm_stream_extract or not hasattr(self.llm, "iter_extract"):
+            return self.llm.extract(text_blob, classification, prompt=prompt)
+        fields = {}
+        try:
+            for path, value in self.llm.iter_extract(text_blob, classification, prompt=prompt):
+                fields[path[0]] = value
+                if on_field is not None:
+                    on_field(path[0], value)
+        except Exception as e:
+            logger.warning("Streamed extract failed, retrying unstreamed: %s", e, extra={"run_id": "-", "step": "extract"})
+            record_event("llm_fallback", op="extract_stream", reason=f"{type(e).__name__}: {str(e)[:200]}")
+            fields = {}
+        # no JSON in the stream: the unstreamed call applies extract()'s own fallback
+        return fields or self.llm.extract(text_blob, classification, prompt=prompt)
+
+    def resolve_items(self, items, template_path=None):
+        """(items, (codes, notes)) for build_testrows' `resolved`; a side stage started as soon as item_codes has streamed in."""
+        from vttfg.template import read_template_metadata, resolve_products
+        with span("stage.resolve_products", items=len(items)):
+            return list(items), resolve_products(items, read_template_metadata(template_path))
+
+    def classify_and_extract_context(self, jira_id, jc, text_blob, prompt=None):
+        """
+        Single LLM call returning (classification, confidence, extraction-or-None),
+        memoized like the separate stages (fallbacks are not).
+        """
+        key = stage_key("classify_extract", jira_id, self._context_version(jc), content_hash(prompt or ""), content_hash(text_blob or ""))
+        cached = self.stage_cache.get(key)
+        if cached is not None:
+            record_event("stage_cache_hit", stage="classify_extract", jira_id=jira_id)
+            return cached[0], cached[1], copy.deepcopy(cached[2])
+        with self._limits["llm"], span("stage.classify_extract"):
+            result = self.llm.classify_and_extract(text_blob, prompt=prompt)
+        if getattr(result, "source", "llm") == "fallback":
+            return result
+        classification, conf, extraction = result
+        self.stage_cache.put(key, (classification, conf, copy.deepcopy(extraction)))
+        return classification, conf, extraction
+
+    def _combined_outcome(self, result, debug):
+        """(classification, extraction) to keep from a combined call; None marks what a separate call must redo."""
+        classification, conf, extraction = result
+        if getattr(result, "source", "llm") == "fallback":
+            debug["notes"].append("combined classify+extract answered without JSON; running separate calls")
+            return None, None
+        if extraction is None or conf < CONFIG.llm_confidence_threshold:
+            debug["notes"].append(f"combined classify+extract confidence {conf:.2f} below threshold or no payload; running separate extract")
+            return classification, None
+        return classification, extraction
+
+    def attachment_tables(self, jira_id, jc):
+        """(tables, per-file report) from the ticket's CSV/XLSX attachments and linked Google Sheets, memoized per issue version; never raises."""
+        if not CONFIG.attachments_enabled:
+            return [], []
+        files = getattr(jc, "attachments", None) if hasattr(self.jira, "ingest_attachments") else None
+        sheets = [u for u in getattr(jc, "linked_docs", None) or [] if "/spreadsheets/d/" in u]
+        if not files and not sheets:
+            return [], []
+        key = stage_key("attachments", jira_id, self._context_version(jc))
+        cached = self.stage_cache.get(key)
+        if cached is not None:
+            record_event("stage_cache_hit", stage="attachments", jira_id=jira_id)
+            return cached
+        tables, report = [], []
+        if files:
+            try:
+                with self._limits["jira"], span("stage.attachments", files=len(files)):
+                    tables, report = self.jira.ingest_attachments(jc)
+            except Exception as e:
+                logger.warning("Attachment ingestion failed for %s: %s", jira_id, e, extra={"run_id": "-", "step": "attachments"})
+                return [], []
+        for url in sheets:
             try:
-                txt = self.gdocs.fetch_doc_text(url)
-                pieces.append("Linked doc content:\n" + txt[:2000])
+                with self._limits["gdocs"], span("stage.linked_sheet", url=url) as sp:
+                    found = self.gsheets.sheet_tables(url)
+                    sp.set(tables=len(found))
+                tables.extend(found)
+                report.append({"file": url, "status": "read", "tables": len(found)})
             except Exception as e:
-                logger.warning("Failed fetching linked doc %s: %s", url, e)
-                pieces.append(f"Linked doc (url included): {url}")
-        text_blob = overrides.get("text_blob") or "\n\n".join(pieces)
-        # 3) Classification (LLM) once unless override
-        classification = overrides.get("classification")
-        if not classification:
-            classify_prompt = load_classify_prompt()
-            classification, conf = self.llm.classify(jc.title, prompt=classify_prompt)
-        # 4) Extraction (LLM) unless manual override
-        extraction = overrides.get("manual_extraction")
-        if not extraction:
-            prompt = load_prompt_for("uc3")
-            extraction = self.llm.extract(text_blob, classification, prompt=prompt)
+                logger.warning("Linked sheet %s of %s not read: %s", url, jira_id, e, extra={"run_id": "-", "step": "attachments"})
+                report.append({"file": url, "status": f"failed: {e}"})
+        return self.stage_cache.put(key, (tables, report))
+
+    def _apply_attachments(self, extraction, result, debug, manual=False):
+        """Merge attachment tables into the extraction (not into a manual one) and note what came from where."""
+        tables, files = result
+        if not files:
+            return
+        from vttfg.connectors.attachments import merge_tables
+        info = debug["attachments"] = {"files": files, "tables": [{k: t[k] for k in ("file", "sheet", "rows", "columns")} for t in tables]}
+        if tables and not manual and isinstance(extraction, dict):
+            info["added"] = merge_tables(extraction, tables)
+
+    def _context_version(self, jc):
+        # the issue's `updated` stamp; fall back to hashing the content when the connector lacks it
+        return getattr(jc, "updated", "") or content_hash([jc.title, jc.description, jc.comments, jc.linked_docs])
+
+    def _text_blob_for(self, jc):
+        linked_docs = getattr(jc, "linked_docs", []) or []
+        with span("stage.linked_docs", docs=len(linked_docs)) as sp:
+            if linked_docs and hasattr(self.gdocs, "fetch_docs_text"):
+                # all of the ticket's docs at once; the connector's pool bounds concurrency process-wide
+                texts = self.gdocs.fetch_docs_text(linked_docs)
+            else:
+                texts = [self._fetch_linked_doc(url) for url in linked_docs]
+            text_blob = self._build_text_blob(jc, list(zip(linked_docs, texts)))
+            sp.set(chars=len(text_blob))
+        return text_blob
+
+    def _fetch_linked_doc(self, url):
+        """Return the doc text, or the exception raised while fetching it."""
+        try:
+            with self._limits["gdocs"]:
+                return self.gdocs.fetch_doc_text(url)
+        except Exception as e:
+            logger.warning("Failed fetching linked doc %s: %s", url, e)
+            return e
+
+    def _build_text_blob(self, jc, docs):
+        """docs: list of (url, text-or-exception) in linked_docs order; fitted to CONFIG.llm_context_token_budget."""
+        text_blob, report = build_context(jc, docs)
+        # keyed by the blob itself so a run that reuses a UI/cached blob still finds what was dropped
+        self.stage_cache.put(stage_key("context_report", content_hash(text_blob)), report)
+        return text_blob
+
+    def _context_report(self, text_blob):
+        return self.stage_cache.get(stage_key("context_report", content_hash(text_blob or "")))
+
+    def _finish_run(self, jira_id, jc, extraction, overrides, debug, run, text_blob=None, products=None):
+        """
+        Steps after extraction: validate, build rows, expected rates, write CSV and audit.
+        `products` is the resolve_items side stage, if one was started.
+        """
         # Ensure jira_created_at present if dates missing
         if "date_specs" not in extraction or not extraction.get("date_specs"):
             extraction["jira_created_at"] = jc.created_at.strftime("%Y-%m-%d") if jc and getattr(jc, "created_at", None) else ""
@@ -69,30 +349,148 @@ class Orchestrator:
         if qs:
             debug["clarify_questions"] = qs
         # 6) Build test rows
-        test_rows = build_testrows(extraction, template_path=overrides.get("template_path"))
+        resolved = None
+        if products is not None:
+            try:
+                resolved = products.result()
+            except Exception as e:
+                logger.warning("Early product resolution failed, resolving again: %s", e, extra={"run_id": run.run_id, "step": "build_testrows"})
+        with span("stage.build_testrows") as sp:
+            test_rows = build_testrows(extraction, template_path=overrides.get("template_path"), resolved=resolved)
+            sp.set(rows=len(test_rows))
         # 7) Optional expected rate fetch via Snowflake
         if self.snow:
             try:
                 queries = []
                 for r in test_rows:
                     queries.append((r.product_code, r.dest_main_division, r.dest_postal_code, r.document_date))
-                rates = self.snow.batch_get_expected_rates(queries)
+                with self._limits["snowflake"], span("stage.snowflake", queries=len(queries)):
+                    rates = self.snow.batch_get_expected_rates(queries)
                 for r in test_rows:
                     key = (r.product_code, r.dest_main_division, r.dest_postal_code, r.document_date)
                     if key in rates:
                         r.expected_value = rates[key]
             except Exception as e:
-                logger.warning("Failed to fetch rates: %s", e)
+                logger.warning("Failed to fetch rates: %s", e, extra={"run_id": run.run_id, "step": "snowflake"})
         # 8) Generate CSV bytes and save
-        csv_bytes = rows_to_csv_bytes(test_rows)
-        os.makedirs(CONFIG.output_dir, exist_ok=True)
-        ts = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
-        fname = f"vttfg_bci_{jira_id.replace('/','_')}_{ts}.csv"
-        out_path = os.path.join(CONFIG.output_dir, fname)
-        with open(out_path, "wb") as fh:
-            fh.write(csv_bytes)
-        audit = {"jira_id": jira_id, "extraction": extraction, "debug": debug}
+        with span("stage.write_csv", rows=len(test_rows)) as sp:
+            csv_bytes = rows_to_csv_bytes(test_rows)
+            os.makedirs(CONFIG.output_dir, exist_ok=True)
+            ts = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")
+            fname = f"vttfg_bci_{jira_id.replace('/','_')}_{ts}.csv"
+            out_path = os.path.join(CONFIG.output_dir, fname)
+            with open(out_path, "wb") as fh:
+                fh.write(csv_bytes)
+            sp.set(bytes=len(csv_bytes))
+        timings = run.summary()
+        cls_info = debug.get("classification") or {}
+        # classification + the text it was made from are the local classifier's training data
+        audit = {"jira_id": jira_id, "run_id": run.run_id, "classification": cls_info.get("value"),
+                 "classification_source": cls_info.get("source"), "ticket_text": text_blob, "extraction": extraction, "debug": debug,
+                 "timings_ms": timings, "metrics": list(run.spans), "events": list(run.events)}
         audit_path = os.path.join(CONFIG.output_dir, f"audit_{jira_id}_{ts}.json")
         with open(audit_path, "w", encoding="utf-8") as fh:
             json.dump(audit, fh, default=str, indent=2)
-        return {"rows_count": len(test_rows), "file_path": out_path, "audit_path": audit_path, "debug": debug}
+        try:
+            run.write_jsonl()
+        except Exception as e:
+            logger.warning("Failed to write metrics: %s", e, extra={"run_id": run.run_id, "step": "metrics_write"})
+        logger.info("Run %s for %s finished: rows=%d timings_ms=%s", run.run_id, jira_id, len(test_rows), timings, extra={"run_id": run.run_id, "step": "run_done"})
+        return {"run_id": run.run_id, "rows_count": len(test_rows), "file_path": out_path, "audit_path": audit_path, "debug": debug, "timings_ms": timings}
+
+    def run_for_jiras(self, jira_ids, max_workers=None, overrides=None):
+        """
+        Run run_for_jira for many tickets concurrently.
+
+        Each ticket runs on its own worker; the per-backend semaphores keep Jira,
+        Google Docs, LLM and Snowflake traffic bounded, so one ticket's LLM call
+        overlaps with another's Jira fetch or CSV write. Failures are captured
+        per ticket and never abort the batch.
+
+        Returns {"results": [...], "summary": {...}} with results in input order.
+        """
+        ids = list(dict.fromkeys(j.strip() for j in (jira_ids or []) if j and j.strip()))
+        max_workers = max(1, min(max_workers or CONFIG.batch_max_workers, len(ids) or 1))
+        results = self._run_batch(self._iter_contexts(ids, overrides), max_workers, overrides, expected=len(ids))
+        return self._batch_result([results[j] for j in ids], results.started)
+
+    def run_for_jql(self, jql, max_workers=None, overrides=None):
+        """run_for_jiras over the tickets a JQL query selects, started as the search pages arrive (search order)."""
+        if CONFIG.jira_bulk_fetch and hasattr(self.jira, "search_issues"):
+            items = ((jc.jira_id, jc) for jc in self.jira.search_issues(jql=jql))
+        else:
+            items = ((key, None) for key in self.jira.search_issue_keys(jql))
+        results = self._run_batch(items, max(1, max_workers or CONFIG.batch_max_workers), overrides)
+        return self._batch_result(list(results.values()), results.started)
+
+    def _iter_contexts(self, ids, overrides=None):
+        """
+        (jira_id, JiraContext or None) for each id. Tickets without a cached context are
+        loaded through one paged JQL search instead of an issue request each; None means
+        "fetch it per ticket" (already cached, not found by the search, or bulk unavailable).
+        """
+        refresh = (overrides or {}).get("refresh", False)
+        pending = []
+        for jira_id in ids:
+            if refresh or self.stage_cache.get(stage_key("latest_context", jira_id)) is None:
+                pending.append(jira_id)
+            else:
+                yield jira_id, None
+        search = getattr(self.jira, "search_issues", None)
+        wanted = {j.upper(): j for j in pending}
+        if CONFIG.jira_bulk_fetch and search is not None and len(pending) > 1:
+            try:
+                for jc in search(keys=pending):
+                    jira_id = wanted.pop((jc.jira_id or "").upper(), None)
+                    if jira_id is not None:
+                        yield jira_id, jc
+            except Exception as e:
+                logger.warning("Bulk Jira search failed, fetching %d tickets one by one: %s", len(wanted), e, extra={"run_id": "-", "step": "batch_jira"})
+        for jira_id in wanted.values():
+            yield jira_id, None
+
+    def _run_batch(self, items, max_workers, overrides=None, expected=None):
+        """Submit a _run_one per (jira_id, context) as `items` yields them; {jira_id: outcome} in submission order."""
+        results = _BatchResults()
+        logger.info("Batch run started: %s tickets, %d workers", expected if expected is not None else "?", max_workers, extra={"run_id": "-", "step": "batch_start"})
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="vttfg-batch") as pool:
+            futures = {}
+            for jira_id, jc in items:
+                if jira_id in results:
+                    continue
+                results[jira_id] = None
+                futures[pool.submit(self._run_one, jira_id, overrides, jc)] = jira_id
+            for fut in as_completed(futures):
+                jira_id = futures[fut]
+                results[jira_id] = fut.result()
+                logger.info("Batch ticket %s finished: %s", jira_id, results[jira_id]["status"], extra={"run_id": "-", "step": "batch_ticket"})
+        return results
+
+    def _batch_result(self, ordered, started):
+        summary = self._batch_summary(ordered, started)
+        logger.info("Batch run finished: %s", summary, extra={"run_id": "-", "step": "batch_done"})
+        return {"results": ordered, "summary": summary}
+
+    def _batch_summary(self, ordered, started):
+        ok = [r for r in ordered if r["status"] == "ok"]
+        return {
+            "total": len(ordered),
+            "succeeded": len(ok),
+            "failed": len(ordered) - len(ok),
+            "rows_count": sum(r["result"].get("rows_count", 0) for r in ok),
+            "elapsed_s": round(time.monotonic() - started, 3),
+        }
+
+    def _run_one(self, jira_id, overrides=None, jc=None):
+        started = time.monotonic()
+        try:
+            overrides = dict(overrides or {})
+            if jc is not None:
+                overrides["prefetched_context"] = jc
+            res = self.run_for_jira(jira_id, overrides=overrides)
+            out = {"jira_id": jira_id, "status": "ok", "result": res}
+        except Exception as e:
+            logger.warning("Batch ticket %s failed: %s", jira_id, e, extra={"run_id": "-", "step": "batch_ticket"})
+            out = {"jira_id": jira_id, "status": "error", "error": f"{type(e).__name__}: {e}"}
+        out["elapsed_s"] = round(time.monotonic() - started, 3)
+        return out
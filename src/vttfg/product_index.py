@@ -0,0 +1,204 @@
+"""
+Candidate lookup for product names that are neither an exact code nor an exact name.
+
+resolve_products used to compare every extracted item against every catalog
+name (`nx in name or name in nx`): O(items x names) per ticket, and a two-letter
+item matched any name containing those letters. ProductIndex is built once per
+template and answers both directions from inverted lists:
+
+- the item inside a catalog name: names holding all of the item's trigrams
+  (items under 3 characters match whole words only)
+- a catalog name inside the item: names made of the item's words, matched on word boundaries
+- typos: a BK-tree over the names, searched within a small edit distance
+
+Names are compared lowercased with punctuation folded to spaces. The BK-tree
+needs python-Levenshtein (building it with a pure-Python distance takes ~1 min
+for 50k names); without it, typo candidates are the names sharing enough
+trigrams with the item (k edits change at most 3k of them), checked with a
+pure-Python DP.
+"""
+from __future__ import annotations
+import logging
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .metrics import span
+
+logger = logging.getLogger("vttfg.product_index")
+
+_NORM_RE = re.compile(r"[^a-z0-9]+")
+_MIN_FUZZY = 4
+
+try:
+    from Levenshtein import distance as _lev
+except Exception:
+    _lev = None
+
+
+def _levenshtein(a: str, b: str, limit: Optional[int] = None) -> int:
+    """Edit distance; with `limit`, any value above it means "more than limit"."""
+    if _lev is not None:
+        return _lev(a, b) if limit is None else _lev(a, b, score_cutoff=limit)
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if limit is not None and min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+def normalize(text: str) -> str:
+    return _NORM_RE.sub(" ", (text or "").lower()).strip()
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _BKTree:
+    """Nodes are [word, {distance: child}]."""
+    def __init__(self):
+        self.root = None
+
+    def add(self, word: str) -> None:
+        if self.root is None:
+            self.root = [word, {}]
+            return
+        node = self.root
+        while True:
+            d = _levenshtein(word, node[0])
+            if d == 0:
+                return
+            child = node[1].get(d)
+            if child is None:
+                node[1][d] = [word, {}]
+                return
+            node = child
+
+    def search(self, word: str, radius: int) -> List[Tuple[int, str]]:
+        out, todo = [], [self.root] if self.root else []
+        while todo:
+            node = todo.pop()
+            # without a cutoff: the exact distance bounds which children can hold matches
+            d = _levenshtein(word, node[0])
+            if d <= radius:
+                out.append((d, node[0]))
+            todo.extend(child for k, child in node[1].items() if d - radius <= k <= d + radius)
+        return out
+
+
+class ProductIndex:
+    def __init__(self, name_to_codes: Dict[str, Iterable[str]]):
+        self.codes: Dict[str, Set[str]] = {}
+        for name, codes in name_to_codes.items():
+            n = normalize(name)
+            if n:
+                self.codes.setdefault(n, set()).update(codes)
+        self.names = list(self.codes)
+        self._by_trigram: Dict[str, List[int]] = {}
+        self._by_word: Dict[str, List[int]] = {}
+        self._tree = _BKTree() if _lev is not None else None
+        with span("product_index.build", names=len(self.names)):
+            for i, name in enumerate(self.names):
+                for g in _trigrams(name):
+                    self._by_trigram.setdefault(g, []).append(i)
+                for w in set(name.split()):
+                    self._by_word.setdefault(w, []).append(i)
+                if self._tree is not None and len(name) >= _MIN_FUZZY:
+                    self._tree.add(name)
+
+    def _within_names(self, q: str) -> Set[int]:
+        """Names that contain q."""
+        if len(q) < 3:
+            return set(self._by_word.get(q, ()))
+        lists = sorted((self._by_trigram.get(g, []) for g in _trigrams(q)), key=len)
+        if not lists or not lists[0]:
+            return set()
+        found = set(lists[0])
+        for ids in lists[1:]:
+            found.intersection_update(ids)
+            if not found:
+                break
+        return {i for i in found if q in self.names[i]}
+
+    def _inside_query(self, q: str) -> Set[int]:
+        """Names (3+ chars) that appear in q as whole words."""
+        padded = f" {q} "
+        found = set()
+        for w in set(q.split()):
+            for i in self._by_word.get(w, ()):
+                name = self.names[i]
+                if len(name) >= 3 and f" {name} " in padded:
+                    found.add(i)
+        return found
+
+    def _near(self, q: str, radius: int) -> List[Tuple[int, str]]:
+        if self._tree is not None:
+            return self._tree.search(q, radius)
+        grams = _trigrams(q)
+        shared = Counter()
+        for g in grams:
+            shared.update(self._by_trigram.get(g, ()))
+        need = len(grams) - 3 * radius
+        out = []
+        for i, n in (shared.items() if need > 0 else enumerate(self.names)):
+            name = self.names[i]
+            if (need <= 0 or n >= need) and len(name) >= _MIN_FUZZY and abs(len(name) - len(q)) <= radius:
+                d = _levenshtein(q, name, radius)
+                if d <= radius:
+                    out.append((d, name))
+        return out
+
+    def substring(self, item: str, limit: int = 10) -> List[Tuple[str, float, List[str]]]:
+        """(name, score, codes) for names containing the item or contained in it; score = shorter/longer length."""
+        q = normalize(item)
+        if not q:
+            return []
+        hits = []
+        for i in self._within_names(q) | self._inside_query(q):
+            name = self.names[i]
+            hits.append((name, min(len(q), len(name)) / max(len(q), len(name)), sorted(self.codes[name])))
+        hits.sort(key=lambda h: (-h[1], h[0]))
+        return hits[:limit]
+
+    def fuzzy(self, item: str, limit: int = 10) -> List[Tuple[str, float, List[str]]]:
+        """(name, score, codes) within a length-scaled edit distance; score = 1 - distance/longer length."""
+        q = normalize(item)
+        if len(q) < _MIN_FUZZY:
+            return []
+        radius = 1 if len(q) <= 6 else 2 if len(q) <= 12 else 3
+        hits = [(name, 1 - d / max(len(q), len(name)), sorted(self.codes[name])) for d, name in self._near(q, radius)]
+        hits.sort(key=lambda h: (-h[1], h[0]))
+        return hits[:limit]
+
+
+_indexes: Dict[str, Tuple[tuple, ProductIndex]] = {}
+_lock = threading.Lock()
+
+
+def index_for(template_meta: dict) -> ProductIndex:
+    """
+    The template's ProductIndex, built on first use. Template metadata is shared
+    and read-only, so indexes are kept here, keyed by the template path and stamp
+    that read_template_metadata records as meta["source"]; metadata without a
+    source gets a fresh index.
+    """
+    source = template_meta.get("source")
+    if source is None:
+        return ProductIndex(template_meta.get("product_name_to_codes", {}))
+    path, stamp = source
+    with _lock:
+        hit = _indexes.get(path)
+        if hit is None or hit[0] != stamp:
+            # one index per template path: an edited template replaces the old one
+            hit = _indexes[path] = (stamp, ProductIndex(template_meta.get("product_name_to_codes", {})))
+    return hit[1]
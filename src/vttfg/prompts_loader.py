@@ -11,6 +11,15 @@ def load_prompt_file(path):
     except Exception:
         return None
 
+def load_prompts():
+    """Return the combined prompts/prompts.json mapping ({name: {"prompt": ...}}), or {} if unreadable."""
+    here = os.path.join(os.path.dirname(__file__), "..", "..", "prompts", "prompts.json")
+    try:
+        with open(here, "r", encoding="utf-8") as fh:
+            return json.load(fh)
+    except Exception:
+        return {}
+
 def load_classify_prompt():
     here = os.path.join(os.path.dirname(__file__), "..", "..", "prompts", "classify.json")
     return load_prompt_file(here)
@@ -5,10 +5,16 @@ from vttfg.models import TestRow
 from vttfg.config import CONFIG
 logger = logging.getLogger("vttfg.rules")
 
-def build_testrows(extraction, template_path=None):
+def build_testrows(extraction, template_path=None, resolved=None):
+    """`resolved`: (items, (codes, notes)) from resolving a prefix of the items earlier; only the rest is resolved here."""
     template_meta = read_template_metadata(template_path)
-    items = extraction.get("item_codes") or extraction.get("product_classes") or []
-    resolved, notes = resolve_products(items, template_meta)
+    items = list(extraction.get("item_codes") or extraction.get("product_classes") or [])
+    if resolved is not None and items[:len(resolved[0])] == resolved[0]:
+        # resolve_products is per item + order-preserving dedupe, so the rest (e.g. attachment codes) can be appended
+        (codes, notes), (more, more_notes) = resolved[1], resolve_products(items[len(resolved[0]):], template_meta)
+        resolved, notes = list(dict.fromkeys(codes + more)), notes + more_notes
+    else:
+        resolved, notes = resolve_products(items, template_meta)
     ds = extraction.get("date_specs") or []
     doc_date = None
     for d in ds:
@@ -0,0 +1,62 @@
+"""
+In-process, content-addressed memo of orchestrator stage outputs.
+
+Keys are hashes of everything a stage's output depends on (JIRA id + issue
+`updated` timestamp, prompt hash, classification, input text hash), so an entry
+can only be reused for identical inputs. The UI's fetch/classify/extract calls
+populate it and the later "Generate" run picks the same results up instead of
+refetching Jira and re-calling the LLM.
+"""
+import hashlib, json, threading, time
+from collections import OrderedDict
+from vttfg.config import CONFIG
+
+
+def content_hash(value) -> str:
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def stage_key(stage: str, *parts) -> str:
+    return stage + ":" + content_hash([stage, *parts])
+
+
+class StageCache:
+    """Thread-safe LRU with a TTL; values are returned as stored (callers copy what they mutate)."""
+    def __init__(self, max_entries=None, ttl_s=None):
+        self.max_entries = max_entries or CONFIG.stage_cache_max_entries
+        self.ttl_s = CONFIG.stage_cache_ttl_s if ttl_s is None else ttl_s
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or (self.ttl_s and now - item[0] > self.ttl_s):
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+# shared by every Orchestrator in the process (Streamlit re-creates them per rerun)
+STAGE_CACHE = StageCache()
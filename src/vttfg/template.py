@@ -1,65 +1,142 @@
-import pandas as pd, os, logging
+import gc, hashlib, os, logging, pickle, threading
 from vttfg.config import CONFIG
+from vttfg.metrics import span, record_event
 logger = logging.getLogger("vttfg.template")
 
+_SIDECAR_VERSION = 1
+_cache = {}
+_cache_lock = threading.Lock()
+
+def _stamp(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size, _SIDECAR_VERSION)
+
+def _sidecar_path(path):
+    if not CONFIG.template_cache_dir:
+        return None
+    digest = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(CONFIG.template_cache_dir, f"template_{digest}.pkl")
+
+_MAPS = ("product_to_division", "product_to_department", "product_to_company")
+
+def _pack(meta):
+    """Columnar form for the sidecar: one code list, aligned value lists, repeated values stored once."""
+    codes = list(meta["product_list"])
+    shared = {}
+    return {"columns": meta["columns"], "codes": codes,
+            **{k: [shared.setdefault(v, v) for v in map(meta[k].get, codes)] for k in _MAPS},
+            "names": list(meta["product_name_to_codes"]), "name_codes": [list(v) for v in meta["product_name_to_codes"].values()]}
+
+def _unpack(packed):
+    codes = packed["codes"]
+    return {"columns": packed["columns"], "product_list": set(codes),
+            "product_name_to_codes": {n: set(c) for n, c in zip(packed["names"], packed["name_codes"])},
+            **{k: dict(zip(codes, packed[k])) for k in _MAPS}}
+
+def _load_sidecar(sidecar, stamp):
+    gc.disable()   # pickle allocates ~one object per cell; collections mid-load only cost time
+    try:
+        with open(sidecar, "rb") as fh:
+            saved = pickle.load(fh)
+        if isinstance(saved, dict) and saved.get("stamp") == stamp:
+            return _unpack(saved["packed"])
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, KeyError):
+        pass
+    finally:
+        gc.enable()
+    return None
+
+def _save_sidecar(sidecar, stamp, meta):
+    try:
+        os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+        tmp = f"{sidecar}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as fh:
+            pickle.dump({"stamp": stamp, "packed": _pack(meta)}, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, sidecar)
+    except OSError as e:
+        logger.warning("Failed writing template cache %s: %s", sidecar, e, extra={"run_id": "-", "step": "template"})
+
 def read_template_metadata(path=None):
+    """
+    Product maps for the BCI template, cached per (path, mtime, size): in process,
+    and across processes in a pickle sidecar under CONFIG.template_cache_dir.
+    The returned dict is shared between callers; treat it as read-only.
+    meta["source"] is (absolute path, stamp): product_index.index_for keys the
+    template's ProductIndex on it.
+    """
     path = path or CONFIG.bci_template_path
     if not os.path.exists(path):
         raise RuntimeError(f"Template file not found: {path}")
+    stamp = _stamp(path)
+    key = os.path.abspath(path)
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit and hit[0] == stamp:
+            return hit[1]
+        sidecar = _sidecar_path(path)
+        meta = _load_sidecar(sidecar, stamp) if sidecar else None
+        if meta is not None:
+            record_event("template_cache", result="sidecar", products=len(meta["product_list"]))
+        else:
+            meta = _parse_template(path)
+            if sidecar:
+                _save_sidecar(sidecar, stamp, meta)
+        meta["source"] = (key, stamp)
+        _cache[key] = (stamp, meta)
+        return meta
+
+def _read_frame(path, **kw):
+    import pandas as pd  # deferred: heavy import, only needed once a template is read
     try:
-        df = pd.read_csv(path, dtype=str).fillna("")
+        return pd.read_csv(path, dtype=str, **kw).fillna("")
     except Exception:
-        df = pd.read_excel(path, dtype=str).fillna("")
-    cols = list(df.columns)
-    lc = {c.lower(): c for c in cols}
-    def pick(*names):
-        for n in names:
-            k = n.lower()
-            if k in lc:
-                return lc[k]
-        return None
-    item_col = pick("product code","product_code","product class code","product class")
-    name_col = pick("product name","description","product description","product_class_name")
-    division_col = pick("division code","division")
-    dept_col = pick("department code","department")
-    company_col = pick("company code","company")
-    product_list = set()
-    product_name_to_codes = {}
-    product_to_division = {}
-    product_to_department = {}
-    product_to_company = {}
-    if item_col:
-        for _, r in df.iterrows():
-            code = str(r.get(item_col,"")).strip()
-            if not code:
-                continue
-            codeu = code.upper()
-            product_list.add(codeu)
+        return pd.read_excel(path, dtype=str, **kw).fillna("")
+
+def _parse_template(path):
+    with span("template.read", bytes=os.path.getsize(path)) as sp:
+        cols = list(_read_frame(path, nrows=0).columns)
+        lc = {c.lower(): c for c in cols}
+        def pick(*names):
+            for n in names:
+                k = n.lower()
+                if k in lc:
+                    return lc[k]
+            return None
+        item_col = pick("product code","product_code","product class code","product class")
+        name_col = pick("product name","description","product description","product_class_name")
+        division_col = pick("division code","division")
+        dept_col = pick("department code","department")
+        company_col = pick("company code","company")
+        wanted = [c for c in (item_col, name_col, division_col, dept_col, company_col) if c]
+        meta = {"columns": cols, "product_list": set(), "product_name_to_codes": {},
+                "product_to_division": {}, "product_to_department": {}, "product_to_company": {}}
+        if item_col:
+            # only the columns the maps need are parsed
+            df = _read_frame(path, usecols=list(dict.fromkeys(wanted)))
+            codes = df[item_col].astype(str).str.strip().str.upper()
+            keep = codes != ""
+            df, codes = df[keep], codes[keep]
+            sp.set(rows=int(keep.sum()))
+            codes = codes.tolist()
+            meta["product_list"] = set(codes)
+            # plain dicts from the column lists; a code listed twice keeps its last row
+            for key, col in zip(_MAPS, (division_col, dept_col, company_col)):
+                meta[key] = dict(zip(codes, df[col].astype(str).tolist())) if col else dict.fromkeys(codes, "")
             if name_col:
-                name = str(r.get(name_col,"")).strip().lower()
-                if name:
-                    product_name_to_codes.setdefault(name, set()).add(codeu)
-            product_to_division[codeu] = str(r.get(division_col,"")) if division_col else ""
-            product_to_department[codeu] = str(r.get(dept_col,"")) if dept_col else ""
-            product_to_company[codeu] = str(r.get(company_col,"")) if company_col else ""
-    meta = {
-        "columns": cols,
-        "product_list": product_list,
-        "product_name_to_codes": product_name_to_codes,
-        "product_to_division": product_to_division,
-        "product_to_department": product_to_department,
-        "product_to_company": product_to_company,
-        "df": df
-    }
-    logger.info("Loaded template metadata: %d products", len(product_list))
+                name_map = meta["product_name_to_codes"]
+                for name, code in zip(df[name_col].astype(str).str.strip().str.lower().tolist(), codes):
+                    if name:
+                        name_map.setdefault(name, set()).add(code)
+    logger.info("Loaded template metadata: %d products", len(meta["product_list"]))
     return meta
 
 def resolve_products(extracted_list, template_meta):
-    from vttfg.config import CONFIG
+    from vttfg.product_index import index_for
     resolved = []
     notes = []
     product_list = template_meta.get("product_list", set())
     name_map = template_meta.get("product_name_to_codes", {})
+    index = None
     for x in extracted_list or []:
         if not x: continue
         xu = x.strip().upper()
@@ -69,13 +146,18 @@ def resolve_products(extracted_list, template_meta):
         if nx in name_map:
             codes = sorted(list(name_map[nx]))
             resolved.extend(codes); notes.append(f"Name match for {x} -> {codes}"); continue
-        matches = []
-        for name, codes in name_map.items():
-            if nx in name or name in nx:
-                matches.extend(list(codes))
-        if matches:
-            matches = list(dict.fromkeys(matches))
-            resolved.extend(matches); notes.append(f"Substring matches for {x} -> {matches}"); continue
+        # ranked (name, score, codes) candidates; for typos only the closest names resolve
+        if index is None:
+            index = index_for(template_meta)
+        hits, kind = index.substring(x), "Substring matches"
+        best = hits
+        if not hits:
+            hits, kind = index.fuzzy(x), "Fuzzy match"
+            best = [h for h in hits if h[1] == hits[0][1]]
+        if hits:
+            matches = list(dict.fromkeys(c for _, _, codes in best for c in codes))
+            ranked = ", ".join(f"{name!r} {score:.2f}" for name, score, _ in hits)
+            resolved.extend(matches); notes.append(f"{kind} for {x} -> {matches} (candidates: {ranked})"); continue
         resolved.append(CONFIG.default_item.upper()); notes.append(f"No match for {x}, using default {CONFIG.default_item}")
     # dedupe preserving order
     out = []
@@ -1,6 +1,7 @@
 # src/vttfg/ui_streamlit.py
 import os
 import sys
+import copy
 import json
 import pandas as pd
 import streamlit as st
@@ -13,16 +14,68 @@ if SRC_DIR not in sys.path:
     sys.path.insert(0, SRC_DIR)
 
 from vttfg.orchestrator import Orchestrator
-from vttfg.extraction import extract_from_text
-from vttfg.prompts_loader import load_prompts
+from vttfg.prompts_loader import load_prompts, load_prompt_for
 from vttfg.config import CONFIG
-from vttfg.connectors.jira_connector import JiraConnector
 
 st.set_page_config(page_title="VTTFG - Vertex Tax Test File Generator", layout="wide")
 st.title("Vertex Tax Test File Generator (VTTFG) — Human-in-the-loop Classification")
 
-orc = Orchestrator()
-prompts = load_prompts()
+CHOICES = ["UC2", "UC3", "UC4", "UC6", "Maintenance"]
+
+
+# Streamlit re-executes this script on every widget interaction. Anything expensive lives in
+# a cache (shared by all sessions on the server) or in st.session_state (per browser session).
+@st.cache_resource
+def get_orchestrator():
+    # one orchestrator (LLM client, Snowflake connection, stage cache) per server process
+    return Orchestrator()
+
+
+@st.cache_data
+def get_prompts():
+    return load_prompts(), load_prompt_for("uc3"), load_prompt_for("classify_extract")
+
+
+@st.cache_data
+def template_summary(path, mtime):
+    # keyed by mtime so edits to the template file invalidate it
+    from vttfg.template import read_template_metadata
+    meta = read_template_metadata(path)
+    return {"products": len(meta.get("product_list", ())), "columns": meta.get("columns", [])}
+
+
+def extraction_view(extraction, used_class):
+    return {
+        "classification_used_for_extract": used_class,
+        "confidence": extraction.get("confidence"),
+        "item_codes": extraction.get("item_codes"),
+        "product_classes": extraction.get("product_classes"),
+        "division_codes": extraction.get("division_codes"),
+        "department_codes": extraction.get("department_codes"),
+        "postal_codes": extraction.get("postal_codes"),
+        "states": extraction.get("states"),
+        "date_specs": extraction.get("date_specs"),
+        "flex_fields": extraction.get("flex_fields"),
+    }
+
+
+orc = get_orchestrator()
+prompts, extract_prompt, combined_prompt = get_prompts()
+
+ss = st.session_state
+ss.setdefault("ticket", None)        # {"jira_id", "jc", "text_blob"} of the last fetched ticket
+ss.setdefault("suggestion", None)    # (classification, confidence) from the LLM
+ss.setdefault("extractions", {})     # classification -> extraction dict for the current ticket
+ss.setdefault("result", None)        # last run_for_jira result
+
+
+def get_extraction(classification):
+    """Extraction for the current ticket under `classification`; runs the LLM at most once per class."""
+    if classification not in ss.extractions:
+        t = ss.ticket
+        ss.extractions[classification] = orc.extract_context(t["jira_id"], t["jc"], t["text_blob"], classification, prompt=extract_prompt)
+    return ss.extractions[classification]
+
 
 st.markdown(
     """
@@ -40,120 +93,104 @@ with col1:
     jira_id = st.text_input("JIRA ID", value="DD-1001")
     template_path = st.text_input("BCI template path (optional)", value=CONFIG.bci_template_path)
     btn_fetch = st.button("Fetch & Suggest")
+    if template_path and os.path.exists(template_path):
+        try:
+            summary = template_summary(template_path, os.path.getmtime(template_path))
+            st.caption(f"Template: {summary['products']} products, {len(summary['columns'])} columns")
+        except Exception as e:
+            st.caption(f"Template could not be read: {e}")
 
 with col2:
     st.write("Suggested classification will appear here after you click *Fetch & Suggest*.")
 
-# Placeholders
-suggestion_ph = st.empty()
-extraction_ph = st.empty()
-preview_ph = st.empty()
-generate_ph = st.empty()
-
 if btn_fetch and jira_id.strip():
     with st.spinner("Fetching JIRA and running LLM classification..."):
-        # 1) Fetch JIRA
+        # 1) Fetch JIRA + linked docs and build the text blob
         try:
-            jc = orc.jira.fetch_issue(jira_id)
+            jc, text_blob = orc.prepare_context(jira_id, refresh=True)
         except Exception as e:
             st.error(f"Failed to fetch JIRA {jira_id}: {e}")
             raise
+        ss.ticket = {"jira_id": jira_id, "jc": jc, "text_blob": text_blob}
+        ss.extractions = {}
+        ss.result = None
 
-        # Build text blob
-        parts = [jc.title or "", jc.description or ""] + (jc.comments or [])
-        text_blob = "\n\n".join([p if isinstance(p, str) else str(p) for p in parts])
-
-        # 2) LLM classification suggestion (single call)
+        # 2) LLM classification suggestion (single call; combined mode also returns the extraction)
         classify_prompt = prompts.get("classification", {}).get("prompt")
         try:
-            suggested_class, confidence = orc.llm.classify(text_blob, prompt_override=classify_prompt)
+            local = orc.local_classify(text_blob)  # confident local model -> no LLM classify call
+            if local:
+                ss.suggestion = local
+            elif CONFIG.llm_combined_mode and hasattr(orc.llm, "classify_and_extract"):
+                cls, conf, combined = orc.classify_and_extract_context(jira_id, jc, text_blob, prompt=combined_prompt)
+                ss.suggestion = (cls, conf)
+                if combined is not None and conf >= CONFIG.llm_confidence_threshold:
+                    ss.extractions[cls] = combined
+            else:
+                ss.suggestion = orc.classify_context(jira_id, jc, text_blob, prompt=classify_prompt)
         except Exception as e:
             st.error(f"LLM classification failed: {e}")
-            suggested_class, confidence = ("UC6", 0.0)
+            ss.suggestion = ("UC6", 0.0)
+        # reset the selectbox to the new suggestion
+        ss.chosen_class = ss.suggestion[0] if ss.suggestion[0] in CHOICES else CHOICES[0]
+
+ticket = ss.ticket
+if ticket:
+    suggested_class, confidence = ss.suggestion
+    # 3) Show suggestion and allow override
+    st.subheader(f"LLM Suggested Classification — {ticket['jira_id']}")
+    st.write(f"**Suggested:** `{suggested_class}` — confidence `{confidence:.2f}`")
+    if "chosen_class" not in ss:
+        ss.chosen_class = suggested_class if suggested_class in CHOICES else CHOICES[0]
+    chosen_class = st.selectbox("Confirm or change classification", options=CHOICES, key="chosen_class")
+
+    # 4) Extraction preview for the chosen class (only this one extraction runs on an override)
+    if chosen_class != suggested_class:
+        st.info(f"You changed classification from `{suggested_class}` to `{chosen_class}` — extraction uses `{chosen_class}`.")
+    try:
+        with st.spinner(f"Extracting for {chosen_class}..."):
+            extraction = get_extraction(chosen_class)
+        st.subheader(f"LLM Extraction (for {chosen_class})")
+        st.json(extraction_view(extraction, chosen_class))
+    except Exception as e:
+        st.error(f"LLM extraction ({chosen_class}) failed: {e}")
+        extraction = None
+
+    # 5) Generate final BCI from the stored context and extraction (no refetch, no LLM call)
+    if extraction is not None and st.button("Generate BCI using chosen classification"):
+        with st.spinner("Running orchestration with your classification..."):
+            try:
+                overrides = {
+                    "classification": chosen_class,
+                    "template_path": template_path,
+                    "jira_context": ticket["jc"],
+                    "text_blob": ticket["text_blob"],
+                    # the LLM's extraction, not a hand-edited one: attachment tables are still merged in
+                    "ui_extraction": copy.deepcopy(extraction),
+                }
+                ss.result = orc.run_for_jira(ticket["jira_id"], overrides=overrides)
+            except Exception as e:
+                st.error(f"Orchestration failed: {e}")
+                raise
 
-        # 3) Show suggestion and allow override
-        suggestion_ph.subheader("LLM Suggested Classification")
-        suggestion_ph.write(f"**Suggested:** `{suggested_class}` — confidence `{confidence:.2f}`")
-        choices = ["UC2", "UC3", "UC4", "UC6", "Maintenance"]
-        # default to suggested_class if in choices else first
-        default_idx = choices.index(suggested_class) if suggested_class in choices else 0
-        chosen_class = st.selectbox("Confirm or change classification", options=choices, index=default_idx)
+    result = ss.result
+    if result:
+        # Show results (file path and preview)
+        file_path = result.get("file_path")
+        rows_count = result.get("rows_count", 0)
+        st.success(f"Generated {rows_count} rows — saved to `{file_path}`")
 
-        # 4) Show extraction preview for suggested_class
+        # Try to show CSV preview
         try:
-            extraction = extract_from_text(text_blob, suggested_class, jira_created_at=jc.created_at)
+            df = pd.read_csv(file_path)
+            st.subheader("Generated BCI Preview (first 200 rows)")
+            st.dataframe(df.head(200))
+            # Provide download button (read bytes)
+            with open(file_path, "rb") as fh:
+                st.download_button("Download generated CSV", fh.read(), file_name=os.path.basename(file_path), mime="text/csv")
         except Exception as e:
-            st.error(f"LLM extraction (suggested) failed: {e}")
-            extraction = None
-
-        extraction_ph.subheader("LLM Extraction (for suggested classification)")
-        if extraction:
-            try:
-                # show JSON pretty
-                extraction_json = {
-                    "classification_used_for_extract": suggested_class,
-                    "confidence": extraction.confidence,
-                    "item_codes": extraction.item_codes,
-                    "product_classes": extraction.product_classes,
-                    "division_codes": extraction.division_codes,
-                    "department_codes": extraction.department_codes,
-                    "postal_codes": extraction.postal_codes,
-                    "states": extraction.states,
-                    "date_specs": extraction.date_specs,
-                    "flex_fields": extraction.flex_fields,
-                }
-                extraction_ph.json(extraction_json)
-            except Exception:
-                extraction_ph.write(str(extraction))
-
-        # 5) If user changed classification, preview extraction under chosen_class
-        if chosen_class != suggested_class:
-            st.info(f"You changed classification from `{suggested_class}` to `{chosen_class}` — re-running extraction with `{chosen_class}` now.")
-            try:
-                extraction_override = extract_from_text(text_blob, chosen_class, jira_created_at=jc.created_at)
-                extraction_override_json = {
-                    "classification_used_for_extract": chosen_class,
-                    "confidence": extraction_override.confidence,
-                    "item_codes": extraction_override.item_codes,
-                    "product_classes": extraction_override.product_classes,
-                    "division_codes": extraction_override.division_codes,
-                    "department_codes": extraction_override.department_codes,
-                    "postal_codes": extraction_override.postal_codes,
-                    "states": extraction_override.states,
-                    "date_specs": extraction_override.date_specs,
-                    "flex_fields": extraction_override.flex_fields,
-                }
-                extraction_ph.subheader("LLM Extraction (for chosen classification)")
-                extraction_ph.json(extraction_override_json)
-            except Exception as e:
-                st.error(f"LLM extraction (chosen classification) failed: {e}")
-
-        # 6) Provide button to generate final BCI with override
-        if st.button("Generate BCI using chosen classification"):
-            with st.spinner("Running orchestration with your classification..."):
-                try:
-                    overrides = {"classification": chosen_class, "template_path": template_path}
-                    result = orc.run_for_jira(jira_id, overrides=overrides)
-                except Exception as e:
-                    st.error(f"Orchestration failed: {e}")
-                    raise
-
-                # Show results (file path and preview)
-                file_path = result.get("file_path")
-                rows_count = result.get("rows_count", 0)
-                st.success(f"Generated {rows_count} rows — saved to `{file_path}`")
-
-                # Try to show CSV preview
-                try:
-                    df = pd.read_csv(file_path)
-                    preview_ph.subheader("Generated BCI Preview (first 200 rows)")
-                    preview_ph.dataframe(df.head(200))
-                    # Provide download button (read bytes)
-                    csv_bytes = df.to_csv(index=False).encode("utf-8")
-                    st.download_button("Download generated CSV", csv_bytes, file_name=os.path.basename(file_path), mime="text/csv")
-                except Exception as e:
-                    st.warning(f"Could not preview generated CSV: {e}")
-                    st.write(f"Saved file: `{file_path}`")
+            st.warning(f"Could not preview generated CSV: {e}")
+            st.write(f"Saved file: `{file_path}`")
 
 else:
-    st.info("Choose 'Other (JIRA-driven)' and click **Fetch & Suggest** to start.")
+    st.info("Enter a JIRA ID and click **Fetch & Suggest** to start.")
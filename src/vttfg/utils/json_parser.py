@@ -1 +1,229 @@
+"""
+Pull a JSON object out of free-form LLM output.
+
+Models wrap JSON in ```json fences, prefix it with prose, or get cut off at
+max_tokens. A single left-to-right scan finds balanced {...} spans (string
+literals and escapes are respected, so braces inside strings don't count) and
+json.loads is tried once per span; the scan resumes after each span, so the
+whole pass is O(n) — no regex backtracking over the model output.
+
+An object still open at the end of the text (truncated output) is repaired by
+closing the open string/containers, or by cutting back to the last complete
+member, before parsing.
+"""
 import json, re
+from typing import Iterator, Optional
+
+# next char that matters inside a candidate, and inside a string literal
+_STRUCT_RE = re.compile(r'[{}\[\]",]')
+_STRING_RE = re.compile(r'["\\]')
+_CLOSER = {"{": "}", "[": "]"}
+_OBJ_START = re.compile(r'\{\s*["}]')
+
+
+def _loads(s):
+    try:
+        return json.loads(s)
+    except (ValueError, RecursionError):   # RecursionError: pathologically deep nesting
+        return None
+
+
+def _repair(text, start, stack, in_string, last_cut):
+    """
+    Close a truncated object that opens at text[start] (stack: its open containers);
+    fall back to the text before the last safe cut (a comma or the end of a complete value).
+    """
+    tail = text[start:] + ('"' if in_string else "")
+    tail = tail.rstrip()
+    if tail.endswith(","):
+        tail = tail[:-1]
+    elif tail.endswith(":"):
+        tail += " null"
+    value = _loads(tail + "".join(_CLOSER[c] for c in reversed(stack)))
+    if value is None and last_cut is not None and last_cut[0] > start and last_cut[1] > 0:
+        pos, depth = last_cut
+        value = _loads(text[start:pos].rstrip() + "".join(_CLOSER[c] for c in reversed(stack[:depth])))
+    return value
+
+
+def _closed(text, done):
+    for s, e in done:
+        value = _loads(text[s:e])
+        if isinstance(value, dict):
+            yield value
+
+
+def iter_json_objects(text: str, repair: bool = True) -> Iterator[dict]:
+    """Yield every top-level JSON object in `text` that parses, in order of appearance."""
+    n = len(text)
+    i = text.find("{")
+    while 0 <= i < n:
+        start, stack, starts, in_string, last_cut = i, ["{"], [i], False, None
+        done = []  # outermost closed objects so far, for when a stray "{" in prose wraps the real JSON
+        pos = i + 1
+        end = None
+        while pos < n:
+            m = (_STRING_RE if in_string else _STRUCT_RE).search(text, pos)
+            if m is None:
+                pos = n
+                break
+            ch, pos = m.group(), m.end()
+            if in_string:
+                if ch == "\\":
+                    pos += 1  # skip the escaped char
+                else:
+                    in_string = False
+            elif ch == '"':
+                in_string = True
+            elif ch in "{[":
+                stack.append(ch)
+                starts.append(pos - 1)
+            elif ch == ",":
+                last_cut = (pos - 1, len(stack))
+            elif _CLOSER[stack[-1]] == ch:
+                stack.pop()
+                child = starts.pop()
+                if not stack:
+                    end = pos
+                    break
+                # right after a complete value is also a safe cut; keeps stack[:depth] valid for _repair
+                last_cut = (pos, len(stack))
+                if ch == "}":
+                    while done and done[-1][0] > child:
+                        done.pop()
+                    done.append((child, pos))
+            else:
+                break  # mismatched closer: not JSON, rescan from here
+        if end is not None:
+            value = _loads(text[start:end])
+            if isinstance(value, dict):
+                yield value
+            else:
+                yield from _closed(text, done)
+        elif pos < n:
+            yield from _closed(text, done)
+        else:
+            # ran off the end: truncated output, possibly behind a stray "{" in prose
+            value = _repair(text, start, stack, in_string, last_cut) if repair else None
+            if isinstance(value, dict):
+                yield value
+                return
+            yield from _closed(text, done)
+            if repair:
+                roots = [k for k in range(1, len(starts)) if stack[k] == "{" and _OBJ_START.match(text, starts[k])][:3]
+                for k in roots:
+                    cut = (last_cut[0], last_cut[1] - k) if last_cut and last_cut[1] > k else None
+                    value = _repair(text, starts[k], stack[k:], in_string, cut)
+                    if isinstance(value, dict):
+                        yield value
+                        break
+            return
+        i = text.find("{", max(pos, start + 1))
+
+
+def safe_parse_json_from_text(text: Optional[str], repair: bool = True) -> Optional[dict]:
+    """First JSON object in text (whole text, fenced block or bare), or None."""
+    if not text or not isinstance(text, str):
+        return None
+    s = text.strip()
+    if s.startswith("{"):
+        value = _loads(s)
+        if isinstance(value, dict):
+            return value
+    return next(iter_json_objects(s, repair=repair), None)
+
+
+class JSONFieldStream:
+    """
+    Incremental parser for a JSON object arriving in chunks (a streamed completion).
+
+    feed(chunk) returns the object members completed by that chunk as (path, value),
+    path being the key tuple from the root, for members up to `max_depth` levels deep
+    (max_depth=2 also reports e.g. ("extraction", "states")). Completed top-level
+    members accumulate in `.fields`; `.done` turns true when the root object closes.
+    Text before the root "{" (prose, a ```json fence) is skipped.
+    """
+    def __init__(self, max_depth: int = 1):
+        self.max_depth = max_depth
+        self.fields = {}
+        self.done = False
+        self._buf = []          # received chunks, joined lazily when a value needs slicing
+        self._text = ""
+        self._pos = 0
+        self._in_string = False
+        self._escape = False
+        self._stack = []        # per container: [kind, expect, key, value_start, string_is_key]
+
+    def _slice(self, start, end):
+        if self._buf:
+            self._text += "".join(self._buf)
+            self._buf = []
+        return self._text[start:end]
+
+    def _member_done(self, frame, end, out):
+        path = tuple(f[2] for f in self._stack if f[0] == "{")
+        if len(path) <= self.max_depth:
+            value = _loads(self._slice(frame[3], end))
+            out.append((path, value))
+            if len(path) == 1:
+                self.fields[path[0]] = value
+        frame[1], frame[3] = "comma", None
+
+    def feed(self, chunk: str):
+        out = []
+        if self.done or not chunk:
+            return out
+        base = self._pos
+        self._buf.append(chunk)
+        self._pos += len(chunk)
+        stack = self._stack
+        for offset, ch in enumerate(chunk):
+            i = base + offset
+            top = stack[-1] if stack else None
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if top[0] == "{" and top[4]:
+                        top[2], top[1], top[4] = _loads(self._slice(top[3], i + 1)), "colon", False
+                        top[3] = None
+                    elif top[0] == "{" and top[1] == "value":
+                        self._member_done(top, i + 1, out)
+                continue
+            if top is None:
+                if ch == "{":
+                    stack.append(["{", "key", None, None, False])
+                continue
+            if ch in " \t\r\n":
+                continue
+            if top[0] == "{" and top[1] == "value" and top[3] is not None and ch in ",}":
+                self._member_done(top, i, out)  # end of a scalar (number/true/false/null)
+            if ch == '"':
+                self._in_string = True
+                if top[0] == "{" and top[1] == "key":
+                    top[3], top[4] = i, True
+                elif top[0] == "{" and top[3] is None:
+                    top[3] = i
+            elif ch == ":":
+                top[1] = "value"
+            elif ch in "{[":
+                if top[0] == "{" and top[3] is None:
+                    top[3] = i
+                stack.append([ch, "key" if ch == "{" else "value", None, None, False])
+            elif ch in "}]":
+                stack.pop()
+                if not stack:
+                    self.done = True
+                    break
+                parent = stack[-1]
+                if parent[0] == "{" and parent[1] == "value":
+                    self._member_done(parent, i + 1, out)
+            elif ch == ",":
+                if top[0] == "{":
+                    top[1] = "key"
+            elif top[0] == "{" and top[1] == "value" and top[3] is None:
+                top[3] = i
+        return out
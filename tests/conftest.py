@@ -0,0 +1,33 @@
+import pytest
+
+from vttfg.config import CONFIG
+
+
+@pytest.fixture(autouse=True)
+def _isolated_storage(tmp_path, monkeypatch):
+    """Every on-disk cache, log and artifact path under tmp_path; process-wide cache singletons start empty."""
+    out, data = tmp_path / "output", tmp_path / "data"
+    # subprocesses (test_startup) build their CONFIG from the environment
+    monkeypatch.setenv("OUTPUT_DIR", str(out))
+    monkeypatch.setenv("DATA_DIR", str(data))
+    for name, path in {
+        "output_dir": out,
+        "data_dir": data,
+        "metrics_path": out / "metrics.jsonl",
+        "llm_cache_path": out / "llm_cache.sqlite",
+        "jira_cache_path": out / "jira_cache.sqlite",
+        "doc_index_path": out / "doc_index.sqlite",
+        "gdocs_cache_dir": out / "gdocs_cache",
+        "attachment_dir": out / "attachments",
+        "template_cache_dir": out / "template_cache",
+        "llm_fixtures_path": data / "llm_fixtures.jsonl",
+        "local_classifier_path": data / "local_classifier.npz",
+    }.items():
+        monkeypatch.setattr(CONFIG, name, str(path))
+    from vttfg import doc_index, product_index, template
+    from vttfg.connectors import google_docs, jira_cache, llm_cache
+    for module in (google_docs, jira_cache, llm_cache):
+        monkeypatch.setattr(module, "_cache", None)
+    monkeypatch.setattr(doc_index, "_index", None)
+    monkeypatch.setattr(template, "_cache", {})
+    monkeypatch.setattr(product_index, "_indexes", {})
@@ -0,0 +1,34 @@
+from vttfg.connectors.adf import adf_to_text
+
+
+def _t(s, **kw):
+    return {"type": "text", "text": s, **kw}
+
+
+def _p(*content):
+    return {"type": "paragraph", "content": list(content)}
+
+
+def test_structure_is_kept_compact():
+    link = {"type": "link", "attrs": {"href": "https://docs.google.com/document/d/abc"}}
+    doc = {"type": "doc", "version": 1, "content": [
+        {"type": "heading", "attrs": {"level": 2}, "content": [_t("Scope")]},
+        _p(_t("Convert KS, see "), _t("spec", marks=[link]), {"type": "hardBreak"}, {"type": "mention", "attrs": {"id": "1", "text": "@Ann"}}),
+        {"type": "bulletList", "content": [{"type": "listItem", "content": [
+            _p(_t("KS")), {"type": "orderedList", "content": [{"type": "listItem", "content": [_p(_t("COFFEE"))]}]}]}]},
+        {"type": "table", "content": [{"type": "tableRow", "content": [
+            {"type": "tableCell", "content": [_p(_t("KS")), _p(_t("a|b"))]}, {"type": "tableCell", "content": [_p(_t("6.5%"))]}]}]},
+    ]}
+    assert adf_to_text(doc) == ("## Scope\nConvert KS, see spec (https://docs.google.com/document/d/abc)\n@Ann\n"
+                                "- KS\n  1. COFFEE\n| KS a/b | 6.5% |")
+
+
+def test_deep_nesting_and_plain_text():
+    doc = cur = {"type": "doc", "content": []}
+    for _ in range(5000):
+        nxt = {"type": "blockquote", "content": []}
+        cur["content"].append(nxt)
+        cur = nxt
+    cur["content"].append(_p(_t("bottom")))
+    assert adf_to_text(doc).endswith("> bottom")
+    assert adf_to_text("wiki *markup*") == "wiki *markup*" and adf_to_text(None) == ""
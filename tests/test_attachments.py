@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from vttfg.connectors.attachments import _Budget, _download, download_attachments, merge_tables, parse_tables
+
+
+def test_xlsx_header_found_below_title_rows(tmp_path):
+    from openpyxl import Workbook
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["MPF conversion list"])
+    ws.append([])
+    ws.append(["Item Code", "Product Name", "Tax Category", "State", "Zip"])
+    ws.append([10001.0, "Coffee", "FOOD", "Kansas", 6101])
+    ws.append(["bwater", "Water", "FOOD", "mo", "66002-1234"])
+    path = tmp_path / "list.xlsx"
+    wb.save(path)
+    (t,) = parse_tables(str(path))
+    assert t["rows"] == 2 and t["columns"] == {"item_codes": "Item Code", "product_classes": "Tax Category", "states": "State", "postal_codes": "Zip"}
+    assert t["item_codes"] == ["10001", "BWATER"] and t["states"] == ["KS", "MO"] and t["postal_codes"] == ["06101", "66002"]
+
+
+def test_csv_merge_keeps_llm_values_first(tmp_path):
+    path = tmp_path / "skus.csv"
+    path.write_text("SKU,Description\nCOFFEE,Coffee\nsoda,Soda\n")
+    extraction = {"item_codes": ["coffee"], "states": ["KS"]}
+    added = merge_tables(extraction, parse_tables(str(path)))
+    assert extraction["item_codes"] == ["coffee", "SODA"] and added == {"item_codes": 1}
+    assert parse_tables(str(tmp_path / "skus.csv"), max_rows=1)[0]["item_codes"] == ["COFFEE"]
+
+
+class _Resp:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for chunk in self.chunks:
+            if isinstance(chunk, Exception):
+                raise chunk
+            yield chunk
+
+
+class _Session:
+    def __init__(self, bodies):
+        self.bodies, self.gets = bodies, []
+
+    def get(self, url, **kw):
+        self.gets.append(url)
+        return _Resp(self.bodies[url])
+
+
+def _meta(att_id, filename, size):
+    return {"filename": filename, "content_url": f"https://jira.example/rest/api/2/attachment/content/{att_id}", "size": size}
+
+
+def test_files_are_keyed_on_the_attachment_id(tmp_path):
+    metas = [_meta(101, "list.csv", 8), _meta(102, "list.csv", 8)]
+    session = _Session({m["content_url"]: [f"SKU\n{m['content_url'][-3:]}\n".encode()] for m in metas})
+    first = download_attachments(session, "DD-1", metas, str(tmp_path))
+    assert [os.path.basename(p) for _, p, _ in first] == ["101_list.csv", "102_list.csv"]
+    # reordered, or an earlier attachment removed: still served from disk
+    again = download_attachments(session, "DD-1", metas[::-1], str(tmp_path))
+    assert [s for _, _, s in again] == ["cached", "cached"] and len(session.gets) == 2
+
+
+def test_budget_refund_within_one_ticket(tmp_path):
+    budget = _Budget(1000)
+    session = _Session({"u": [b"x" * 600, ConnectionError("reset")]})
+    with pytest.raises(ConnectionError):
+        _download(session, {"content_url": "u", "filename": "a.csv"}, str(tmp_path / "a.csv"), budget, 10_000)
+    assert budget.left == 1000 and not os.listdir(tmp_path)
@@ -0,0 +1,26 @@
+from vttfg.models import JiraContext
+from vttfg.context_builder import build_context, count_tokens
+
+
+def _jc(comments, description="Make SKU 123 non-taxable in CA effective 2025-01-01"):
+    return JiraContext(jira_id="DD-1", title="CA taxability change", description=description, comments=comments)
+
+
+def test_drops_bot_and_duplicate_comments():
+    dup = "Please confirm the CA product category for SKU 123 before the effective date of 2025-01-01"
+    comments = ["Automation for Jira changed the status", dup, dup + ".", "thanks!", "Confirmed with tax team"]
+    text, report = build_context(_jc(comments), [])
+    reasons = {(d["index"], d["reason"]) for d in report["dropped"]}
+    assert (0, "bot_or_boilerplate") in reasons and (3, "bot_or_boilerplate") in reasons
+    assert (2, "duplicate") in reasons
+    assert text.count("Please confirm") == 1 and "Confirmed with tax team" in text
+
+
+def test_fits_budget_and_keeps_title_first():
+    comments = [f"update {i}: " + "filler words here " * 40 for i in range(50)]
+    docs = [("https://docs.google.com/document/d/x", "doc body " * 500)]
+    text, report = build_context(_jc(comments), docs, token_budget=400)
+    assert text.startswith("Title: CA taxability change")
+    assert report["tokens"] <= 400 and count_tokens(text) <= 420
+    assert "update 49" in text  # most recent comment wins over older ones
+    assert any(d["kind"] == "doc" for d in report["dropped"])
@@ -0,0 +1,39 @@
+from vttfg.config import CONFIG
+from vttfg.context_builder import build_context
+from vttfg.doc_index import DocIndex, chunk_text, ticket_terms
+from vttfg.models import JiraContext
+
+_DOC = "\n\n".join(
+    ["Marketplace facilitator policy overview. " + "General background on the program and its history. " * 12]
+    + [f"Section {i}: unrelated operational guidance for teams. " * 6 for i in range(8)]
+    + ["Effective dates: SKU 4471 becomes non-taxable in Texas from January 1, 2026."]
+    + [f"Appendix {i}: archive notes. " * 10 for i in range(4)])
+
+
+def _jc():
+    return JiraContext(jira_id="DD-9", title="TX exemption for SKU 4471", description="Make 4471 exempt in TX", comments=[])
+
+
+def test_index_ranks_the_matching_paragraph_and_skips_reindexing(tmp_path):
+    index = DocIndex(str(tmp_path / "idx.sqlite"))
+    n = index.add("doc://a", _DOC)
+    assert n == len(chunk_text(_DOC)) and index.add("doc://a", _DOC) == n
+    (score, idx, text), = index.search("doc://a", ticket_terms(_jc()), k=1)
+    assert "SKU 4471" in text and score > 0
+    index.add("doc://a", "replaced text")
+    assert index.stats() == {"docs": 1, "chunks": 1}
+
+
+def test_build_context_takes_relevant_chunks_not_the_preamble(monkeypatch):
+    monkeypatch.setattr(CONFIG, "doc_index_enabled", False)
+    text, report = build_context(_jc(), [("doc://a", _DOC)], token_budget=4000, doc_max_chars=800)
+    assert "SKU 4471 becomes non-taxable in Texas" in text
+    assert "Appendix 3" not in text and report["doc_chunks"]["doc://a"]["kept"]
+
+
+def test_state_codes_need_a_state_context():
+    jc = JiraContext(jira_id="DD-10", title="OK to ship ID cards OR labels", description="Nexus states: CA, OR and WA; store in IN 46204",
+                     comments=["ME too", "applies in TX"])
+    query = ticket_terms(jc)
+    assert all(query[c] >= 2 for c in ("ca", "or", "wa", "in", "tx"))
+    assert query["ok"] == 0 and query["id"] == 0 and query["me"] == 0
@@ -0,0 +1,74 @@
+from vttfg.connectors import google_docs
+from vttfg.connectors.google_docs import DocTextCache
+
+
+def test_doc_cache_keeps_latest_revision_and_evicts(tmp_path):
+    cache = DocTextCache(str(tmp_path), max_docs=2, revision_ttl_s=60)
+    cache.put("doc1", "r1", "old text")
+    cache.put("doc1", "r2", "new text")
+    assert cache.get("doc1", "r1") is None and cache.get("doc1", "r2") == "new text"
+    cache.remember_revision("doc1", "r2")
+    assert cache.recent_revision("doc1") == "r2" and cache.recent_revision("doc2") is None
+    cache.put("doc2", "r1", "b")
+    cache.put("doc3", "r1", "c")
+    assert len(list(tmp_path.iterdir())) == 2 and cache.get("doc3", "r1") == "c"
+
+
+class _Call:
+    def __init__(self, calls, name, result):
+        self.calls, self.name, self.result = calls, name, result
+
+    def execute(self):
+        self.calls.append(self.name)
+        return self.result
+
+
+class _Service:
+    """docs.v1 / drive.v3 stand-in for a reader: no revisionId on any documents().get."""
+    def __init__(self, calls, version):
+        self.calls, self.version = calls, version
+
+    def documents(self):
+        return self
+
+    def files(self):
+        return self
+
+    def get(self, documentId=None, fields=None, fileId=None, **kw):
+        if fileId:
+            return _Call(self.calls, "drive", {"version": self.version, "modifiedTime": "2026-01-01T00:00:00Z"})
+        if fields:
+            return _Call(self.calls, "probe", {})
+        body = {"content": [{"paragraph": {"elements": [{"textRun": {"content": f"v{self.version}"}}]}}]}
+        return _Call(self.calls, "fetch", {"body": body})
+
+
+def test_readers_are_cached_on_the_drive_version(monkeypatch):
+    calls, services = [], {}
+    monkeypatch.setattr(google_docs, "get_service", lambda api, version: services.setdefault(api, _Service(calls, "7")))
+    url = "https://docs.google.com/document/d/doc1/edit"
+    assert google_docs.fetch_doc_text(url) == "v7"
+    google_docs.get_doc_cache()._revisions.clear()
+    assert google_docs.fetch_doc_text(url) == "v7"
+    assert calls == ["probe", "drive", "fetch", "probe", "drive"]
+
+    google_docs.get_doc_cache()._revisions.clear()
+    for service in services.values():
+        service.version = "8"
+    assert google_docs.fetch_doc_text(url) == "v8"
+    assert calls[-3:] == ["probe", "drive", "fetch"]
+
+
+def test_get_survives_a_concurrent_eviction(tmp_path, monkeypatch):
+    cache = DocTextCache(str(tmp_path), max_docs=2)
+    cache.put("doc1", "r1", "text")
+    real_open = open
+
+    def open_then_evict(path, *a, **kw):
+        fh = real_open(path, *a, **kw)
+        cache.max_docs = 0
+        cache._evict()
+        return fh
+
+    monkeypatch.setattr("builtins.open", open_then_evict)
+    assert cache.get("doc1", "r1") == "text"
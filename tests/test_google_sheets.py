@@ -0,0 +1,48 @@
+import re
+
+from vttfg.connectors import google_sheets
+
+
+class _Call:
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        return self.result
+
+
+class _FakeSheets:
+    """spreadsheets().get / values().get over an in-memory grid; records the ranges asked for."""
+    def __init__(self, tabs):
+        self.tabs, self.ranges = tabs, []
+
+    def spreadsheets(self):
+        return self
+
+    def values(self):
+        return self
+
+    def get(self, spreadsheetId, range=None, fields=None):
+        if range is None:
+            return _Call({"sheets": [{"properties": {"sheetId": gid, "title": title, "gridProperties": {"rowCount": len(rows)}}}
+                                     for gid, (title, rows) in enumerate(self.tabs.items())]})
+        self.ranges.append(range)
+        title, cells = range.rsplit("!", 1)
+        r0, r1 = map(int, re.findall(r"\d+", cells))
+        return _Call({"values": self.tabs[title.strip("'")][r0 - 1:r1]})
+
+
+def test_pages_stop_at_max_rows_and_columns(monkeypatch):
+    rows = [["Item", "State"]] + [[f"SKU{i}", "CA"] for i in range(25)]
+    fake = _FakeSheets({"Other": [["x"]], "Products": rows})
+    monkeypatch.setattr(google_sheets, "get_service", lambda *a: fake)
+    url = "https://docs.google.com/spreadsheets/d/abc123/edit#gid=1"
+
+    assert len(list(google_sheets.iter_rows(url, page_rows=10, max_rows=12))) == 12
+    assert fake.ranges == ["'Products'!1:10", "'Products'!11:20"]
+
+    chunks = list(google_sheets.iter_columns(url, columns={"Item"}, page_rows=10))
+    assert [len(c["Item"]) for c in chunks] == [9, 10, 6] and set(chunks[0]) == {"Item"}
+
+    table, = google_sheets.sheet_tables(url)
+    assert table["rows"] == 25 and table["item_codes"][0] == "SKU0" and table["states"] == ["CA"]
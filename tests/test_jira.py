@@ -0,0 +1,137 @@
+import re
+import threading
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+import requests
+
+from vttfg.config import CONFIG
+from vttfg.connectors import jira
+from vttfg.connectors.jira_connector import JiraConnector
+
+_BASE = "https://jira.example"
+
+
+class _Resp:
+    def __init__(self, data, status=200):
+        self.data, self.status_code, self.content = data, status, b"{}"
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}", response=self)
+
+    def json(self):
+        return self.data
+
+
+class FakeJira:
+    """Search, issue and comment endpoints over {key: n comments}; embedded comment lists hold at most `embedded`."""
+    def __init__(self, issues, embedded=2):
+        self.comments = {k: [{"body": f"{k} c{i}"} for i in range(n)] for k, n in issues.items()}
+        self.embedded = embedded
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _fields(self, key):
+        return {"summary": f"{key} title", "description": "see https://docs.google.com/document/d/x", "updated": "2025-03-01T10:00:00.000+0000",
+                "created": "2025-02-01T10:00:00.000+0000", "attachment": [],
+                "comment": {"comments": self.comments[key][:self.embedded], "total": len(self.comments[key]), "maxResults": self.embedded}}
+
+    def get(self, url, params=None, timeout=None, **kw):
+        parts = urlsplit(url)
+        params = {**dict(parse_qsl(parts.query)), **(params or {})}
+        path = parts.path
+        assert path.startswith(jira.API_PATH + "/"), path
+        path = path[len(jira.API_PATH):]
+        start, size = int(params.get("startAt", 0)), int(params.get("maxResults", 50))
+        with self._lock:
+            self.calls.append((path, start))
+        if path == "/search":
+            m = re.match(r"key in \((.*)\)", params["jql"])
+            keys = [k for k in (m.group(1).split(",") if m else self.comments) if k in self.comments]
+            page = keys[start:start + size]
+            return _Resp({"startAt": start, "total": len(keys), "issues": [{"key": k, "fields": self._fields(k)} for k in page]})
+        key = path.split("/")[2]
+        if key not in self.comments:
+            return _Resp({}, 404)
+        if path.endswith("/comment"):
+            page = self.comments[key][start:start + size]
+            return _Resp({"startAt": start, "maxResults": size, "total": len(self.comments[key]), "comments": page,
+                          "isLast": start + size >= len(self.comments[key])})
+        fields = self._fields(key)
+        fields.pop("comment")
+        return _Resp({"key": key, "fields": fields})
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    for name, value in {"jira_base_url": _BASE, "jira_user": "u", "jira_api_token": "t", "jira_cache_enabled": False,
+                        "jira_bulk_fetch": True, "jira_search_page_size": 2, "jira_comment_page_size": 2}.items():
+        monkeypatch.setattr(CONFIG, name, value)
+    server = FakeJira({"DD-1": 5, "DD-2": 0, "DD-3": 1})
+    monkeypatch.setattr(jira, "_session", lambda: server)
+    return server
+
+
+def test_search_pages_and_completes_truncated_comments(fake):
+    found = {jc.jira_id: jc for jc in jira.search_issues(keys=["DD-1", "DD-2", "DD-3", "DD-404", "not a key"])}
+    assert sorted(found) == ["DD-1", "DD-2", "DD-3"]
+    assert found["DD-1"].comments == [f"DD-1 c{i}" for i in range(5)] and found["DD-2"].comments == []
+    assert found["DD-3"].created_at.isoformat() == "2025-02-01T10:00:00+00:00"
+    assert [c for c in fake.calls if c[0] == "/search"] == [("/search", 0), ("/search", 2)]
+    # only DD-1's embedded list was truncated
+    assert sorted(c for c in fake.calls if c[0] != "/search") == [("/issue/DD-1/comment", 2), ("/issue/DD-1/comment", 4)]
+
+
+def test_connector_search_and_parallel_comment_pages(fake):
+    connector = JiraConnector(_BASE, "u", "t")
+    connector.session = fake
+    found = {jc.jira_id: jc for jc in connector.search_issues(keys=["DD-3", "DD-404", "DD-1"])}
+    assert sorted(found) == ["DD-1", "DD-3"] and found["DD-1"].comments == [f"DD-1 c{i}" for i in range(5)]
+
+    fake.calls.clear()
+    jc = connector._fetch_issue("DD-1")
+    assert jc.comments == [f"DD-1 c{i}" for i in range(5)] and jc.title == "DD-1 title"
+    assert sorted(fake.calls) == [("/issue/DD-1", 0), ("/issue/DD-1/comment", 0), ("/issue/DD-1/comment", 2), ("/issue/DD-1/comment", 4)]
+
+
+def _orchestrator(monkeypatch):
+    from vttfg.orchestrator import Orchestrator
+    from vttfg.stage_cache import StageCache
+    orc = Orchestrator()
+    orc.stage_cache, orc.__dict__["jira"] = StageCache(), jira
+    seen = []
+    def run_for_jira(jira_id, overrides=None):
+        seen.append((jira_id, (overrides or {}).get("prefetched_context")))
+        return {"rows_count": 1}
+    monkeypatch.setattr(orc, "run_for_jira", run_for_jira)
+    return orc, seen
+
+
+def test_batch_prefetches_uncached_tickets_and_falls_back_for_missing(fake, monkeypatch):
+    from vttfg.stage_cache import stage_key
+    orc, seen = _orchestrator(monkeypatch)
+    orc.stage_cache.put(stage_key("latest_context", "DD-2"), "ctx-key")
+    out = orc.run_for_jiras(["DD-1", "DD-2", "DD-404", "DD-3"])
+    assert [r["jira_id"] for r in out["results"]] == ["DD-1", "DD-2", "DD-404", "DD-3"]
+    contexts = dict(seen)
+    # DD-2 has a cached context and DD-404 is not in the search: both are fetched per ticket
+    assert contexts["DD-2"] is None and contexts["DD-404"] is None
+    assert contexts["DD-1"].comments[-1] == "DD-1 c4" and contexts["DD-3"].jira_id == "DD-3"
+    assert all("DD-2" not in c[0] for c in fake.calls)
+
+
+def test_run_for_jql_streams_search_results(fake, monkeypatch):
+    orc, seen = _orchestrator(monkeypatch)
+    out = orc.run_for_jql("project = DD")
+    assert out["summary"]["succeeded"] == 3 and sorted(j for j, _ in seen) == ["DD-1", "DD-2", "DD-3"]
+    assert all(jc is not None for _, jc in seen)
+
+
+def test_linked_docs_from_adf_links_in_description_and_comments():
+    link = {"type": "text", "text": "rates", "marks": [{"type": "link", "attrs": {"href": "https://docs.google.com/spreadsheets/d/abc"}}]}
+    desc = {"type": "doc", "version": 1, "content": [{"type": "paragraph", "content": [{"type": "text", "text": "See "}, link, {"type": "text", "text": "."}]}]}
+    comments = [{"body": "spec: https://docs.google.com/document/d/x, thanks"}, {"body": desc}]
+    payload = {"fields": {"summary": "t", "description": desc, "comment": {"comments": comments}}}
+    expected = ["https://docs.google.com/spreadsheets/d/abc", "https://docs.google.com/document/d/x"]
+    assert jira.build_context("DD-1", payload).linked_docs == expected
@@ -0,0 +1,45 @@
+import pytest
+from vttfg.models import JiraContext
+from vttfg.connectors.jira_cache import JiraSnapshotCache, watermark
+
+T1, T2 = "2025-03-01T10:00:00.000+0000", "2025-03-02T09:30:00.000+0000"
+
+
+def _jc(key, updated):
+    return JiraContext(jira_id=key, title=f"{key} title", comments=["c1", "c2"], updated=updated, raw_payload={"key": key})
+
+
+def test_fetch_revalidates_on_updated(tmp_path):
+    cache, full = JiraSnapshotCache(str(tmp_path / "j.sqlite"), offline=False), []
+    def get_full(updated):
+        full.append(updated)
+        return _jc("AB-1", updated)
+    assert cache.fetch("AB-1", lambda: T1, lambda: get_full(T1)).comments == ["c1", "c2"]
+    assert cache.fetch("ab-1", lambda: T1, lambda: get_full(T1)).raw_payload == {"key": "AB-1"}
+    assert cache.fetch("AB-1", lambda: T2, lambda: get_full(T2)).updated == T2
+    assert full == [T1, T2] and cache.hits == 1
+
+    offline = JiraSnapshotCache(cache.path, offline=True)
+    assert offline.fetch("AB-1", None, None).updated == T2
+    with pytest.raises(RuntimeError):
+        offline.fetch("AB-2", None, None)
+
+
+def test_split_sweeps_only_cached_keys(tmp_path):
+    cache = JiraSnapshotCache(str(tmp_path / "j.sqlite"), offline=False)
+    cache.put(_jc("AB-1", T1))
+    cache.put(_jc("AB-2", T1))
+    swept = []
+    def sweep(keys, since):
+        swept.append((sorted(keys), since))
+        return [("AB-1", T1), ("AB-2", T2)]
+    fresh, fetch = cache.split(["AB-1", "AB-2", "AB-3"], sweep)
+    assert [jc.jira_id for jc in fresh] == ["AB-1"] and fetch == ["AB-2", "AB-3"]
+    assert swept == [(["AB-1", "AB-2"], watermark([T1]))] and watermark([T1]) == "2025/02/28 10:00"
+
+
+def test_eviction_keeps_recent(tmp_path):
+    cache = JiraSnapshotCache(str(tmp_path / "j.sqlite"), max_entries=2, offline=False)
+    for i in range(3):
+        cache.put(_jc(f"AB-{i}", T1))
+    assert cache.get("AB-0") is None and cache.stats()["entries"] == 2
@@ -1,2 +1,28 @@
-from vttfg.utils.json_parser import safe_parse_json_from_text
+from vttfg.utils.json_parser import safe_parse_json_from_text, JSONFieldStream
 def test_stub(): assert True
+
+
+def test_fenced_and_bare():
+    assert safe_parse_json_from_text('Sure:\n```json\n{"classification": "UC3", "confidence": 0.9}\n```') == {"classification": "UC3", "confidence": 0.9}
+    assert safe_parse_json_from_text('note {x} then {"a": "}{", "b": [1, 2]} trailing') == {"a": "}{", "b": [1, 2]}
+    assert safe_parse_json_from_text('no json here') is None
+
+
+def test_truncated_output_is_repaired():
+    assert safe_parse_json_from_text('{"states": ["CA", "NY"], "item_codes": ["A1", "B') == {"states": ["CA", "NY"], "item_codes": ["A1", "B"]}
+    assert safe_parse_json_from_text('{"states": ["CA"], "conf') == {"states": ["CA"]}
+
+
+def test_field_stream_reports_members_as_they_complete():
+    doc = '```json\n{"classification": "UC3", "confidence": 0.9, "extraction": {"states": ["KS", "a\\"}"]}, "reasoning": "x, }"}'
+    stream, seen = JSONFieldStream(max_depth=2), []
+    for i in range(0, len(doc), 3):
+        seen += stream.feed(doc[i:i + 3])
+        if i < 40:
+            assert "reasoning" not in stream.fields
+    assert seen[:3] == [(("classification",), "UC3"), (("confidence",), 0.9), (("extraction", "states"), ["KS", 'a"}'])]
+    assert stream.done and stream.fields["reasoning"] == "x, }"
+
+
+def test_deeply_nested_garbage_returns_none():
+    assert safe_parse_json_from_text('{"a":' * 50000) is None
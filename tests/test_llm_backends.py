@@ -0,0 +1,46 @@
+import types
+from vttfg.connectors.llm_backends import FixtureStore, RecordingBackend, ReplayBackend
+
+MSG = [{"role": "user", "content": "Classify\n\nTicket:\nKansas MPF"}]
+
+
+class _Live:
+    def __init__(self):
+        self.chat = types.SimpleNamespace(completions=self)
+
+    def create(self, messages, model=None, max_tokens=None, temperature=0.0, stream=False):
+        return {"choices": [{"message": {"content": '{"classification": "UC3"}'}}], "usage": {"total_tokens": 7}}
+
+
+def test_record_then_replay(tmp_path):
+    store = FixtureStore(str(tmp_path / "fx.jsonl"))
+    recorder = RecordingBackend(_Live(), store)
+    assert recorder.store is store   # an empty store is still the one passed in
+    recorder.chat.completions.create(messages=MSG, model="m", max_tokens=200)
+    replay = ReplayBackend(FixtureStore(store.path), latency_ms=0, jitter_ms=0)
+    assert replay.store.path == store.path
+    resp = replay.chat.completions.create(messages=MSG, model="m", max_tokens=200)
+    assert resp["choices"][0]["message"]["content"] == '{"classification": "UC3"}'
+    # unseen ticket, same prompt: served from the nearest fixture, also as a stream
+    other = [{"role": "user", "content": "Classify\n\nTicket:\nOhio MPF"}]
+    chunks = replay.chat.completions.create(messages=other, model="m", max_tokens=200, stream=True)
+    assert "".join(c["choices"][0]["delta"]["content"] for c in chunks) == '{"classification": "UC3"}'
+
+
+def test_failed_client_init_is_retried_not_registered():
+    from vttfg.connectors import llm_pool
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("gateway blip")
+        return "real"
+
+    llm_pool.reset()
+    try:
+        assert llm_pool.get_client("t", flaky, fallback=lambda: "mock") == "mock"
+        assert llm_pool.get_client("t", flaky, fallback=lambda: "mock") == "real"
+        assert llm_pool.get_client("t", flaky, fallback=lambda: "mock") == "real" and len(attempts) == 2
+    finally:
+        llm_pool.reset()
@@ -0,0 +1,49 @@
+from vttfg.connectors import llm_cache
+from vttfg.connectors.llm_cache import LLMResponseCache
+
+_OK = '{"use_case": "exemption"}'
+
+
+def _clock(monkeypatch, start=1000.0):
+    now = [start]
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_entries_expire_after_the_ttl(tmp_path, monkeypatch):
+    now = _clock(monkeypatch)
+    cache = LLMResponseCache(str(tmp_path / "c.sqlite"), ttl_s=60)
+    assert cache.put("k", _OK)
+    now[0] += 59
+    assert cache.get("k") == _OK
+    now[0] += 2
+    assert cache.get("k") is None and cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, monkeypatch):
+    now = _clock(monkeypatch)
+    cache = LLMResponseCache(str(tmp_path / "c.sqlite"), ttl_s=0, max_entries=2)
+    for key in ("a", "b"):
+        cache.put(key, _OK)
+        now[0] += 1
+    assert cache.get("a") == _OK  # "b" is now the least recently used
+    now[0] += 1
+    cache.put("c", _OK)
+    assert cache.get("b") is None and cache.get("a") == cache.get("c") == _OK
+
+
+def test_bypass_skips_lookups_but_still_stores(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    forced = LLMResponseCache(path, bypass=True)
+    assert forced.put("k", _OK) and forced.get("k") is None
+    assert LLMResponseCache(path).get("k") == _OK
+    assert forced.stats() == {"hits": 0, "misses": 1, "entries": 1, "bytes": len(_OK)}
+
+
+def test_counters_and_unparseable_completions(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "c.sqlite"))
+    for bad in ("", "   ", "Sorry, I cannot help with that.", "no json here {", "[1, 2]"):
+        assert not cache.put(bad, bad)
+    cache.put("k", "```json\n" + _OK + "\n```")
+    cache.get("k"), cache.get("k"), cache.get("missing"), cache.get("")
+    assert cache.stats() == {"hits": 2, "misses": 2, "entries": 1, "bytes": len(_OK) + 12}
@@ -0,0 +1,32 @@
+import json
+from vttfg.local_classifier import LocalClassifier, load_audit_examples, train
+
+SAMPLES = {
+    "UC3": "Convert {} to marketplace facilitator MPF collection effective July 1",
+    "UC4": "Set up delivery fee and driver fee tax category for {} Flex Field 3",
+    "UC2": "Merchant specific override for brand {} custom config Flex Field 2",
+}
+
+
+def _write_audits(tmp_path):
+    for label, tpl in SAMPLES.items():
+        for i, state in enumerate(["Kansas", "Ohio", "Texas", "Utah"]):
+            audit = {"jira_id": f"{label}-{i}", "classification": label, "classification_source": "llm", "ticket_text": tpl.format(state)}
+            (tmp_path / f"audit_{label}-{i}_2025.json").write_text(json.dumps(audit))
+    # the model's own guesses are not training data
+    (tmp_path / "audit_X-1_2025.json").write_text(json.dumps({"jira_id": "X-1", "classification": "UC6", "classification_source": "local", "ticket_text": "x"}))
+    # nor are keyword guesses made when the LLM answered without JSON
+    (tmp_path / "audit_X-3_2025.json").write_text(json.dumps({"jira_id": "X-3", "classification": "UC3", "classification_source": "fallback", "ticket_text": "z"}))
+    # nor are legacy audits: no confirmed classification, only the prompt's use_case and a truncated text
+    (tmp_path / "audit_X-2_2025.json").write_text(json.dumps({"jira_id": "X-2", "extraction": {"use_case": "UC3", "raw_extracted_text": "y"}}))
+
+
+def test_train_save_load_predict(tmp_path):
+    _write_audits(tmp_path)
+    assert len(load_audit_examples(str(tmp_path / "audit_*.json"))) == 12
+    model, n, path = train(str(tmp_path / "audit_*.json"), str(tmp_path / "model.npz"))
+    loaded = LocalClassifier.load(path)
+    assert sorted(loaded.labels) == ["UC2", "UC3", "UC4"]
+    label, conf = loaded.predict("Nevada marketplace facilitator conversion, MPF effective date")
+    assert label == "UC3" and 0.0 < conf <= 1.0
+    assert loaded.predict("driver fee setup")[0] == "UC4"
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import types
+
+import pytest
+
+from vttfg.config import CONFIG
+from vttfg.async_orchestrator import AsyncOrchestrator
+from vttfg.connectors import llm_pool
+from vttfg.connectors.attachments import parse_tables
+from vttfg.connectors.llm_backends import FixtureStore, ReplayBackend
+from vttfg.models import JiraContext
+from vttfg.orchestrator import Orchestrator
+from vttfg.prompts_loader import load_classify_prompt, load_prompt_for
+from vttfg.stage_cache import StageCache
+
+_TEMPLATE = ("Company Code,Division Code,Department Code,Product Code,Product Name\n"
+             "C1,D1,P1,SKU1,Coffee\n"
+             "C1,D1,P2,SKU2,Soda\n"
+             "C1,D2,P3,SKU9,Widget\n")
+
+
+class FakeJira:
+    """fetch_issue + ingest_attachments; every ticket carries one CSV attachment listing SKU9."""
+    def __init__(self, tmp_path, missing=()):
+        self.csv = tmp_path / "skus.csv"
+        self.csv.write_text("Item Code,State\nSKU9,KS\n")
+        self.missing = set(missing)
+        self.fetched = []
+
+    def context(self, jira_id):
+        return JiraContext(jira_id=jira_id, title=f"{jira_id} marketplace facilitator", description="Kansas MPF for coffee",
+                           attachments=[{"id": "1", "filename": "skus.csv", "size": 20}], updated="2025-03-01T10:00:00.000+0000")
+
+    def fetch_issue(self, jira_id):
+        self.fetched.append(jira_id)
+        if jira_id in self.missing:
+            raise LookupError(f"{jira_id} not found")
+        return self.context(jira_id)
+
+    async def fetch_issue_async(self, jira_id):
+        return self.fetch_issue(jira_id)
+
+    def search_issue_keys(self, jql):
+        return ["DD-1", "DD-2", "DD-3"]
+
+    def ingest_attachments(self, jc):
+        return parse_tables(str(self.csv), "skus.csv"), [{"file": "skus.csv", "status": "downloaded", "tables": 1}]
+
+
+def _make(cls, tmp_path, monkeypatch):
+    template = tmp_path / "template.csv"
+    template.write_text(_TEMPLATE)
+    monkeypatch.setattr(CONFIG, "bci_template_path", str(template))
+    monkeypatch.setattr(CONFIG, "local_classifier_enabled", False)
+    orc = cls()
+    orc.stage_cache = StageCache()
+    orc.__dict__.update(jira=FakeJira(tmp_path), snow=None)
+    return orc
+
+
+@pytest.fixture
+def orc(tmp_path, monkeypatch):
+    return _make(Orchestrator, tmp_path, monkeypatch)
+
+
+@pytest.fixture
+def aorc(tmp_path, monkeypatch):
+    return _make(AsyncOrchestrator, tmp_path, monkeypatch)
+
+
+@pytest.fixture
+def llm(monkeypatch):
+    """
+    Replay backend answering the real prompts from fixtures; `calls` holds the
+    max_tokens of every request (200 classify, 800 extract, 1000 combined).
+    """
+    for name, value in {"llm_backend": "replay", "llm_replay_miss": "nearest", "llm_replay_latency_ms": 0,
+                        "llm_replay_jitter_ms": 0, "llm_cache_enabled": False}.items():
+        monkeypatch.setattr(CONFIG, name, value)
+    store, calls, create = FixtureStore(), [], ReplayBackend.create
+
+    def counted(self, messages, model=None, max_tokens=None, **kw):
+        calls.append(max_tokens)
+        return create(self, messages, model=model, max_tokens=max_tokens, **kw)
+
+    def answer(prompt, content, max_tokens):
+        # "nearest" replay matches on the prompt, whatever the ticket text
+        text = content if isinstance(content, str) else json.dumps(content)
+        store.add(CONFIG.portkey_model, [{"role": "user", "content": prompt + "\n\nTicket:\n"}], max_tokens, text)
+
+    monkeypatch.setattr(ReplayBackend, "create", counted)
+    llm_pool.reset()
+    yield types.SimpleNamespace(answer=answer, calls=calls)
+    llm_pool.reset()
+
+
+def _audit(result):
+    with open(result["audit_path"], encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def test_ui_extraction_gets_attachment_tables_manual_does_not(orc):
+    jc = orc.jira.context("DD-1")
+    ui = {"classification": "UC3", "jira_context": jc, "text_blob": "Kansas MPF", "ui_extraction": {"item_codes": ["SKU1"], "states": ["KS"]}}
+    audit = _audit(orc.run_for_jira("DD-1", ui))
+    assert audit["extraction"]["item_codes"] == ["SKU1", "SKU9"]
+    assert audit["debug"]["attachments"]["added"] == {"item_codes": 1}
+
+    manual = {**ui, "manual_extraction": {"item_codes": ["SKU1"], "states": ["KS"]}}
+    del manual["ui_extraction"]
+    audit = _audit(orc.run_for_jira("DD-1", manual))
+    assert audit["extraction"]["item_codes"] == ["SKU1"] and "added" not in audit["debug"]["attachments"]
+
+
+def test_streamed_extraction_resolves_products_before_it_completes(orc, llm):
+    llm.answer(load_prompt_for("uc3"), {"item_codes": ["SKU1", "coffe"], "states": ["KS"], "date_specs": [{"type": "effective", "date": "2026-01-01"}]}, 800)
+    resolved = []
+    resolve_items = orc.resolve_items
+    def spy(items, template_path=None):
+        resolved.append(list(items))
+        return resolve_items(items, template_path)
+    orc.resolve_items = spy
+    result = orc.run_for_jira("DD-1", {"classification": "UC3"})
+    audit = _audit(result)
+    assert llm.calls == [800] and resolved == [["SKU1", "coffe"]]
+    # the attachment's SKU9 came after the early resolution and is resolved on top of it
+    assert audit["extraction"]["item_codes"] == ["SKU1", "coffe", "SKU9"]
+    assert result["rows_count"] == 2 and "stage.resolve_products" in result["timings_ms"]
+
+
+def test_async_combined_mode_applies_the_confidence_threshold(aorc, llm):
+    llm.answer(load_prompt_for("classify_extract"), {"classification": "UC3", "confidence": 0.3, "extraction": {"item_codes": ["SKU2"]}}, 1000)
+    llm.answer(load_prompt_for("uc3"), {"item_codes": ["SKU1"], "states": ["KS"]}, 800)
+    audit = _audit(asyncio.run(aorc.arun_for_jira("DD-1")))
+    # one combined call, then the separate extract because 0.3 is below the threshold; no classify call
+    assert llm.calls == [1000, 800]
+    assert audit["classification"] == "UC3" and audit["classification_source"] == "llm_combined"
+    assert audit["extraction"]["item_codes"] == ["SKU1", "SKU9"]
+    assert any("below threshold" in n for n in audit["debug"]["notes"])
+
+
+def test_async_failed_stage_cancels_the_running_classify(aorc, monkeypatch):
+    monkeypatch.setattr(CONFIG, "llm_combined_mode", False)
+    cancelled = []
+
+    async def doc_text(url):
+        await asyncio.sleep(0)
+        return "doc"
+
+    async def classify(jc):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.append(jc.jira_id)
+            raise
+
+    def broken_blob(jc, docs):
+        raise RuntimeError("blob failed")
+    aorc.__dict__["gdocs"] = types.SimpleNamespace(fetch_doc_text_async=doc_text)
+    aorc._aclassify, aorc._build_text_blob = classify, broken_blob
+    jc = aorc.jira.context("DD-1")
+    jc.linked_docs = ["https://docs.google.com/document/d/x"]
+
+    async def run():
+        with pytest.raises(RuntimeError):
+            await aorc.arun_for_jira("DD-1", {"jira_context": jc})
+        await asyncio.sleep(0)
+        return list(cancelled)   # read before asyncio.run cancels leftovers itself
+    assert asyncio.run(run()) == ["DD-1"]
+
+
+def _combined(llm, confidence=0.9):
+    llm.answer(load_prompt_for("classify_extract"), {"classification": "UC3", "confidence": confidence,
+                                                     "extraction": {"item_codes": ["SKU1"], "states": ["KS"]}}, 1000)
+
+
+def test_batch_keeps_input_order_and_isolates_failures(orc, llm):
+    _combined(llm)
+    orc.jira.missing = {"DD-2"}
+    out = orc.run_for_jiras(["DD-3", "DD-2", " DD-1 ", "DD-3"], max_workers=3)
+    assert [(r["jira_id"], r["status"]) for r in out["results"]] == [("DD-3", "ok"), ("DD-2", "error"), ("DD-1", "ok")]
+    assert out["results"][1]["error"] == "LookupError: DD-2 not found"
+    # SKU1 from the LLM + SKU9 from the attachment, one state each
+    summary = out["summary"]
+    assert (summary["total"], summary["succeeded"], summary["failed"], summary["rows_count"]) == (3, 2, 1, 4)
+    assert llm.calls == [1000, 1000]
+
+
+def test_run_for_jql_runs_every_search_hit(orc, llm):
+    _combined(llm)
+    orc.jira.missing = {"DD-2"}
+    out = orc.run_for_jql("project = DD", max_workers=2)
+    assert sorted((r["jira_id"], r["status"]) for r in out["results"]) == [("DD-1", "ok"), ("DD-2", "error"), ("DD-3", "ok")]
+    assert out["summary"]["failed"] == 1 and sorted(orc.jira.fetched) == ["DD-1", "DD-2", "DD-3"]
+
+
+def test_ui_session_then_generate_reuses_every_stage(orc, llm):
+    _combined(llm)
+    llm.answer(load_prompt_for("uc3"), {"item_codes": ["SKU2"], "states": ["KS"]}, 800)
+    # what the UI does: fetch, combined suggestion, then an extraction for an overridden class
+    jc, blob = orc.prepare_context("DD-1", refresh=True)
+    orc.classify_and_extract_context("DD-1", jc, blob, prompt=load_prompt_for("classify_extract"))
+    extraction = orc.extract_context("DD-1", jc, blob, "UC4", prompt=load_prompt_for("uc3"))
+    assert orc.jira.fetched == ["DD-1"] and llm.calls == [1000, 800]
+
+    ui = {"classification": "UC4", "jira_context": jc, "text_blob": blob, "ui_extraction": extraction}
+    assert orc.run_for_jira("DD-1", ui)["rows_count"] == 2
+    # a later plain run of the ticket finds the context and the combined answer in the stage cache
+    audit = _audit(orc.run_for_jira("DD-1"))
+    assert orc.jira.fetched == ["DD-1"] and llm.calls == [1000, 800]
+    assert {e["stage"] for e in audit["events"] if e["event"] == "stage_cache_hit"} >= {"context", "classify_extract"}
+    assert audit["extraction"]["item_codes"] == ["SKU1", "SKU9"]
+
+
+@pytest.mark.parametrize("answer, calls, source, items", [
+    ({"classification": "UC3", "confidence": 0.9, "extraction": {"item_codes": ["SKU1"], "states": ["KS"]}}, [1000], "llm_combined", ["SKU1", "SKU9"]),
+    # below CONFIG.llm_confidence_threshold: the class stands, the extraction is redone separately
+    ({"classification": "UC3", "confidence": 0.3, "extraction": {"item_codes": ["SKU1"], "states": ["KS"]}}, [1000, 800], "llm_combined", ["SKU2", "SKU9"]),
+    # no JSON at all: separate classify and extract
+    ("I could not read this ticket.", [1000, 200, 800], "llm", ["SKU2", "SKU9"]),
+])
+def test_combined_mode_falls_back_to_separate_calls(orc, llm, answer, calls, source, items):
+    llm.answer(load_prompt_for("classify_extract"), answer, 1000)
+    llm.answer(load_classify_prompt(), {"classification": "UC3", "confidence": 0.8}, 200)
+    llm.answer(load_prompt_for("uc3"), {"item_codes": ["SKU2"], "states": ["KS"]}, 800)
+    audit = _audit(orc.run_for_jira("DD-1"))
+    assert llm.calls == calls
+    assert (audit["classification"], audit["classification_source"]) == ("UC3", source)
+    assert audit["extraction"]["item_codes"] == items
+    assert bool(audit["debug"]["notes"]) == (len(calls) > 1)
@@ -0,0 +1,27 @@
+from vttfg import product_index
+from vttfg.product_index import ProductIndex
+
+_NAMES = {"Gift Card": {"G1"}, "gift card - digital": {"G2"}, "red wine": {"W1"}, "craft beer": {"B1"}, "ab testing kit": {"K1"}}
+
+
+def test_short_items_match_whole_words_only():
+    index = ProductIndex(_NAMES)
+    assert [h[0] for h in index.substring("ab")] == ["ab testing kit"]
+    assert index.substring("re") == []
+    assert [h[0] for h in index.substring("digital gift card order")] == ["gift card"]
+
+
+def test_fuzzy_matches_without_levenshtein(monkeypatch):
+    with_c = ProductIndex(_NAMES).fuzzy("craft bear")
+    monkeypatch.setattr(product_index, "_lev", None)
+    index = ProductIndex(_NAMES)
+    assert index._tree is None and index.fuzzy("craft bear") == with_c == [("craft beer", 0.9, ["B1"])]
+
+
+def test_index_is_cached_per_template_stamp_not_in_the_metadata():
+    meta = {"product_name_to_codes": _NAMES, "source": ("/t.csv", (1, 10, 1))}
+    index = product_index.index_for(meta)
+    assert product_index.index_for(dict(meta)) is index and set(meta) == {"product_name_to_codes", "source"}
+    edited = {"product_name_to_codes": {"red wine": {"W1"}}, "source": ("/t.csv", (2, 10, 1))}
+    assert product_index.index_for(edited).names == ["red wine"] and len(product_index._indexes) == 1
+    assert product_index.index_for({"product_name_to_codes": _NAMES}) is not product_index.index_for({"product_name_to_codes": _NAMES})
@@ -0,0 +1,126 @@
+import time
+import pytest
+from vttfg.config import CONFIG
+from vttfg.metrics import start_run
+from vttfg.connectors.resilience import CircuitOpenError, ResilientCaller
+
+
+@pytest.fixture
+def fast(monkeypatch):
+    for k, v in dict(llm_retries=1, llm_backoff_s=0.0, llm_breaker_failures=2, llm_breaker_reset_s=60,
+                     llm_hedge_enabled=True, llm_hedge_min_delay_s=0.01, llm_timeout_s=5, llm_deadline_s=5).items():
+        monkeypatch.setattr(CONFIG, k, v)
+
+
+def test_retry_then_breaker_fails_fast(fast):
+    caller, calls = ResilientCaller("test"), []
+    def boom():
+        calls.append(1)
+        raise ConnectionError("gateway down")
+    with start_run(jira_id="T-1") as run:
+        with pytest.raises(ConnectionError):
+            caller.call(boom)
+        with pytest.raises(CircuitOpenError):
+            caller.call(boom)
+    assert len(calls) == 2
+    assert {"llm_attempt_failed", "llm_circuit_tripped", "llm_circuit_open"} <= {e["event"] for e in run.events}
+
+
+def test_hedge_after_p95(fast):
+    caller = ResilientCaller("test")
+    for _ in range(caller.latency.min_samples):
+        caller.latency.observe(0.01)
+    slow = iter([0.5, 0.0])
+    def call():
+        time.sleep(next(slow))
+        return "ok"
+    with start_run(jira_id="T-2") as run:
+        assert caller.call(call) == "ok"
+    events = {e["event"]: e for e in run.events}
+    assert "llm_hedge" in events and events["llm_hedge_result"]["winner"] == "hedge"
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def test_only_transient_errors_are_retried_and_trip_the_breaker(fast):
+    caller, calls = ResilientCaller("test"), []
+    def fail(status):
+        def fn():
+            calls.append(status)
+            raise _StatusError(status)
+        return fn
+    for _ in range(3):
+        with pytest.raises(_StatusError):
+            caller.call(fail(400))
+    assert calls == [400] * 3 and caller.breaker.state == "closed"
+    with pytest.raises(_StatusError):
+        caller.call(fail(429))
+    assert calls[3:] == [429, 429] and caller.breaker.state == "open"
+
+
+def test_async_bad_request_is_not_retried(fast):
+    import asyncio
+    caller, calls = ResilientCaller("test"), []
+    async def bad():
+        calls.append(1)
+        raise ValueError("malformed request")
+    with pytest.raises(ValueError):
+        asyncio.run(caller.acall(bad))
+    assert calls == [1] and caller.breaker.state == "closed"
+
+
+def test_hedge_loser_is_discarded(fast):
+    caller = ResilientCaller("test")
+    for _ in range(caller.latency.min_samples):
+        caller.latency.observe(0.01)
+    slow, closed = iter([("primary", 0.3), ("hedge", 0.0)]), []
+    def call():
+        name, delay = next(slow)
+        time.sleep(delay)
+        return name
+    assert caller.call(call, discard=closed.append) == "hedge"
+    time.sleep(0.5)
+    assert closed == ["primary"]
+
+
+def test_gateway_failures_reach_the_caller_not_a_keyword_guess(fast, monkeypatch):
+    import types
+    from vttfg.connectors.llm_client import PortkeySdkClient
+    monkeypatch.setattr(CONFIG, "llm_stream_classify", False)
+    def down(**kw):
+        raise ConnectionError("gateway down")
+    client = PortkeySdkClient.__new__(PortkeySdkClient)
+    client.model, client.cache, client.caller = "m", None, ResilientCaller("test")
+    client.client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=down)))
+    with pytest.raises(ConnectionError):
+        client.classify("Kansas marketplace facilitator")
+    with pytest.raises(CircuitOpenError):
+        client.classify_and_extract("Kansas marketplace facilitator")
+
+
+def test_attempt_timeout_reaches_the_request_and_excludes_queue_wait(fast, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+    from vttfg.connectors import resilience
+    monkeypatch.setattr(CONFIG, "llm_timeout_s", 0.2)
+    monkeypatch.setattr(CONFIG, "llm_hedge_enabled", False)
+    pool = ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(resilience, "_executor", pool)
+    sent = []
+
+    class _Client:
+        def with_options(self, timeout):
+            sent.append(timeout)
+            return self
+
+        def create(self):
+            time.sleep(0.05)
+            return "ok"
+    busy = pool.submit(time.sleep, 0.4)   # the only worker is taken for longer than the attempt timeout
+    assert ResilientCaller("test").call(lambda: resilience.with_timeout(_Client()).create()) == "ok"
+    assert busy.done() and len(sent) == 1 and 0.1 < sent[0] <= 0.2
+    assert resilience.with_timeout(_Client()) is not None and len(sent) == 1   # outside an attempt: untouched
+    pool.shutdown()
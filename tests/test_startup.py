@@ -0,0 +1,40 @@
+import os, subprocess, sys, json
+
+SRC = os.path.join(os.path.dirname(__file__), "..", "src")
+# cold-start budget for `import vttfg.orchestrator` + Orchestrator(); override on slow machines
+BUDGET_MS = float(os.getenv("VTTFG_STARTUP_BUDGET_MS", 400))
+HEAVY = ("pandas", "snowflake", "portkey_ai", "googleapiclient")
+
+PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+from vttfg.orchestrator import Orchestrator
+orc = Orchestrator()
+elapsed_ms = (time.perf_counter() - t0) * 1000
+print(json.dumps({"elapsed_ms": elapsed_ms, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY,)
+
+
+def _run(*args):
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([SRC, os.environ.get("PYTHONPATH", "")]))
+    return subprocess.run([sys.executable, *args], capture_output=True, text=True, env=env, check=True)
+
+
+def _importtime_ms(module):
+    # `python -X importtime` writes "import time: self [us] | cumulative | package" to stderr
+    out = _run("-X", "importtime", "-c", f"import {module}").stderr
+    for line in out.splitlines():
+        parts = [p.strip() for p in line.split("|")]
+        if len(parts) == 3 and parts[2] == module:
+            return int(parts[1]) / 1000.0
+    raise AssertionError(f"{module} not in importtime output")
+
+
+def test_startup_defers_heavy_imports():
+    res = json.loads(_run("-c", PROBE).stdout.strip().splitlines()[-1])
+    assert res["heavy"] == []
+    assert res["elapsed_ms"] < BUDGET_MS
+
+
+def test_orchestrator_importtime_budget():
+    assert _importtime_ms("vttfg.orchestrator") < BUDGET_MS
@@ -0,0 +1,40 @@
+import os
+
+from vttfg import template
+from vttfg.config import CONFIG
+
+_CSV = ("Company Code,Division Code,Department Code,Product Code,Product Name,Notes\n"
+        "C1,D1,P1, sku1 ,Widget,\n"
+        "C1,D2,P2,SKU2,Gadget,x\n"
+        ",,,,Orphan,\n"
+        "C2,D3,P3,sku3,widget,\n")
+
+
+def test_metadata_maps_and_sidecar(tmp_path, monkeypatch):
+    monkeypatch.setattr(CONFIG, "template_cache_dir", str(tmp_path / "cache"))
+    path = tmp_path / "tpl.csv"
+    path.write_text(_CSV)
+    meta = template.read_template_metadata(str(path))
+    assert meta["product_list"] == {"SKU1", "SKU2", "SKU3"} and "df" not in meta
+    assert meta["product_name_to_codes"] == {"widget": {"SKU1", "SKU3"}, "gadget": {"SKU2"}}
+    assert meta["product_to_division"]["SKU2"] == "D2" and meta["product_to_company"]["SKU3"] == "C2"
+    assert template.read_template_metadata(str(path)) is meta
+
+    template._cache.clear()
+    from_sidecar = template.read_template_metadata(str(path))
+    assert from_sidecar is not meta and from_sidecar == meta
+
+    # an edited template (new size/mtime) is re-read, not served from either cache
+    path.write_text(_CSV + "C3,D4,P4,SKU4,Doohickey,\n")
+    os.utime(path, ns=(1, 1))
+    assert "SKU4" in template.read_template_metadata(str(path))["product_list"]
+
+
+def test_resolve_products_ranks_substring_and_fuzzy_candidates():
+    meta = {"product_list": {"SKU1", "SKU2", "SKU3"},
+            "product_name_to_codes": {"frozen pizza": {"SKU1"}, "frozen pizza family size": {"SKU2"}, "sparkling water": {"SKU3"}}}
+    resolved, notes = template.resolve_products(["SKU1", "Frozen Pizza!", "sparkling watr", "zz"], meta)
+    assert resolved == ["SKU1", "SKU2", "SKU3", CONFIG.default_item.upper()]
+    assert notes[1].startswith("Substring matches for Frozen Pizza! -> ['SKU1', 'SKU2']") and "'frozen pizza' 1.00" in notes[1]
+    assert notes[2].startswith("Fuzzy match for sparkling watr -> ['SKU3']")
+    assert notes[3].startswith("No match for zz")